@@ -1,9 +1,345 @@
 import maya.cmds as cmds
 import maya.mel as mel
+import maya.api.OpenMaya as om
+import bisect
+import collections
+import contextlib
+import hashlib
+import json
+import math
+import os
 import string
+import sys
+import time
+import types
 
 # Need to store this mel file in a place that Maya can understand, like it's scripts folder.
-mel.eval("source FBXAnimationExporter_FBXOptions.mel")
+mel.eval("source FBXAnimationExport_FBXOptions.mel")
+
+
+#######################################
+#
+#    Timing procs
+#
+#######################################
+
+# Set to False to stop recording timing spans.
+SIP_TimingEnabled = True
+
+# Folder the timing spans of every export run are written to, as json lines and as a Chrome trace. Empty string keeps
+# them in memory only, see SIP_ReturnTimingSpans. Batch workers inherit it through SIP_FBX_TIMING_DIR.
+SIP_TimingLogDir = os.environ.get("SIP_FBX_TIMING_DIR", "")
+
+_SIP_TimingSpans = []
+_SIP_TimingStack = []
+_SIP_TimingClock = getattr(time, "perf_counter", time.time)
+
+
+# PURPOSE:          Time a phase of the export.
+# PROCEDURE:        Context manager. Record the start, yield the tags dict so the phase can add tags it only knows at
+#                   the end (file size, ...), then record the duration. Spans nest. A span opened with no other span
+#                   open starts a new run: the previous run's spans are dropped and, when it closes, the run is
+#                   written to SIP_TimingLogDir.
+# PRESUMPTION:      Tag values are json serializable.
+@contextlib.contextmanager
+def SIP_TimingSpan(name, **tags):
+    if not SIP_TimingEnabled:
+        yield tags
+        return
+
+    if not _SIP_TimingStack:
+        del _SIP_TimingSpans[:]
+
+    span = {"name": name, "depth": len(_SIP_TimingStack), "tags": tags, "wall": time.time(),
+            "start": _SIP_TimingClock()}
+    _SIP_TimingStack.append(span)
+
+    try:
+        yield tags
+    finally:
+        span["seconds"] = _SIP_TimingClock() - span["start"]
+        _SIP_TimingStack.pop()
+        _SIP_TimingSpans.append(span)
+
+        if not _SIP_TimingStack and SIP_TimingLogDir:
+            SIP_WriteTimingSpans(os.path.join(SIP_TimingLogDir, "fbxExport_" +
+                                              time.strftime("%Y%m%d_%H%M%S", time.localtime(span["wall"])) +
+                                              "%03d" % (span["wall"] % 1 * 1000) + "_" + str(os.getpid()) + "_" +
+                                              name))
+
+
+# PURPOSE:          Return the spans of the last (or running) export run.
+# PROCEDURE:        Return a copy of the recorded spans, in the order they closed.
+# PRESUMPTION:      None.
+def SIP_ReturnTimingSpans():
+    return list(_SIP_TimingSpans)
+
+
+# PURPOSE:          Write the recorded spans to basePath + ".jsonl" and basePath + ".trace.json".
+# PROCEDURE:        One json object per span per line, then the same spans as Chrome trace complete events, which
+#                   load in chrome://tracing or Perfetto. Trace times are microseconds from the first span.
+#                   Errors are warned about, never raised, so timing never fails an export.
+# PRESUMPTION:      None.
+def SIP_WriteTimingSpans(basePath, spans=None):
+    if spans is None:
+        spans = _SIP_TimingSpans
+
+    if not spans:
+        return
+
+    origin = min(cur["start"] for cur in spans)
+    events = []
+
+    try:
+        if not os.path.isdir(os.path.dirname(basePath) or "."):
+            os.makedirs(os.path.dirname(basePath))
+
+        with open(basePath + ".jsonl", "w") as spanFile:
+            for cur in sorted(spans, key=lambda span: span["start"]):
+                spanFile.write(json.dumps({"name": cur["name"], "depth": cur["depth"], "wall": cur["wall"],
+                                           "seconds": cur["seconds"], "tags": cur["tags"]}, sort_keys=True) + "\n")
+                events.append({"name": cur["name"], "cat": "fbxExport", "ph": "X", "pid": os.getpid(), "tid": 0,
+                               "ts": (cur["start"] - origin) * 1000000.0, "dur": cur["seconds"] * 1000000.0,
+                               "args": cur["tags"]})
+
+        with open(basePath + ".trace.json", "w") as traceFile:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, traceFile)
+    except (IOError, OSError, TypeError, ValueError) as error:
+        cmds.warning("Could not write timing spans to " + basePath + ": " + str(error) + "\n")
+
+
+#######################################
+#
+#    Command profiler procs
+#
+#######################################
+
+# Most of an export's cost is the number of round trips through maya.cmds and maya.mel. SIP_EnableCommandProfiler
+# swaps the cmds and mel used by this module (and by FBXAnimationExporter_Batch, if it is loaded) for wrappers that
+# count calls and time per command and per calling SIP_ procedure.
+
+# Commands a procedure may run per call, including the procedures it calls, with the default flags. Checked while the
+# profiler is on. A per-joint or per-node query added to one of these shows up as a budget violation.
+SIP_CommandBudgets = {"SIP_ApplyFBXOptions": 1,
+                      "SIP_BakeExportRig": 1,
+                      "SIP_ClearGarbage": 3,
+                      "SIP_CopyAndConnectSkeleton": 10,
+                      "SIP_CurvePreBakeExportRig": 4,
+                      "SIP_ResetExportRig": 4,
+                      "SIP_ReturnAnimLayerState": 1}
+
+_SIP_CommandProfile = {}
+_SIP_CommandCount = [0]
+_SIP_CommandBudgetViolations = []
+_SIP_BudgetedCalls = {}
+_SIP_ProfiledModules = {}
+_SIP_ProfiledProcs = {}
+_SIP_ProfiledCommandModules = {}
+
+
+# PURPOSE:          Wrap one cmds or mel function so every call is counted.
+# PROCEDURE:        On each call, find the nearest SIP_ procedure on the stack, time the call and add it to the
+#                   profile under (command, procedure).
+# PRESUMPTION:      None.
+def SIP_ReturnProfiledCommand(name, command):
+    def profiled(*args, **kwargs):
+        frame = sys._getframe(1)
+
+        while frame and not frame.f_code.co_name.startswith("SIP_"):
+            frame = frame.f_back
+
+        start = _SIP_TimingClock()
+
+        try:
+            return command(*args, **kwargs)
+        finally:
+            entry = _SIP_CommandProfile.setdefault((name, frame.f_code.co_name if frame else ""), [0, 0.0])
+            entry[0] += 1
+            entry[1] += _SIP_TimingClock() - start
+            _SIP_CommandCount[0] += 1
+
+    return profiled
+
+
+# PURPOSE:          Return a stand-in for the maya.cmds or maya.mel module with every function profiled.
+# PROCEDURE:        Build a module with a profiled wrapper for each callable of the real module, once per session.
+# PRESUMPTION:      None.
+def SIP_ReturnProfiledCommandModule(module, prefix):
+    if module.__name__ not in _SIP_ProfiledCommandModules:
+        profiledModule = types.ModuleType(module.__name__)
+
+        for curName in dir(module):
+            value = getattr(module, curName)
+
+            if callable(value) and not curName.startswith("_"):
+                value = SIP_ReturnProfiledCommand(prefix + curName, value)
+
+            setattr(profiledModule, curName, value)
+
+        _SIP_ProfiledCommandModules[module.__name__] = profiledModule
+
+    return _SIP_ProfiledCommandModules[module.__name__]
+
+
+# PURPOSE:          Wrap a procedure so the commands run during each call are checked against its budget.
+# PROCEDURE:        Count the commands run between entering and leaving the procedure. Record a violation if there are
+#                   more than the budget, and count the call so checks can tell which budgets were exercised.
+# PRESUMPTION:      None.
+def SIP_ReturnBudgetedProc(name, proc, budget):
+    def budgeted(*args, **kwargs):
+        before = _SIP_CommandCount[0]
+
+        try:
+            return proc(*args, **kwargs)
+        finally:
+            calls = _SIP_CommandCount[0] - before
+            _SIP_BudgetedCalls[name] = _SIP_BudgetedCalls.get(name, 0) + 1
+
+            if calls > budget:
+                _SIP_CommandBudgetViolations.append({"procedure": name, "calls": calls, "budget": budget})
+
+    return budgeted
+
+
+# PURPOSE:          Start counting the cmds and mel calls this module makes.
+# PROCEDURE:        Swap the cmds and mel globals of this module and of FBXAnimationExporter_Batch (if imported) for
+#                   profiled stand-ins, and wrap every procedure in SIP_CommandBudgets, plus the given budgets, with
+#                   its budget check.
+# PRESUMPTION:      Opt-in. Costs a stack walk per command while enabled.
+def SIP_EnableCommandProfiler(budgets=None):
+    allBudgets = dict(SIP_CommandBudgets)
+    allBudgets.update(budgets or {})
+    thisModule = sys.modules[__name__]
+
+    for curModule in [thisModule, sys.modules.get("FBXAnimationExporter_Batch")]:
+        if curModule is None or curModule.__name__ in _SIP_ProfiledModules:
+            continue
+
+        originals = {}
+
+        for curName, curPrefix in [("cmds", "cmds."), ("mel", "mel.")]:
+            if hasattr(curModule, curName):
+                originals[curName] = getattr(curModule, curName)
+                setattr(curModule, curName, SIP_ReturnProfiledCommandModule(originals[curName], curPrefix))
+
+        _SIP_ProfiledModules[curModule.__name__] = (curModule, originals)
+
+    for curName, budget in allBudgets.items():
+        if curName not in _SIP_ProfiledProcs and hasattr(thisModule, curName):
+            _SIP_ProfiledProcs[curName] = getattr(thisModule, curName)
+            setattr(thisModule, curName, SIP_ReturnBudgetedProc(curName, _SIP_ProfiledProcs[curName], budget))
+
+
+# PURPOSE:          Stop counting cmds and mel calls.
+# PROCEDURE:        Put back the original cmds, mel and procedures. The profile is kept until reset.
+# PRESUMPTION:      None.
+def SIP_DisableCommandProfiler():
+    thisModule = sys.modules[__name__]
+
+    for curModule, originals in _SIP_ProfiledModules.values():
+        for curName, value in originals.items():
+            setattr(curModule, curName, value)
+
+    for curName, proc in _SIP_ProfiledProcs.items():
+        setattr(thisModule, curName, proc)
+
+    _SIP_ProfiledModules.clear()
+    _SIP_ProfiledProcs.clear()
+
+
+# PURPOSE:          Clear the counted calls and budget violations.
+# PROCEDURE:        Empty the profile, the budgeted procedure calls and the violations.
+# PRESUMPTION:      None.
+def SIP_ResetCommandProfile():
+    _SIP_CommandProfile.clear()
+    _SIP_BudgetedCalls.clear()
+    del _SIP_CommandBudgetViolations[:]
+
+
+# PURPOSE:          Return the counted calls.
+# PROCEDURE:        One dict per (command, procedure) with its calls and seconds, most called first.
+# PRESUMPTION:      None.
+def SIP_ReturnCommandProfile():
+    profile = [{"command": command, "procedure": procedure, "calls": entry[0], "seconds": entry[1]}
+               for (command, procedure), entry in _SIP_CommandProfile.items()]
+    return sorted(profile, key=lambda cur: (-cur["calls"], cur["command"], cur["procedure"]))
+
+
+# PURPOSE:          Return the budget violations recorded since the last reset.
+# PROCEDURE:        Return a copy of the violations.
+# PRESUMPTION:      None.
+def SIP_ReturnCommandBudgetViolations():
+    return list(_SIP_CommandBudgetViolations)
+
+
+# PURPOSE:          Return how often each budgeted procedure ran since the last reset.
+# PROCEDURE:        Return a copy of the calls per procedure name.
+# PRESUMPTION:      None.
+def SIP_ReturnBudgetedCalls():
+    return dict(_SIP_BudgetedCalls)
+
+
+# PURPOSE:          Print the most called commands and any budget violations.
+# PROCEDURE:        One line per (command, procedure), then one per violation.
+# PRESUMPTION:      None.
+def SIP_PrintCommandProfile(limit=25):
+    for curEntry in SIP_ReturnCommandProfile()[:limit]:
+        print("%8d %10.4fs  %-32s %s" % (curEntry["calls"], curEntry["seconds"], curEntry["command"],
+                                         curEntry["procedure"]))
+
+    for curViolation in _SIP_CommandBudgetViolations:
+        print("Over budget: " + curViolation["procedure"] + " ran " + str(curViolation["calls"]) +
+              " commands, budget " + str(curViolation["budget"]))
+
+
+# PURPOSE:          Fail a test when the code in the block runs too many commands.
+# PROCEDURE:        Context manager. Enable the profiler for the block if it is off. Afterwards raise AssertionError if
+#                   the block ran more than maxCalls commands (None for no total limit) or any procedure went over
+#                   its budget. The message lists the commands that were run most.
+# PRESUMPTION:      For tests and benchmarks, e.g.
+#                       with FBX.SIP_CommandBudget(50, "export hero"):
+#                           FBX.SIP_ExportFBXAnimation("hero", "")
+@contextlib.contextmanager
+def SIP_CommandBudget(maxCalls=None, label="", budgets=None):
+    wasEnabled = bool(_SIP_ProfiledModules)
+
+    if not wasEnabled or budgets:
+        SIP_EnableCommandProfiler(budgets)
+
+    before = _SIP_CommandCount[0]
+    beforeProfile = dict((key, entry[0]) for key, entry in _SIP_CommandProfile.items())
+    beforeViolations = len(_SIP_CommandBudgetViolations)
+
+    try:
+        yield
+    finally:
+        if not wasEnabled:
+            SIP_DisableCommandProfiler()
+
+    calls = _SIP_CommandCount[0] - before
+    violations = _SIP_CommandBudgetViolations[beforeViolations:]
+
+    if (maxCalls is not None and calls > maxCalls) or violations:
+        counts = {}
+
+        for key, entry in _SIP_CommandProfile.items():
+            if entry[0] > beforeProfile.get(key, 0):
+                counts[key[0] + " in " + key[1]] = entry[0] - beforeProfile.get(key, 0)
+
+        message = (label or "Command budget") + ": " + str(calls) + " commands"
+
+        if maxCalls is not None:
+            message += ", budget " + str(maxCalls)
+
+        for curViolation in violations:
+            message += "\n  " + curViolation["procedure"] + " ran " + str(curViolation["calls"]) + ", budget " + \
+                       str(curViolation["budget"])
+
+        for curKey in sorted(counts, key=lambda cur: -counts[cur])[:10]:
+            message += "\n  " + str(counts[curKey]) + " x " + curKey
+
+        raise AssertionError(message)
+
 
 
 #######################################
@@ -22,6 +358,7 @@ def SIP_TagForOrigin(node):
     if cmds.objExists(node) and not cmds.objExists(node + ".origin"):
         cmds.addAttr(node, shortName="org", longName="origin", at="bool")
         cmds.setAttr(node + ".origin", True)
+        SIP_InvalidateOriginIndex()
 
 
 # PURPOSE:          add attributes to the mesh so exporter can find them.
@@ -32,492 +369,2657 @@ def SIP_TagForMeshExport(mesh):
         cmds.addAttr(mesh, shortName="xms", longName="exportMeshes", at="message")
 
 
-# PURPOSE:         Add attribute to the node so exporter can find export definitions
-# PROCEDURE:       If the object exists, and the attribute does not exist,
-#                  add the exportNode message attribute and set to true.
-# PRESUMPTION:     none
-def SIP_TagForExportNode(node):
-    if cmds.objExists(node) and not cmds.objExists(node + ".exportNode"):
-        cmds.addAttr(node, shortName="xnd", longName="exportNode", at="message")
+# PURPOSE:         Add attribute to the node so exporter can find export definitions
+# PROCEDURE:       If the object exists, and the attribute does not exist,
+#                  add the exportNode message attribute and set to true.
+# PRESUMPTION:     none
+def SIP_TagForExportNode(node):
+    if cmds.objExists(node) and not cmds.objExists(node + ".exportNode"):
+        cmds.addAttr(node, shortName="xnd", longName="exportNode", at="message")
+
+
+# Origins found in the scene keyed by namespace, None until built. Rebuilt lazily after invalidation.
+_SIP_OriginIndex = None
+_SIP_SceneCacheCallbacks = []
+
+
+# PURPOSE:          Throw away the origin index so the next lookup rebuilds it.
+# PROCEDURE:        Reset the module level index. Takes *args so it can be used directly as a scene callback.
+# PRESUMPTION:      None.
+def SIP_InvalidateOriginIndex(*args):
+    global _SIP_OriginIndex
+    _SIP_OriginIndex = None
+
+
+# PURPOSE:          Throw away every scene lookup cache (origins and deformed meshes).
+# PROCEDURE:        Invalidate each cache. Takes *args so it can be used directly as a scene callback.
+# PRESUMPTION:      None.
+def SIP_InvalidateSceneCaches(*args):
+    SIP_InvalidateOriginIndex()
+    SIP_InvalidateDeformedMeshCache()
+
+
+# PURPOSE:          Make sure the scene caches are invalidated when references, scenes or deformers change.
+# PROCEDURE:        Register callbacks once per session for reference load/unload/create/remove, for new, open and
+#                   import, and for deformers being added or removed.
+# PRESUMPTION:      None.
+def SIP_AddSceneCacheCallbacks():
+    if _SIP_SceneCacheCallbacks:
+        return
+
+    messages = [om.MSceneMessage.kAfterLoadReference, om.MSceneMessage.kAfterUnloadReference,
+                om.MSceneMessage.kAfterCreateReference, om.MSceneMessage.kAfterRemoveReference,
+                om.MSceneMessage.kAfterNew, om.MSceneMessage.kAfterOpen, om.MSceneMessage.kAfterImport]
+
+    for curMessage in messages:
+        _SIP_SceneCacheCallbacks.append(om.MSceneMessage.addCallback(curMessage, SIP_InvalidateSceneCaches))
+
+    _SIP_SceneCacheCallbacks.append(om.MDGMessage.addNodeAddedCallback(SIP_InvalidateDeformedMeshCache,
+                                                                       "geometryFilter"))
+    _SIP_SceneCacheCallbacks.append(om.MDGMessage.addNodeRemovedCallback(SIP_InvalidateDeformedMeshCache,
+                                                                         "geometryFilter"))
+
+
+# PURPOSE:          Remove the callbacks added by SIP_AddSceneCacheCallbacks, e.g. before reloading the module.
+# PROCEDURE:        Remove the callback ids and clear the list.
+# PRESUMPTION:      None.
+def SIP_RemoveSceneCacheCallbacks():
+    if _SIP_SceneCacheCallbacks:
+        om.MMessage.removeCallbacks(_SIP_SceneCacheCallbacks)
+        del _SIP_SceneCacheCallbacks[:]
+
+    SIP_InvalidateSceneCaches()
+
+
+# PURPOSE:          Return the namespace of the given node.
+# PROCEDURE:        Strip any DAG path, then everything after the last colon.
+# PRESUMPTION:      Nodes in the root namespace return an empty string.
+def SIP_ReturnNamespace(node):
+    return node.split("|")[-1].rpartition(":")[0]
+
+
+# PURPOSE:          Build a lookup of every origin joint in the scene keyed by namespace.
+# PROCEDURE:        One ls over the origin attribute in all namespaces, filtered to joints, then keep the ones where
+#                   the attribute is set to true.
+# PRESUMPTION:      Origin attribute is on a joint.
+def SIP_BuildOriginIndex():
+    index = {}
+    tagged = cmds.ls("*.origin", recursive=True, objectsOnly=True)
+
+    if tagged:
+        for curJoint in cmds.ls(tagged, type="joint"):
+            if cmds.getAttr(curJoint + ".origin"):
+                index.setdefault(SIP_ReturnNamespace(curJoint), []).append(curJoint)
+
+    return index
+
+
+# PURPOSE:          Return every origin of the given namespace.
+# PROCEDURE:        Build the index if needed. If ns is not empty string, return origins in that namespace, else return
+#                   all origins in the scene. If a cached origin no longer exists, rebuild the index once.
+# PRESUMPTION:      namespace does not include colon.
+def SIP_ReturnOrigins(ns):
+    global _SIP_OriginIndex
+
+    SIP_AddSceneCacheCallbacks()
+
+    for attempt in range(2):
+        if _SIP_OriginIndex is None:
+            _SIP_OriginIndex = SIP_BuildOriginIndex()
+
+        if ns:
+            origins = list(_SIP_OriginIndex.get(ns, []))
+        else:
+            origins = [cur for curList in _SIP_OriginIndex.values() for cur in curList]
+
+        if not origins or cmds.objExists(origins[0]):
+            return origins
+
+        SIP_InvalidateOriginIndex()
+
+    return origins
+
+
+# PURPOSE:          Return the origin of the given namespace
+# PROCEDURE:        Look the namespace up in the origin index. If exactly one origin is found, return the name of the
+#                   joint. If none are found, or more than one is found (reported as a warning), return "Error".
+# PRESUMPTION:      Origin attribute is on a joint.
+#                   "Error" is not a joint name.
+#                   namespace does not include colon.
+def SIP_ReturnOrigin(ns):
+    origins = SIP_ReturnOrigins(ns)
+
+    if len(origins) == 1:
+        return origins[0]
+
+    if len(origins) > 1:
+        cmds.warning("Multiple origins found for namespace \"" + ns + "\": " + ", ".join(origins) + "\n")
+
+    return "Error"
+
+
+# UUIDs of the nodes tagged as garbage during this session, so they can be deleted without searching the scene.
+_SIP_GarbageRegistry = []
+
+
+# PURPOSE:          Removes all nodes tagged as garbage.
+# PROCEDURE:        Resolve the nodes recorded by SIP_TagForGarbage and delete them with one delete call.
+#                   If sceneScan is true, also list every node of any type with the "deleteMe" attribute in one
+#                   query, so nodes left over from a crashed or previous session get cleaned up too.
+#                   Nodes in keep, like export rigs that are still to be exported, are left and stay recorded.
+# PRESEUMPTIONS:    The deleteMe attribute is the correct name of the attribute signifying garbage.
+def SIP_ClearGarbage(sceneScan=False, keep=None):
+    garbage = []
+    keepUUIDs = (cmds.ls(keep, uuid=True) or []) if keep else []
+    registered = [cur for cur in _SIP_GarbageRegistry if cur not in keepUUIDs]
+
+    # ls with no names lists the whole scene.
+    if registered:
+        garbage = cmds.ls(registered, long=True) or []
+        _SIP_GarbageRegistry[:] = [cur for cur in _SIP_GarbageRegistry if cur in keepUUIDs]
+
+    if sceneScan:
+        stale = cmds.ls("*.deleteMe", recursive=True, objectsOnly=True, long=True)
+
+        if stale:
+            kept = (cmds.ls(keep, long=True) or []) if keep else []
+            garbage.extend(cur for cur in stale if cur not in garbage and cur not in kept)
+
+    if garbage:
+        cmds.delete(garbage)
+
+
+# PURPOSE:          Tag objects for being garbage.
+# PROCEDURE:        If node is valid object and attribute does not exist, add deleteMe attribute.
+#                   Record the node's UUID in the garbage registry for SIP_ClearGarbage.
+# PRESUMPTIONS:     None.
+def SIP_TagForGarbage(node):
+    if cmds.objExists(node) and not cmds.objExists(node + ".deleteMe"):
+        cmds.addAttr(node, shortName="del", longName="deleteMe", at="bool")
+        cmds.setAttr(node + ".deleteMe", True)
+        _SIP_GarbageRegistry.extend(cmds.ls(node, uuid=True))
+
+
+# Mesh transforms deformed by each character's deformers, keyed by (namespace, includeSkinned).
+_SIP_DeformedMeshCache = {}
+
+
+# PURPOSE:          Throw away the deformed mesh cache so the next lookup walks the graph again.
+# PROCEDURE:        Clear the cache. Takes *args so it can be used directly as a scene or DG callback.
+# PRESUMPTION:      None.
+def SIP_InvalidateDeformedMeshCache(*args):
+    _SIP_DeformedMeshCache.clear()
+
+
+# PURPOSE:          Return the mesh transforms deformed by a character's blendshapes, and optionally skinClusters.
+# PROCEDURE:        List the namespace's blendShape (and skinCluster) nodes, take the meshes in their future history
+#                   in one query and return their parent transforms without duplicates. The result is cached per
+#                   character until references, scenes or deformers change (see SIP_AddSceneCacheCallbacks).
+# PRESUMPTION:      Character has a valid namespace, and namespace does not have colon.
+#                   Only exporting polygonal meshes.
+def SIP_FindDeformedMeshes(ns, includeSkinned=False):
+    SIP_AddSceneCacheCallbacks()
+    key = (ns, includeSkinned)
+
+    if key not in _SIP_DeformedMeshCache:
+        deformerTypes = ["blendShape", "skinCluster"] if includeSkinned else ["blendShape"]
+        deformers = cmds.ls((ns + ":*"), type=deformerTypes)
+        transforms = []
+
+        if deformers:
+            meshes = cmds.ls(cmds.listHistory(deformers, future=True) or [], type="mesh")
+
+            if meshes:
+                for curTransform in cmds.listRelatives(meshes, parent=True) or []:
+                    if curTransform not in transforms:
+                        transforms.append(curTransform)
+
+        _SIP_DeformedMeshCache[key] = transforms
+
+    return list(_SIP_DeformedMeshCache[key])
+
+
+# PURPOSE:          Return the meshes connected to blendshape nodes.
+# PROCEDURE:        Call SIP_FindDeformedMeshes for blendShapes only.
+# PRESUMPTION:      Character has a valid namespace, and namespace does not have colon.
+#                   Only exporting polygonal meshes.
+def SIP_FindMeshWithBlendshapes(ns):
+    return SIP_FindDeformedMeshes(ns)
+
+
+
+#######################################
+#
+#    Export settings node procs
+#
+#######################################
+
+
+
+# PURPOSE:          Return all export nodes connected to given origin.
+# PROCEDURE:        If origin is valid and has the exportNode attribute, return list of export nodes connected to it.
+# PRESUMPTION:      Only export nodes are connected to exportNode attribute.
+def SIP_ReturnFBXExportNodes(origin):
+    exportNodeList = []
+
+    if cmds.objExists(origin + ".exportNode"):
+        exportNodeList = cmds.listConnections(origin + ".exportNode")
+
+    return exportNodeList
+
+
+# PURPOSE:          Connect the fbx export node to the origin.
+# PROCEDURE:        Check if attributes exist in nodes are valid, if they are, connect attributes.
+# PRESUMPTIONS:     None.
+def SIP_ConnectFBXExportNodeToOrigin(exportNode, origin):
+    if cmds.objExists(origin) and cmds.objExists(exportNode):
+        if not cmds.objExists(origin + ".exportNode"):
+            SIP_TagForExportNode(origin)
+        if not cmds.objExists(exportNode + ".exportNode"):
+            SIP_AddFBXNodeAttrs(fbxExportNode)
+        cmds.connectAttr(origin + ".exportNode", exportNode + ".exportNode")
+
+
+# PURPOSE:          Delete given export node.
+# PROCEDURE:        If object exists, delete.
+# PRESUMPTION:      none.
+def SIP_DeleteFBXExportNode(exportNode):
+    if cmds.objExists(exportNode):
+        cmds.delete(exportNode)
+
+
+# Bump when attributes are added to the export node so older nodes get upgraded the next time they are touched.
+SIP_FBXExportNodeSchemaVersion = 3
+
+# FBX file version stamped on export nodes when they get the fbxFileVersion attribute, so every machine writes the
+# same version no matter what its plugin defaults to.
+SIP_FBXDefaultFileVersion = "FBX201800"
+
+# Attributes added to every export node, as (longName, shortName, attributeType, dataType).
+_SIP_FBXExportNodeAttrs = [("export", None, "bool", None),
+                           ("moveToOrigin", None, "bool", None),
+                           ("zeroOrigin", None, "bool", None),
+                           ("exportName", None, None, "string"),
+                           ("useSubRange", None, "bool", None),
+                           ("startFrame", None, "float", None),
+                           ("endFrame", None, "float", None),
+                           ("exportMeshes", None, "message", None),
+                           ("exportNode", "xnd", "message", None),
+                           ("animLayers", None, None, "string"),
+                           ("fbxOptions", None, None, "string"),
+                           ("fbxAscii", None, "bool", None),
+                           ("fbxFileVersion", None, None, "string"),
+                           ("fbxEmbedMedia", None, "bool", None)]
+
+# Settings stored on an export node. Read them with SIP_ReturnFBXExportSettings, change them with _replace and
+# write them back with SIP_WriteFBXExportSettings. Being a namedtuple it is immutable and has no per-instance dict.
+SIP_FBXExportSettings = collections.namedtuple("SIP_FBXExportSettings",
+                                               ["export", "moveToOrigin", "zeroOrigin", "exportName",
+                                                "useSubRange", "startFrame", "endFrame", "animLayers",
+                                                "fbxOptions", "fbxAscii", "fbxFileVersion", "fbxEmbedMedia"])
+
+# Settings read off an export node that does not have their attribute yet: the values SIP_AddFBXNodeAttrs gives them.
+SIP_FBXExportSettingDefaults = SIP_FBXExportSettings(export=False, moveToOrigin=False, zeroOrigin=False, exportName="",
+                                                     useSubRange=False, startFrame=0.0, endFrame=0.0, animLayers="",
+                                                     fbxOptions="", fbxAscii=False,
+                                                     fbxFileVersion=SIP_FBXDefaultFileVersion, fbxEmbedMedia=False)
+
+
+# PURPOSE:          Return the schema version stored on the export node, 0 if it was never stamped.
+# PROCEDURE:        Look the attribute up on the MFnDependencyNode so no commands are run.
+# PRESUMPTION:      fbxExportNode is a valid, unique node name.
+def SIP_ReturnFBXExportNodeSchemaVersion(fbxExportNode):
+    nodeFn = SIP_ReturnDependNodeFns([fbxExportNode])[0]
+
+    if not nodeFn.hasAttribute("fbxExportSchema"):
+        return 0
+
+    return nodeFn.findPlug("fbxExportSchema", False).asInt()
+
+
+# PURPOSE:          To add the attributes to the export node to store our export settings.
+# PROCEDURE:        If the node is already stamped with the current schema version there is nothing to do.
+#                   Otherwise, for each attribute we want to add, check if it exists. If it doesn't exist, add.
+#                   A new fbxFileVersion gets SIP_FBXDefaultFileVersion. Then stamp the node with the schema version.
+# PRESUMPTION:      Assume fbxExportNode is a valid object.
+def SIP_AddFBXNodeAttrs(fbxExportNode):
+    if SIP_ReturnFBXExportNodeSchemaVersion(fbxExportNode) >= SIP_FBXExportNodeSchemaVersion:
+        return
+
+    for longName, shortName, attrType, dataType in _SIP_FBXExportNodeAttrs:
+        if cmds.attributeQuery(longName, node=fbxExportNode, exists=True):
+            continue
+
+        flags = {"longName": longName}
+        if shortName:
+            flags["shortName"] = shortName
+        if attrType:
+            flags["at"] = attrType
+        else:
+            flags["dt"] = dataType
+        cmds.addAttr(fbxExportNode, **flags)
+
+        if longName == "fbxFileVersion":
+            cmds.setAttr(fbxExportNode + ".fbxFileVersion", SIP_FBXDefaultFileVersion, type="string")
+
+    if not cmds.attributeQuery("fbxExportSchema", node=fbxExportNode, exists=True):
+        cmds.addAttr(fbxExportNode, longName="fbxExportSchema", at="long")
+    cmds.setAttr(fbxExportNode + ".fbxExportSchema", SIP_FBXExportNodeSchemaVersion)
+
+
+# PURPOSE:          Read every export setting on the export node in one pass.
+# PROCEDURE:        Read each plug straight off the MFnDependencyNode instead of running a getAttr per setting. A
+#                   setting whose attribute the node does not have yet reads as SIP_FBXExportSettingDefaults, so
+#                   reading never edits the scene.
+# PRESUMPTION:      exportNode is a valid, unique node name.
+def SIP_ReturnFBXExportSettings(exportNode):
+    nodeFn = SIP_ReturnDependNodeFns([exportNode])[0]
+
+    def value(name, reader):
+        if not nodeFn.hasAttribute(name):
+            return getattr(SIP_FBXExportSettingDefaults, name)
+
+        return reader(nodeFn.findPlug(name, False))
+
+    return SIP_FBXExportSettings(export=value("export", om.MPlug.asBool),
+                                 moveToOrigin=value("moveToOrigin", om.MPlug.asBool),
+                                 zeroOrigin=value("zeroOrigin", om.MPlug.asBool),
+                                 exportName=value("exportName", om.MPlug.asString),
+                                 useSubRange=value("useSubRange", om.MPlug.asBool),
+                                 startFrame=value("startFrame", om.MPlug.asFloat),
+                                 endFrame=value("endFrame", om.MPlug.asFloat),
+                                 animLayers=value("animLayers", om.MPlug.asString),
+                                 fbxOptions=value("fbxOptions", om.MPlug.asString),
+                                 fbxAscii=value("fbxAscii", om.MPlug.asBool),
+                                 fbxFileVersion=value("fbxFileVersion", om.MPlug.asString),
+                                 fbxEmbedMedia=value("fbxEmbedMedia", om.MPlug.asBool))
+
+
+# PURPOSE:          Write export settings back to the export node.
+# PROCEDURE:        Bring the node up to date with the schema with SIP_AddFBXNodeAttrs. Compare against the settings
+#                   currently on the node (or the given previous settings) and only setAttr the fields that changed.
+#                   setAttr is used so the edits stay undoable from the UI. Returns the names of the fields that
+#                   were written.
+# PRESUMPTION:      exportNode is a valid, unique node name and settings is a SIP_FBXExportSettings.
+def SIP_WriteFBXExportSettings(exportNode, settings, previous=None):
+    SIP_AddFBXNodeAttrs(exportNode)
+
+    if previous is None:
+        previous = SIP_ReturnFBXExportSettings(exportNode)
+
+    changed = []
+    for curField in SIP_FBXExportSettings._fields:
+        value = getattr(settings, curField)
+        if value == getattr(previous, curField):
+            continue
+
+        if curField in ("exportName", "animLayers", "fbxOptions", "fbxFileVersion"):
+            cmds.setAttr(exportNode + "." + curField, value or "", type="string")
+        else:
+            cmds.setAttr(exportNode + "." + curField, value)
+        changed.append(curField)
+
+    return changed
+
+
+# PURPOSE:          Create the export node to store our export settings.
+# PROCEDURE:        Create an empty transform node, send it to SIP_AddFBXNodeAttrs to add the needed attributes.
+# PRESUMPTION:      None.
+def SIP_CreateFBXExportNode(characterName):
+    fbxExportNode = cmds.group(em=True, name=characterName + "FBXExportNode#")
+    SIP_AddFBXNodeAttrs(fbxExportNode)
+    cmds.setAttr(fbxExportNode+".export", 1)
+    return fbxExportNode
+
+
+
+
+######################################
+#
+#    Model export procs
+#
+######################################
+
+
+
+# PURPOSE:          To connect meshes to the export node so the exporter can find them.
+# PROCEDURE:        Check to make sure meshes and exportNode is valid, check for attribute "exportNode".
+#                   If no attribute, add it. Then connect attributes.
+# PRESUMPTION:      exportNode is an actual exportNode, and meshes is a list of transform nodes for polygon meshes.
+def SIP_ConnectFBXExportNodeToMeshes(exportNode, meshes):
+
+    if cmds.objExists(exportNode):
+        if not cmds.objExists(exportNode + ".exportMeshes"):
+            SIP_AddFBXNodeAttrs(exportNode)
+
+        for curMesh in meshes:
+            if cmds.objExists(curMesh):
+                if not cmds.objExists(curMesh + ".exportMeshes"):
+                    SIP_TagForMeshExport(curMesh)
+
+                cmds.connectAttr(exportNode + ".exportMeshes", curMesh + ".exportMeshes", force=True)
+
+
+
+# PURPOSE:          To disconnect the message attribute between the export node and the meshes.
+# PROCEDURE:        Itterate through list of meshes and if mesh exists, disconnect.
+# PRESUMPTION:      That node and mesh are connected via export exportMeshes message attr.
+def SIP_DisconnectFBXExporterNodeToMeshes(exportNode, meshes):
+    if cmds.objExists(exportNode):
+        for curMesh in meshes:
+            if cmds.objExists(curMesh):
+                cmds.disconnectAttr(exportNode + ".exportMeshes", curMesh + ".exportMeshes")
+
+
+# PURPOSE:          Return a list of meshes connected to the export node.
+# PROCEDURE:        List connections to exportNode attribute.
+# PRESUMPTION:      exportMeshes attribute is used to connect to export meshes, exportMeshes are valid.
+def SIP_ReturnConnectedMeshes(exportNode):
+    meshes = cmds.listConnections((exportNode + ".exportMeshes"), source=False, destination=True)
+    return meshes
+
+
+
+######################################
+#
+#    Anim curve procs
+#
+######################################
+
+
+# Set to False to always pre-bake export rigs with bakeResults. When every channel of a skeleton is keyed directly, like
+# a mocap take, its curves are sampled and written onto the export rig instead (see SIP_CurvePreBakeExportRig).
+SIP_CurvePreBake = True
+
+_SIP_BakeChannels = ["translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ", "scaleX", "scaleY",
+                     "scaleZ"]
+
+# Plugs an export skeleton is connected to its source through, long and short names.
+_SIP_BakePlugs = _SIP_BakeChannels + ["translate", "rotate", "scale", "t", "r", "s", "tx", "ty", "tz", "rx", "ry",
+                                      "rz", "sx", "sy", "sz"]
+
+
+# PURPOSE:          Return what a curve's values are multiplied by to go from UI units to the API's internal units.
+# PROCEDURE:        Angles and distances depend on the scene's units, everything else is unitless.
+# PRESUMPTION:      curveType is an MFnAnimCurve curve type.
+def SIP_ReturnAnimCurveUnitScale(curveType):
+    if curveType in [om.MFnAnimCurve.kAnimCurveTA, om.MFnAnimCurve.kAnimCurveUA]:
+        return om.MAngle.uiToInternal(1.0)
+
+    if curveType in [om.MFnAnimCurve.kAnimCurveTL, om.MFnAnimCurve.kAnimCurveUL]:
+        return om.MDistance.uiToInternal(1.0)
+
+    return 1.0
+
+
+# PURPOSE:          Create or replace the anim curves of many plugs from arrays of keys.
+# PROCEDURE:        Resolve every plug in one MSelectionList and disconnect whatever feeds them, or their parent
+#                   compound, that is not an anim curve in one DG modifier. Then take each plug's curve, or create one,
+#                   and give it all its keys in one MFnAnimCurve.addKeys call with keepExistingKeys off, so they
+#                   replace the curve's keys. The time array is built once for all the curves. No commands are run, so
+#                   nothing goes on the undo queue. Returns the curves' names.
+# PRESUMPTION:      plugs are keyable. times are sorted frames, values holds one sequence per plug, as long as times,
+#                   in UI units.
+def SIP_WriteAnimCurves(plugs, times, values):
+    selList = om.MSelectionList()
+
+    for cur in plugs:
+        selList.add(cur)
+
+    destPlugs = [selList.getPlug(index) for index in range(selList.length())]
+    modifier = om.MDGModifier()
+    disconnected = set()
+
+    for curPlug in destPlugs:
+        if curPlug.isChild:
+            parentPlug = curPlug.parent()
+            parentSource = parentPlug.source()
+
+            if not parentSource.isNull and parentPlug.name() not in disconnected:
+                modifier.disconnect(parentSource, parentPlug)
+                disconnected.add(parentPlug.name())
+
+        source = curPlug.source()
+
+        if not source.isNull and not source.node().hasFn(om.MFn.kAnimCurve):
+            modifier.disconnect(source, curPlug)
+
+    modifier.doIt()
+
+    timeUnit = om.MTime.uiUnit()
+    timeArray = om.MTimeArray([om.MTime(cur, timeUnit) for cur in times])
+    curves = []
+
+    for curPlug, curValues in zip(destPlugs, values):
+        source = curPlug.source()
+        curveFn = om.MFnAnimCurve()
+
+        if source.isNull:
+            curveFn.create(curPlug)
+        else:
+            curveFn.setObject(source.node())
+
+        scale = SIP_ReturnAnimCurveUnitScale(curveFn.animCurveType)
+        curveFn.addKeys(timeArray, om.MDoubleArray([cur * scale for cur in curValues]), keepExistingKeys=False)
+        curves.append(curveFn.name())
+
+    return curves
+
+
+# PURPOSE:          Evaluate anim curves on every given frame.
+# PROCEDURE:        One keyframe -eval query for all the curves, which returns the values curve by curve.
+#                   Returns {curve: values}, or None if the query did not return a value per curve and frame.
+# PRESUMPTION:      curves are anim curve names, frames is a list of frames.
+def SIP_SampleAnimCurves(curves, frames):
+    uniqueCurves = []
+
+    for cur in curves:
+        if cur not in uniqueCurves:
+            uniqueCurves.append(cur)
+
+    if not uniqueCurves or not frames:
+        return {}
+
+    values = cmds.keyframe(uniqueCurves, query=True, eval=True, time=frames) or []
+
+    if len(values) != len(uniqueCurves) * len(frames):
+        return None
+
+    count = len(frames)
+    return dict((cur, values[index * count:(index + 1) * count]) for index, cur in enumerate(uniqueCurves))
+
+
+# PURPOSE:          Pre-bake export rigs from the curves of their source skeletons, without stepping through time.
+# PROCEDURE:        List what connects the rigs to their source joints, then what feeds the source joints' translate,
+#                   rotate and scale, in one query each. If any of those channels is fed by something other than a
+#                   time based anim curve (a rig, a constraint, an animLayer blend), return False: the rig needs a
+#                   simulation bake. Otherwise sample every curve at the times bakeResults would with
+#                   SIP_SampleAnimCurves, read the unkeyed channels once off the API and write all of it onto the
+#                   export rigs with SIP_WriteAnimCurves. Returns True if the rigs were baked.
+# PRESUMPTION:      exportRig holds joints made by SIP_CopyAndConnectSkeleton, of one or more characters, that are still
+#                   connected to their source joints.
+def SIP_CurvePreBakeExportRig(exportRig, startFrame, endFrame):
+    connections = cmds.listConnections(exportRig, source=True, destination=False, connections=True, plugs=True) or []
+    sourceJoints = {}
+
+    for curDest, curSource in zip(connections[::2], connections[1::2]):
+        destNode, _, destAttr = curDest.partition(".")
+
+        if destAttr in _SIP_BakePlugs:
+            sourceJoints[destNode] = curSource.partition(".")[0]
+
+    if not sourceJoints or len(sourceJoints) != len(exportRig):
+        return False
+
+    sources = sorted(set(sourceJoints.values()))
+    connections = cmds.listConnections(sources, source=True, destination=False, connections=True, plugs=True) or []
+    feeds = {}
+
+    for curDest, curSource in zip(connections[::2], connections[1::2]):
+        if curDest.partition(".")[2] in _SIP_BakePlugs:
+            feeds[curDest] = curSource.partition(".")[0]
+
+    timeCurves = set(cmds.ls(list(feeds.values()), type=_SIP_TimeAnimCurveTypes) or []) if feeds else set()
+
+    # Compound plugs are only ever fed by something that is not a curve.
+    if any(cur not in timeCurves for cur in feeds.values()):
+        return False
+
+    # The times bakeResults samples: whole frames from the start frame, which can be fractional, up to the end frame.
+    frames = [float(startFrame) + cur for cur in range(int(math.floor(endFrame - startFrame)) + 1)]
+    samples = SIP_SampleAnimCurves(list(feeds.values()), frames)
+
+    if samples is None:
+        return False
+
+    plugs = []
+    values = []
+
+    for curSource, curFn in zip(sources, SIP_ReturnDependNodeFns(sources)):
+        staticValues = {}
+
+        for curChannel in _SIP_BakeChannels:
+            feed = feeds.get(curSource + "." + curChannel)
+
+            if feed is None:
+                plug = curFn.findPlug(curChannel, False)
+
+                if curChannel.startswith("rotate"):
+                    staticValues[curChannel] = [plug.asDouble() / om.MAngle.uiToInternal(1.0)] * len(frames)
+                elif curChannel.startswith("translate"):
+                    staticValues[curChannel] = [plug.asDouble() / om.MDistance.uiToInternal(1.0)] * len(frames)
+                else:
+                    staticValues[curChannel] = [plug.asDouble()] * len(frames)
+
+        for curDest in [cur for cur in sourceJoints if sourceJoints[cur] == curSource]:
+            for curChannel in _SIP_BakeChannels:
+                feed = feeds.get(curSource + "." + curChannel)
+                plugs.append(curDest + "." + curChannel)
+                values.append(samples[feed] if feed else staticValues[curChannel])
+
+    SIP_WriteAnimCurves(plugs, frames, values)
+    return True
+
+
+
+
+######################################
+#
+#    Animation export procs
+#
+######################################
+
+
+# Set to False to let the FBX plugin bake every export node from the live rig instead of baking the export rig once
+# over the union of all export node ranges and exporting slices of it.
+SIP_PreBakeAnimation = True
+
+# Set to False to pre-bake each character's export rig in its own timeline pass when several characters are exported
+# together, instead of baking them all in one pass (see SIP_PreBakeCharacterExportRigs).
+SIP_SharedPreBake = True
+
+# Set to False to move export rigs to the origin with an override or additive animLayer (SIP_TransformToOrigin) instead
+# of rewriting the copied origin's curves (SIP_ExtractRootMotion). The additive layer offsets each channel on its own,
+# so a shifted origin that turns away from its start frame heading exports differently than with the matrix math of
+# SIP_ReturnRootMotion.
+SIP_ArrayRootMotion = True
+
+# Set to an attribute name to also key the root motion, relative to each clip's start frame, onto the exported origin
+# as <name>TranslateX to <name>RotateZ, for engines that read root motion from curves.
+SIP_RootMotionAttr = ""
+
+# Set to False to build export skeletons by duplicating the origin and using per-attribute cmds calls instead of
+# building joints directly and connecting them in one batched DG modifier.
+SIP_UseDGModifier = True
+
+_SIP_TransformAttrs = ["translate", "rotate", "scale"]
+
+_SIP_RootMotionChannels = ["translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ"]
+
+
+# PUPROSE:
+# PROCEDURE:
+# PRESUMPTION:
+def SIP_UnlockJointTransforms(root):
+    hierarchy = cmds.listRelatives(root, ad=True, f=True)
+
+    hierarchy.append(root)
+
+    for cur in hierarchy:
+        cmds.setAttr((cur + '.translateX'), lock=False)
+        cmds.setAttr((cur + '.translateY'), lock=False)
+        cmds.setAttr((cur + '.translateZ'), lock=False)
+        cmds.setAttr((cur + '.rotateX'), lock=False)
+        cmds.setAttr((cur + '.rotateY'), lock=False)
+        cmds.setAttr((cur + '.rotateZ'), lock=False)
+        cmds.setAttr((cur + '.scaleX'), lock=False)
+        cmds.setAttr((cur + '.scaleY'), lock=False)
+        cmds.setAttr((cur + '.scaleZ'), lock=False)
+
+
+
+# PUPROSE:          Connect given node to another given node via specified transform.
+# PROCEDURE:        Call connectAttr
+# PRESUMPTION:      Assume that the 2 nodes exist and transform type is valid.
+def SIP_ConnectAttrs(sourceNode, destNode, transform):
+    cmds.connectAttr(sourceNode + "." + transform + "X", destNode + "." + transform + "X")
+    cmds.connectAttr(sourceNode + "." + transform + "Y", destNode + "." + transform + "Y")
+    cmds.connectAttr(sourceNode + "." + transform + "Z", destNode + "." + transform + "Z")
+
+
+# PURPOSE:          Return the MFnDependencyNode function sets for a list of node names.
+# PROCEDURE:        Add every name to one MSelectionList and wrap each depend node in a function set.
+# PRESUMPTION:      Every name exists and is unique.
+def SIP_ReturnDependNodeFns(nodes):
+    selList = om.MSelectionList()
+
+    for cur in nodes:
+        selList.add(cur)
+
+    return [om.MFnDependencyNode(selList.getDependNode(index)) for index in range(selList.length())]
+
+
+# PURPOSE:          Connect the translates, rotates and scales of one list of joints to another in one DG modifier.
+# PROCEDURE:        Queue a connection per compound plug. If the destination compound or any of its children is
+#                   already connected, queue the X, Y and Z children instead. Run the modifier once.
+# PRESUMPTION:      Both lists are the same length and ordered so that matching indices are the same joint.
+def SIP_ConnectSkeletonsDG(sourceJoints, destJoints):
+    modifier = om.MDGModifier()
+
+    for sourceFn, destFn in zip(SIP_ReturnDependNodeFns(sourceJoints), SIP_ReturnDependNodeFns(destJoints)):
+        for curAttr in _SIP_TransformAttrs:
+            sourcePlug = sourceFn.findPlug(curAttr, False)
+            destPlug = destFn.findPlug(curAttr, False)
+            childPlugs = [destPlug.child(index) for index in range(destPlug.numChildren())]
+
+            if destPlug.isDestination or any(cur.isDestination for cur in childPlugs):
+                for index in range(len(childPlugs)):
+                    if not childPlugs[index].isDestination:
+                        modifier.connect(sourcePlug.child(index), childPlugs[index])
+            else:
+                modifier.connect(sourcePlug, destPlug)
+
+    modifier.doIt()
+    return modifier
+
+
+
+# Static joint attributes copied from the source joints when building an export skeleton.
+_SIP_JointAngleAttrs = ["jointOrientX", "jointOrientY", "jointOrientZ", "rotateAxisX", "rotateAxisY", "rotateAxisZ"]
+
+
+# PURPOSE:          Build a joint-only copy of the origin's skeleton without duplicating meshes, constraints or anything
+#                   else under it.
+# PROCEDURE:        List the origin's joints by full path. In one DAG modifier, create a joint for each, named like the
+#                   source without its namespace, in the root namespace, and parented under the copy of its nearest
+#                   joint ancestor (the root goes under the world). Copies never share a namespace and short name with
+#                   the character's joints, so looking either up by name is not ambiguous.
+#                   Then copy joint orient, rotate axis, rotate order and segment scale compensate from the source and
+#                   connect each copy's inverseScale to its parent's scale, the way the joint command does.
+# PRESUMPTION:      origin is a valid joint. Copies are paired with their sources by full path, not by list order.
+#                   Returns the source joints and the matching copies, both with the root last.
+def SIP_BuildExportSkeleton(origin):
+    originPath = cmds.ls(origin, long=True)[0]
+    sourceJoints = cmds.listRelatives(originPath, ad=True, type="joint", fullPath=True) or []
+    sourceJoints.append(originPath)
+
+    sourceFns = dict(zip(sourceJoints, SIP_ReturnDependNodeFns(sourceJoints)))
+    copies = {}
+    parents = {}
+    modifier = om.MDagModifier()
+
+    # Parents first, so every joint's parent copy exists when it is created.
+    for curJoint in sorted(sourceJoints, key=lambda cur: cur.count("|")):
+        parentJoint = curJoint.rpartition("|")[0]
+
+        while parentJoint and parentJoint not in copies:
+            parentJoint = parentJoint.rpartition("|")[0]
+
+        if parentJoint:
+            parents[curJoint] = parentJoint
+            copies[curJoint] = modifier.createNode("joint", copies[parentJoint])
+        else:
+            copies[curJoint] = modifier.createNode("joint")
+
+        modifier.renameNode(copies[curJoint], ":" + curJoint.rpartition("|")[2].rpartition(":")[2])
+
+    modifier.doIt()
+
+    for curJoint in sourceJoints:
+        sourceFn = sourceFns[curJoint]
+        newFn = om.MFnDependencyNode(copies[curJoint])
+
+        for curAttr in _SIP_JointAngleAttrs:
+            modifier.newPlugValueMAngle(newFn.findPlug(curAttr, False), sourceFn.findPlug(curAttr, False).asMAngle())
+
+        modifier.newPlugValueInt(newFn.findPlug("rotateOrder", False),
+                                 sourceFn.findPlug("rotateOrder", False).asInt())
+        modifier.newPlugValueBool(newFn.findPlug("segmentScaleCompensate", False),
+                                  sourceFn.findPlug("segmentScaleCompensate", False).asBool())
+
+        if curJoint in parents:
+            parentFn = om.MFnDependencyNode(copies[parents[curJoint]])
+            modifier.connect(parentFn.findPlug("scale", False), newFn.findPlug("inverseScale", False))
+
+    modifier.doIt()
+
+    newJoints = [om.MDagPath.getAPathTo(copies[cur]).partialPathName() for cur in sourceJoints]
+    return sourceJoints, newJoints
+
+
+# PURPOSE:          To copy the skeleton and connect the copy to the original bind.
+# PROCEDURE:        Build a joint-only copy of the skeleton under the world with SIP_BuildExportSkeleton and connect the
+#                   translates, rotates, and scales in one DG modifier. Add deleteMe attr.
+#                   If useDGModifier (or SIP_UseDGModifier when not given) is False, use the original cmds path:
+#                   duplicate hierarchy, delete everything that is not a joint, unlock all the joints, connect per
+#                   attribute and parent the copy to the world.
+# PRESUMPTION:      No joints are children of anything but other joints.
+#                   Returns the new joints with the new root last.
+def SIP_CopyAndConnectSkeleton(origin, useDGModifier=None):
+    newHierarchy = []
+
+    if useDGModifier is None:
+        useDGModifier = SIP_UseDGModifier
+
+    if origin != "Error" and cmds.objExists(origin):
+        if useDGModifier:
+            origHierarchy, newHierarchy = SIP_BuildExportSkeleton(origin)
+            SIP_ConnectSkeletonsDG(origHierarchy, newHierarchy)
+        else:
+            dupHierarchy = cmds.duplicate(origin)
+            tempHierarchy = cmds.listRelatives(dupHierarchy[0], allDescendents=True, f=True)
+
+            for cur in tempHierarchy:
+                if cmds.objExists(cur):
+                    if cmds.objectType(cur) != "joint":
+                        cmds.delete(cur)
+
+            SIP_UnlockJointTransforms(dupHierarchy[0])
+
+            origHierarchy = cmds.listRelatives(origin, ad=True, type="joint") or []
+            newHierarchy = cmds.listRelatives(dupHierarchy[0], ad=True, type="joint") or []
+
+            origHierarchy.append(origin)
+            newHierarchy.append(dupHierarchy[0])
+
+            for index in range(len(origHierarchy)):
+                SIP_ConnectAttrs(origHierarchy[index], newHierarchy[index], "translate")
+                SIP_ConnectAttrs(origHierarchy[index], newHierarchy[index], "rotate")
+                SIP_ConnectAttrs(origHierarchy[index], newHierarchy[index], "scale")
+
+            newHierarchy[-1] = cmds.parent(dupHierarchy[0], world=True)[0]
+
+        SIP_TagForGarbage(newHierarchy[-1])
+
+    return newHierarchy
+
+
+
+# PURPOSE:          Translate export skeleton to origin. May or may not kill origin animation depending on input.
+# PROCEDURE:        Bake the animation onto the origin. Create an animLayer. animLayer will either be additive or
+#                   override depending on parameters we pass it. Add deleteMe attr to animLayer. Go to the start frame
+#                   and move to origin there, so the additive layer's offset is the start frame's pose and not the
+#                   pose under the playhead. Return the animLayer so SIP_ResetExportRig can remove it.
+#                   Pass bake=False when the origin is already baked, e.g. by SIP_PreBakeExportRig.
+# PRESUMPTION:      Origin is valid, end frame is greater than start frame, zeroOrigin is boolean.
+def SIP_TransformToOrigin(origin, startFrame, endFrame, zeroOrigin, bake=True):
+    if bake:
+        cmds.bakeResults(origin, t=(startFrame, endFrame),
+                         at=["rx", "ry", "rz", "sx", "sy", "sz", "tx", "ty", "tz"], hi="none")
+
+    cmds.select(clear=True)
+    cmds.select(origin)
+    newAnimLayer=""
+
+    if zeroOrigin:
+        # Kills origin animation.
+        newAnimLayer = cmds.animLayer(aso=True, mute=False, solo=False, override=True, passthrough=True, lock=False)
+        cmds.setAttr(newAnimLayer + ".rotationAccumulationMode", 0)
+        cmds.setAttr(newAnimLayer + ".scaleAccumulationMode", 1)
+    else:
+        # Shifts the origin animation.
+        newAnimLayer = cmds.animLayer(aso=True, mute=False, solo=False, override=False, passthrough=False, lock=False)
+
+    SIP_TagForGarbage(newAnimLayer)
+
+    # Turn animLayer on.
+    cmds.animLayer(newAnimLayer, edit=True, weight=1)
+    cmds.setKeyframe(newAnimLayer + ".weight")
+
+    # Move origin animation to world origin. The layer keys the offset from the pose at the current time.
+    cmds.currentTime(startFrame, edit=True)
+    cmds.setAttr(origin + ".translate", 0, 0, 0)
+    cmds.setAttr(origin + ".rotate", 0, 0, 0)
+    cmds.setKeyframe(origin, al=newAnimLayer, t=startFrame)
+
+    return newAnimLayer
+
+
+# PURPOSE:          Compute moved root motion from sampled origin channels.
+# PROCEDURE:        samples is a channels by frames matrix of the origin's translate and rotate, in UI units. Build the
+#                   origin's matrix on every frame from them, its rotate order, rotate axis and joint orient, and
+#                   multiply it by the inverse of the start frame's matrix. That is the motion relative to the start
+#                   frame, in the start frame's space, so translation follows the origin's heading. Decompose it back
+#                   into channels, each rotation taken as the solution closest to the channels' own change since the
+#                   start frame so curves do not flip. zeroOrigin moves every frame to the identity. Returns the moved
+#                   channels and the channels relative to the start frame, as lists of lists.
+#                   The animLayer of SIP_TransformToOrigin offsets each channel on its own instead, so the two only
+#                   agree while the origin does not rotate away from its start frame heading.
+# PRESUMPTION:      Every channel has a sample on the same frames, startIndex is the start frame's column. The origin
+#                   is parented to the world. Angles are in UI units.
+def SIP_ReturnRootMotion(samples, startIndex, zeroOrigin, rotateOrder=0, jointOrient=(0.0, 0.0, 0.0),
+                         rotateAxis=(0.0, 0.0, 0.0)):
+    angle = om.MAngle.uiToInternal(1.0)
+    axisMatrix = om.MEulerRotation([cur * angle for cur in rotateAxis]).asMatrix()
+    orientMatrix = om.MEulerRotation([cur * angle for cur in jointOrient]).asMatrix()
+    axisInverse = axisMatrix.inverse()
+    orientInverse = orientMatrix.inverse()
+
+    def originMatrix(index):
+        rotation = om.MEulerRotation(samples[3][index] * angle, samples[4][index] * angle, samples[5][index] * angle,
+                                     rotateOrder)
+        transform = om.MTransformationMatrix(axisMatrix * rotation.asMatrix() * orientMatrix)
+        transform.setTranslation(om.MVector(samples[0][index], samples[1][index], samples[2][index]),
+                                 om.MSpace.kTransform)
+        return transform.asMatrix()
+
+    def channels(matrix, guess):
+        translation = om.MTransformationMatrix(matrix).translation(om.MSpace.kTransform)
+        rotation = om.MTransformationMatrix(axisInverse * matrix * orientInverse).rotation().reorder(rotateOrder)
+        rotation = rotation.closestSolution(om.MEulerRotation([cur * angle for cur in guess], rotateOrder))
+        return [translation[0], translation[1], translation[2], rotation[0] / angle, rotation[1] / angle,
+                rotation[2] / angle]
+
+    startInverse = originMatrix(startIndex).inverse()
+    relativeFrames = []
+
+    for index in range(len(samples[0])):
+        guess = [samples[curChannel][index] - samples[curChannel][startIndex] for curChannel in range(3, 6)]
+        relativeFrames.append(channels(originMatrix(index) * startInverse, guess))
+
+    relative = [list(cur) for cur in zip(*relativeFrames)]
+
+    if zeroOrigin:
+        moved = [[cur] * len(samples[0]) for cur in channels(om.MMatrix(), [0.0, 0.0, 0.0])]
+    else:
+        moved = relative
+
+    return moved, relative
+
+
+# PURPOSE:          Move an export rig's origin to the world origin without an animLayer.
+# PROCEDURE:        Bake the origin unless it is already baked. Read its translate and rotate curves once, compute the
+#                   zeroed or shifted channels from its matrices with SIP_ReturnRootMotion and write them back over
+#                   the curves with SIP_WriteAnimCurves. With SIP_RootMotionAttr set, key the motion relative to the
+#                   start frame onto added attributes too. The origin's curves stay plain keys, so a pre-baked rig
+#                   exports without the FBX plugin baking again.
+#                   Returns the root motion for SIP_ResetExportRig: the original samples and the attributes added.
+# PRESUMPTION:      Origin is the copied origin of an export rig, parented to the world, so its channels are its world
+#                   transform. End frame is greater than start frame, zeroOrigin is boolean.
+def SIP_ExtractRootMotion(origin, startFrame, endFrame, zeroOrigin, bake=True):
+    if bake:
+        cmds.bakeResults(origin, t=(startFrame, endFrame),
+                         at=["rx", "ry", "rz", "sx", "sy", "sz", "tx", "ty", "tz"], hi="none")
+
+    plugs = [origin + "." + cur for cur in _SIP_RootMotionChannels]
+    # Baking keys every channel on every frame of the bake, so they share their key times.
+    times = cmds.keyframe(plugs[0], query=True, timeChange=True) or []
+    samples = [cmds.keyframe(cur, query=True, valueChange=True) or [] for cur in plugs]
+    rootMotion = {"times": times, "samples": samples, "plugs": plugs, "attrs": []}
+
+    if not times or any(len(cur) != len(times) for cur in samples):
+        cmds.warning("Could not read the baked curves of " + origin + ", it is not moved to the origin.\n")
+        return rootMotion
+
+    startIndex = min(bisect.bisect_left(times, startFrame), len(times) - 1)
+    moved, relative = SIP_ReturnRootMotion(samples, startIndex, zeroOrigin, cmds.getAttr(origin + ".rotateOrder"),
+                                           cmds.getAttr(origin + ".jointOrient")[0],
+                                           cmds.getAttr(origin + ".rotateAxis")[0])
+
+    if SIP_RootMotionAttr:
+        for curChannel in _SIP_RootMotionChannels:
+            attrName = SIP_RootMotionAttr + curChannel[0].upper() + curChannel[1:]
+
+            if not cmds.objExists(origin + "." + attrName):
+                cmds.addAttr(origin, longName=attrName, keyable=True,
+                             attributeType="doubleAngle" if curChannel.startswith("rotate") else "doubleLinear")
+
+            rootMotion["attrs"].append(origin + "." + attrName)
+
+        SIP_WriteAnimCurves(plugs + rootMotion["attrs"], times, moved + relative)
+    else:
+        SIP_WriteAnimCurves(plugs, times, moved)
+
+    return rootMotion
+
+
+# PURPOSE:          Undo SIP_ExtractRootMotion on an export rig's origin.
+# PROCEDURE:        Delete the root motion attributes and their curves. If restore is true, write the original samples
+#                   back over the origin's curves.
+# PRESUMPTION:      rootMotion was returned by SIP_ExtractRootMotion.
+def SIP_RemoveRootMotion(rootMotion, restore):
+    attrs = [cur for cur in rootMotion["attrs"] if cmds.objExists(cur)]
+
+    if attrs:
+        curves = cmds.listConnections(attrs, source=True, destination=False, type="animCurve")
+
+        if curves:
+            cmds.delete(curves)
+
+        for curAttr in attrs:
+            cmds.deleteAttr(curAttr)
+
+    if restore and rootMotion["times"]:
+        SIP_WriteAnimCurves(rootMotion["plugs"], rootMotion["times"], rootMotion["samples"])
+
+
+# PURPOSE:          Put an export rig back into its just-built state so it can be reused for the next export node.
+# PROCEDURE:        Delete the animLayer made by SIP_TransformToOrigin, or remove the root motion written by
+#                   SIP_ExtractRootMotion. Unless the rig is pre-baked, also delete the curves baked onto the copied
+#                   origin and reconnect it to the original. A pre-baked origin gets its baked curves back instead.
+# PRESUMPTION:      exportRig was made by SIP_CopyAndConnectSkeleton from origin, so the copied origin is last.
+#                   originMove is an animLayer name, a root motion dict or empty.
+def SIP_ResetExportRig(origin, exportRig, originMove, preBaked=False):
+    newOrigin = exportRig[-1]
+
+    if isinstance(originMove, dict):
+        SIP_RemoveRootMotion(originMove, restore=preBaked)
+    elif originMove and cmds.objExists(originMove):
+        cmds.delete(originMove)
+
+    if preBaked:
+        return
+
+    bakedCurves = cmds.listConnections(newOrigin, source=True, destination=False, type="animCurve")
+
+    if bakedCurves:
+        cmds.delete(bakedCurves)
+
+    SIP_ConnectSkeletonsDG([origin], [newOrigin])
+
+
+# PURPOSE:          Bake translate, rotate and scale of every joint in the export rig over the range.
+# PROCEDURE:        One bakeResults in a single simulation pass, which replaces the connections to the original skeleton
+#                   with curves.
+# PRESUMPTION:      exportRig was made by SIP_CopyAndConnectSkeleton, end frame is greater than start frame.
+def SIP_BakeExportRig(exportRig, startFrame, endFrame):
+    cmds.bakeResults(exportRig, t=(startFrame, endFrame), simulation=True,
+                     at=["rx", "ry", "rz", "sx", "sy", "sz", "tx", "ty", "tz"], hi="none")
+
+
+# PURPOSE:          Bake the whole export rig once so export nodes can export slices of it without re-evaluating the
+#                   character.
+# PROCEDURE:        With useCurves (or SIP_CurvePreBake when not given), try SIP_CurvePreBakeExportRig, which writes the
+#                   source skeleton's sampled curves when it is keyed directly. Otherwise bake it with
+#                   SIP_BakeExportRig. The two are budgeted on their own, so the curve probe does not hide in the
+#                   bake's budget. Either way this replaces the connections to the original skeleton with curves.
+#                   Returns "curves" or "bakeResults". Callers that bake a rig more than once pass useCurves=False
+#                   after a "bakeResults", so a rig driven skeleton only pays for the probe once.
+# PRESUMPTION:      exportRig was made by SIP_CopyAndConnectSkeleton, end frame is greater than start frame.
+def SIP_PreBakeExportRig(exportRig, startFrame, endFrame, useCurves=None):
+    if useCurves is None:
+        useCurves = SIP_CurvePreBake
+
+    if useCurves and SIP_CurvePreBakeExportRig(exportRig, startFrame, endFrame):
+        return "curves"
+
+    SIP_BakeExportRig(exportRig, startFrame, endFrame)
+    return "bakeResults"
+
+
+# PURPOSE:          Check if any blendShape weight on the given meshes is driven by something other than keys.
+# PROCEDURE:        Find the blendShape nodes in the meshes' history and list what feeds their weights. Anything that
+#                   is not a time based anim curve (driven keys, expressions, rig connections) needs the FBX plugin
+#                   to bake it.
+# PRESUMPTION:      None.
+def SIP_HasDrivenBlendshapes(meshes):
+    if not meshes:
+        return False
+
+    blendshapes = cmds.ls(cmds.listHistory(meshes) or [], type="blendShape")
+
+    for curBlendshape in blendshapes:
+        sources = cmds.listConnections(curBlendshape + ".weight", source=True, destination=False) or []
+        keys = cmds.ls(sources, type=["animCurveTL", "animCurveTA", "animCurveTT", "animCurveTU"]) or []
+
+        if len(keys) != len(sources):
+            return True
+
+    return False
+
+
+
+
+######################################
+#
+#    AnimLayers procs
+#
+######################################
+
+
+# Version of the animLayer state recorded on export nodes. Strings without one are the old ;/,/= format.
+_SIP_AnimLayerStateVersion = 1
+
+
+# PURPOSE:          Snapshot the mute and solo state of every animLayer in the scene.
+# PROCEDURE:        List all the animLayers and read their mute and solo plugs off the API in one pass.
+#                   Returns a dict of layer name to (mute, solo).
+# PRESUMPTION:      None.
+def SIP_ReturnAnimLayerState():
+    animLayers = cmds.ls(type="animLayer") or []
+    state = {}
+
+    for curLayer, curFn in zip(animLayers, SIP_ReturnDependNodeFns(animLayers)):
+        state[curLayer] = (curFn.findPlug("mute", False).asBool(), curFn.findPlug("solo", False).asBool())
+
+    return state
+
+
+# PURPOSE:          Turn the animLayers string stored on an export node into an animLayer state.
+# PROCEDURE:        Versioned settings are json. Anything else is parsed as the old format, which uses ; to split
+#                   separate animLayers, , to split the fields of an animLayer and = to split attrs from their values.
+#                   Order is Layer, mute, solo. Returns a dict of layer name to (mute, solo).
+# PRESUMPTION:      None.
+def SIP_ParseAnimLayerSettings(animLayersString):
+    state = {}
+
+    if not animLayersString:
+        return state
+
+    try:
+        settings = json.loads(animLayersString)
+    except ValueError:
+        settings = None
+
+    if isinstance(settings, dict) and settings.get("version") == _SIP_AnimLayerStateVersion:
+        for curLayer, values in settings["layers"].items():
+            state[curLayer] = (bool(values[0]), bool(values[1]))
+        return state
+
+    for curEntry in animLayersString.split(";"):
+        fields = curEntry.split(",")
+
+        if len(fields) == 3:
+            state[fields[0].strip()] = (fields[1].split("=")[-1].strip() == "True",
+                                        fields[2].split("=")[-1].strip() == "True")
+
+    return state
+
+
+# PURPOSE:          Turn an animLayer state into the versioned string stored on an export node.
+# PROCEDURE:        Dump the state as json with the format version.
+# PRESUMPTION:      state is a dict of layer name to (mute, solo).
+def SIP_ReturnAnimLayerSettingsString(state):
+    layers = {}
+
+    for curLayer, values in state.items():
+        layers[curLayer] = [bool(values[0]), bool(values[1])]
+
+    return json.dumps({"version": _SIP_AnimLayerStateVersion, "layers": layers}, sort_keys=True)
+
+
+# PURPOSE:          Put the animLayers into the given state.
+# PROCEDURE:        Diff the state against the live state (or the given current state, if the caller tracks it) and
+#                   only edit the layers that differ and still exist. Returns the resulting live state.
+# PRESUMPTION:      state and current are dicts of layer name to (mute, solo).
+def SIP_ApplyAnimLayerState(state, current=None):
+    if current is None:
+        current = SIP_ReturnAnimLayerState()
+
+    current = dict(current)
+
+    for curLayer in sorted(state):
+        mute, solo = state[curLayer]
+
+        if curLayer not in current or current[curLayer] == (mute, solo):
+            continue
+
+        cmds.animLayer(curLayer, edit=True, mute=mute, solo=solo)
+        current[curLayer] = (mute, solo)
+
+    return current
+
+
+# PURPOSE:          Record the animLayer settings used in the animation and store in the exportNode.
+# PROCEDURE:        Snapshot the mute and solo state of every animLayer and store it as a versioned string.
+# PRESUMPTION:      None.
+def SIP_SetAnimLayerSettings(exportNode):
+    settings = SIP_ReturnFBXExportSettings(exportNode)
+    SIP_WriteFBXExportSettings(exportNode,
+                               settings._replace(animLayers=SIP_ReturnAnimLayerSettingsString(
+                                   SIP_ReturnAnimLayerState())),
+                               settings)
+
+
+# PURPOSE:          Return the animLayer state an export node exports with.
+# PROCEDURE:        Start from the given snapshot of the scene and override it with the layers recorded on the node.
+#                   Layers the node did not record keep their state from the snapshot.
+# PRESUMPTION:      sceneState comes from SIP_ReturnAnimLayerState.
+def SIP_ReturnExportAnimLayerState(animLayersString, sceneState):
+    state = dict(sceneState)
+    state.update(SIP_ParseAnimLayerSettings(animLayersString))
+    return state
+
+
+# PURPOSE:          Set the animLayers based on the settings recorded on the exportNode.
+# PROCEDURE:        Parse the recorded settings and apply only the layers that differ from the live state.
+# PRESUMPTION:      None.
+def SIP_SetAnimLayersFromSettings(exportNode):
+    if cmds.objExists(exportNode):
+        SIP_ApplyAnimLayerState(SIP_ParseAnimLayerSettings(SIP_ReturnFBXExportSettings(exportNode).animLayers))
+
+
+def SIP_ClearAnimLayerSettings(exportNode):
+    settings = SIP_ReturnFBXExportSettings(exportNode)
+    SIP_WriteFBXExportSettings(exportNode, settings._replace(animLayers=""), settings)
+
+
+# PURPOSE:          Put the animLayers back to a state returned by SIP_ReturnAnimLayerState.
+# PROCEDURE:        Apply the snapshot, touching only the layers that changed since it was taken.
+# PRESUMPTION:      None.
+def SIP_RestoreAnimLayerState(state, current=None):
+    return SIP_ApplyAnimLayerState(state, current)
+
+######################################
+#
+#    FBX option procs
+#
+######################################
+
+# Named FBX export option presets, as (FBXExport command, value) pairs applied in order. "$start" and "$end" are
+# replaced by the export range. FBXExportSplitAnimationIntoTakes takes a list of (take, start, end) and clears the
+# existing takes first. Export nodes set the output format with their fbxAscii, fbxFileVersion and fbxEmbedMedia
+# attributes and can override any other option with a json dict in their fbxOptions attribute.
+# Every preset sets the output format and leaves out content the engine doesn't use, so the plugin's defaults on the
+# exporting machine never change what gets written.
+_SIP_FBXOutputOptions = [("FBXExportInAscii", False),
+                         ("FBXExportFileVersion", SIP_FBXDefaultFileVersion),
+                         ("FBXExportEmbeddedTextures", False),
+                         ("FBXExportCameras", False),
+                         ("FBXExportLights", False),
+                         ("FBXExportAudio", False),
+                         ("FBXExportReferencedAssetsContent", False)]
+
+SIP_FBXOptionPresets = {
+    "animation": [("FBXExportAnimationOnly", False),
+                  ("FBXExportSplitAnimationIntoTakes", []),
+                  ("FBXExportBakeComplexAnimation", True),
+                  ("FBXExportBakeComplexStart", "$start"),
+                  ("FBXExportBakeComplexEnd", "$end"),
+                  ("FBXExportBakeResampleAnimation", True),
+                  ("FBXExportConstraints", False),
+                  ("FBXExportInputConnections", False),
+                  ("FBXExportShapes", True),
+                  ("FBXExportSmoothMesh", True)] + _SIP_FBXOutputOptions,
+    "animationPreBaked": [("FBXExportAnimationOnly", False),
+                          ("FBXExportBakeComplexAnimation", False),
+                          ("FBXExportSplitAnimationIntoTakes", [("Take 001", "$start", "$end")]),
+                          ("FBXExportDeleteOriginalTakeOnSplitAnimation", True),
+                          ("FBXExportConstraints", False),
+                          ("FBXExportInputConnections", False),
+                          ("FBXExportShapes", True),
+                          ("FBXExportSmoothMesh", True)] + _SIP_FBXOutputOptions,
+    "model": [("FBXExportSkins", True),
+              ("FBXExportSplitAnimationIntoTakes", []),
+              ("FBXExportShapes", True),
+              ("FBXExportSmoothingGroups", True),
+              ("FBXExportSmoothMesh", True),
+              ("FBXExportAnimationOnly", False),
+              ("FBXExportBakeComplexAnimation", False),
+              ("FBXExportBakeComplexStart", 0),
+              ("FBXExportBakeComplexEnd", 0),
+              ("FBXExportBakeResampleAnimation", True),
+              ("FBXExportConstraints", False),
+              ("FBXExportInputConnections", False)] + _SIP_FBXOutputOptions,
+}
+
+# The FBX options this session last sent to the plugin, command to value.
+_SIP_AppliedFBXOptions = {}
+
+# json gives unicode strings in Python 2.
+try:
+    _SIP_StringTypes = (str, unicode)
+except NameError:
+    _SIP_StringTypes = (str,)
+
+
+# PURPOSE:          Forget which FBX options were applied so the next apply sends every option.
+# PROCEDURE:        Clear the applied options.
+# PRESUMPTION:      None.
+def SIP_InvalidateFBXOptions(*args):
+    _SIP_AppliedFBXOptions.clear()
+
+
+# PURPOSE:          Return the FBX option overrides stored on an export node.
+# PROCEDURE:        Start with the output format recorded on the node, then add the json dict in the fbxOptions
+#                   setting. Warn and ignore fbxOptions if it does not parse.
+# PRESUMPTION:      settings are the export node's SIP_FBXExportSettings.
+def SIP_ReturnFBXOptionOverrides(settings):
+    overrides = {"FBXExportInAscii": settings.fbxAscii,
+                 "FBXExportFileVersion": settings.fbxFileVersion or SIP_FBXDefaultFileVersion,
+                 "FBXExportEmbeddedTextures": settings.fbxEmbedMedia}
+
+    if not settings.fbxOptions:
+        return overrides
+
+    try:
+        nodeOptions = json.loads(settings.fbxOptions)
+    except ValueError:
+        nodeOptions = None
+
+    if isinstance(nodeOptions, dict):
+        overrides.update(nodeOptions)
+    else:
+        cmds.warning("Ignoring invalid fbxOptions: " + settings.fbxOptions + "\n")
+
+    return overrides
+
+
+# PURPOSE:          Return the FBX options to export with.
+# PROCEDURE:        Start from the named preset, apply the overrides and fill in the export range.
+# PRESUMPTION:      preset is a key of SIP_FBXOptionPresets.
+def SIP_ReturnFBXOptions(preset, startFrame=0, endFrame=0, overrides=None):
+    frames = {"$start": int(startFrame), "$end": int(endFrame)}
+    options = collections.OrderedDict(SIP_FBXOptionPresets[preset])
+
+    if overrides:
+        options.update(overrides)
+
+    for curCommand, value in options.items():
+        if curCommand == "FBXExportSplitAnimationIntoTakes":
+            options[curCommand] = tuple((take, frames.get(start, start), frames.get(end, end))
+                                        for take, start, end in value)
+        else:
+            options[curCommand] = frames.get(value, value) if isinstance(value, _SIP_StringTypes) else value
+
+    return options
+
+
+# PURPOSE:          Return a signature of the FBX options, for the incremental export hash.
+# PROCEDURE:        Hash the options as sorted json.
+# PRESUMPTION:      options comes from SIP_ReturnFBXOptions.
+def SIP_ReturnFBXOptionsSignature(options):
+    return hashlib.sha1(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# PURPOSE:          Return the mel that sets one FBX option.
+# PROCEDURE:        Bools become 1/0, strings are quoted. Takes clear the existing takes and add each take.
+# PRESUMPTION:      None.
+def SIP_ReturnFBXOptionMel(command, value):
+    if command == "FBXExportSplitAnimationIntoTakes":
+        melStr = command + " -c;"
+
+        for take, start, end in value:
+            melStr += command + " -v \"" + take + "\" " + str(start) + " " + str(end) + ";"
+
+        return melStr
+
+    if isinstance(value, bool):
+        value = int(value)
+
+    if isinstance(value, _SIP_StringTypes):
+        value = "\"" + value + "\""
+
+    return command + " -v " + str(value) + ";"
+
+
+# PURPOSE:          Send FBX options to the plugin.
+# PROCEDURE:        Compare against the options this session last applied and eval the ones that changed in one mel
+#                   call. Return the commands that were sent.
+# PRESUMPTION:      fbxmaya is loaded.
+def SIP_ApplyFBXOptions(options):
+    changed = [cur for cur in options if _SIP_AppliedFBXOptions.get(cur) != options[cur]]
+
+    if changed:
+        mel.eval("".join(SIP_ReturnFBXOptionMel(cur, options[cur]) for cur in changed))
+        _SIP_AppliedFBXOptions.update((cur, options[cur]) for cur in changed)
+
+    return changed
+
+
+
+######################################
+#
+#    Export manifest procs
+#
+######################################
+
+# Set to True to skip export nodes whose inputs and output file have not changed since the last export.
+SIP_IncrementalExport = False
+
+# Set to True to run Export All Animations in background mayapy workers, see FBXAnimationExporter_Batch.
+SIP_ParallelExport = False
+
+# Set to True to print what was done to each export node and why after every export. The export procs return this
+# report either way.
+SIP_PrintExportReports = False
+
+# Name of the manifest written to the workspace root, next to the project relative export files.
+SIP_ExportManifestName = "fbxExportManifest.json"
+_SIP_ExportManifestVersion = 1
+
+_SIP_TimeAnimCurveTypes = ["animCurveTL", "animCurveTA", "animCurveTT", "animCurveTU"]
+
+# Infinity types that only use the first or last key outside a curve's keys. The cycle and oscillate types repeat
+# every key, so keys far from a frame range still shape it.
+_SIP_EndKeyInfinityTypes = (om.MFnAnimCurve.kConstant, om.MFnAnimCurve.kLinear)
+
+
+# PURPOSE:          Return the path of the export manifest.
+# PROCEDURE:        Join the workspace root directory and the manifest name.
+# PRESUMPTION:      Project is set.
+def SIP_ReturnExportManifestPath():
+    return cmds.workspace(q=True, rd=True) + SIP_ExportManifestName
+
+
+# PURPOSE:          Load the export manifest.
+# PROCEDURE:        Read the manifest json. If it is missing, unreadable or from another version, start a new one.
+# PRESUMPTION:      None.
+def SIP_LoadExportManifest():
+    manifest = None
+
+    try:
+        with open(SIP_ReturnExportManifestPath(), "r") as manifestFile:
+            manifest = json.load(manifestFile)
+    except (IOError, OSError, ValueError):
+        pass
+
+    if not manifest or manifest.get("version") != _SIP_ExportManifestVersion:
+        manifest = {"version": _SIP_ExportManifestVersion, "exports": {}}
+
+    return manifest
+
+
+# PURPOSE:          Write the export manifest.
+# PROCEDURE:        Dump the manifest as json to the manifest path.
+# PRESUMPTION:      Project is set and writable.
+def SIP_SaveExportManifest(manifest):
+    with open(SIP_ReturnExportManifestPath(), "w") as manifestFile:
+        json.dump(manifest, manifestFile, indent=2, sort_keys=True)
+
+
+# PURPOSE:          Return the size and modification time of an exported file, used to tell if it changed on disk.
+# PROCEDURE:        Stat the file. Return None if it does not exist.
+# PRESUMPTION:      None.
+def SIP_ReturnFileStamp(path):
+    if not os.path.isfile(path):
+        return None
+
+    return [os.path.getsize(path), os.path.getmtime(path)]
+
+
+# PURPOSE:          Return the keys of every anim curve driving the character's joints and blendshapes.
+# PROCEDURE:        List the anim curves in the history of the origin's joints and the meshes' blendShape nodes.
+#                   Query the keys, tangent angles, weights and types of all the curves at once, one query each, and
+#                   split them per curve by the key counts read off the API along with the infinity types. Time based
+#                   curves are kept as per-key tuples so they can be sliced to a frame range, other curves are kept
+#                   whole. Returns {curve: (timeBased, times, keys, infinity)}.
+# PRESUMPTION:      origin is valid.
+def SIP_ReturnCharacterCurveKeys(origin, meshes):
+    drivenNodes = cmds.listRelatives(origin, ad=True, type="joint", fullPath=True) or []
+    drivenNodes.append(origin)
+
+    if meshes:
+        drivenNodes.extend(cmds.ls(cmds.listHistory(meshes) or [], type="blendShape"))
+
+    curves = sorted(set(cmds.ls(cmds.listHistory(drivenNodes) or [], type="animCurve")))
+    curveKeys = {}
+
+    if not curves:
+        return curveKeys
+
+    timeCurves = set(cmds.ls(curves, type=_SIP_TimeAnimCurveTypes) or [])
+    selList = om.MSelectionList()
+
+    for cur in curves:
+        selList.add(cur)
+
+    counts = {}
+    infinity = {}
+    tangentStarts = {}
+    tangentStart = 0
+
+    for index, curCurve in enumerate(curves):
+        curveFn = om.MFnAnimCurve(selList.getDependNode(index))
+        counts[curCurve] = curveFn.numKeys
+        infinity[curCurve] = (curveFn.preInfinityType, curveFn.postInfinityType)
+        tangentStarts[curCurve] = tangentStart
+        tangentStart += curveFn.numKeys
+
+    tangents = cmds.keyTangent(curves, query=True, inAngle=True, outAngle=True, inWeight=True, outWeight=True) or []
+    tangentTypes = cmds.keyTangent(curves, query=True, inTangentType=True, outTangentType=True) or []
+    groups = [[cur for cur in curves if cur in timeCurves], [cur for cur in curves if cur not in timeCurves]]
+    keys = (cmds.keyframe(groups[0], query=True, timeChange=True, valueChange=True) or []) if groups[0] else []
+
+    if groups[1]:
+        keys += cmds.keyframe(groups[1], query=True, floatChange=True, valueChange=True) or []
+
+    keyStart = 0
+
+    # keyTangent returns the keys curve by curve in the order given, keyframe in the order of the two groups.
+    for curCurve in groups[0] + groups[1]:
+        count = counts[curCurve]
+        curveData = keys[keyStart * 2:(keyStart + count) * 2]
+        times, values = curveData[::2], curveData[1::2]
+        keyStart += count
+
+        tangentStart = tangentStarts[curCurve]
+        curveTangents = tangents[tangentStart * 4:(tangentStart + count) * 4]
+        curveTypes = tangentTypes[tangentStart * 2:(tangentStart + count) * 2]
+
+        if curCurve in timeCurves:
+            curveKeys[curCurve] = (True, times, list(zip(times, values, zip(*[iter(curveTangents)] * 4),
+                                                         zip(*[iter(curveTypes)] * 2))), infinity[curCurve])
+        else:
+            curveKeys[curCurve] = (False, times, [times, values, curveTangents, curveTypes], infinity[curCurve])
+
+    return curveKeys
+
+
+# PURPOSE:          Return a file signature for the referenced rig the origin comes from.
+# PROCEDURE:        If origin is referenced, return the reference file path with its size and modification time.
+# PRESUMPTION:      None.
+def SIP_ReturnRigSignature(origin):
+    if not cmds.referenceQuery(origin, isNodeReferenced=True):
+        return ""
+
+    rigFile = cmds.referenceQuery(origin, filename=True, withoutCopyNumber=True)
+    return repr([rigFile, SIP_ReturnFileStamp(rigFile)])
+
+
+# PURPOSE:          Hash everything that goes into the FBX written for an export node.
+# PROCEDURE:        Hash the export node's settings, its frame range, the keys of every curve driving the character
+#                   that affect the range (including the key on either side of it) and its infinity types, the rig
+#                   and the FBX options. A curve that cycles or oscillates before or after its keys is hashed whole,
+#                   since any of its keys can repeat into the range.
+# PRESUMPTION:      settings comes from SIP_ReturnFBXExportSettings, curveKeys from SIP_ReturnCharacterCurveKeys for
+#                   the export node's character.
+def SIP_ReturnExportNodeHash(settings, frameRange, curveKeys, rigSignature, optionsSignature):
+    inputHash = hashlib.sha1()
+    inputHash.update(repr(tuple(settings)).encode("utf-8"))
+
+    inputHash.update(repr(list(frameRange)).encode("utf-8"))
+
+    for curCurve in sorted(curveKeys):
+        timeBased, times, keys, infinity = curveKeys[curCurve]
 
+        if timeBased and infinity[0] in _SIP_EndKeyInfinityTypes and infinity[1] in _SIP_EndKeyInfinityTypes:
+            first = max(bisect.bisect_left(times, frameRange[0]) - 1, 0)
+            last = bisect.bisect_right(times, frameRange[1]) + 1
+            keys = keys[first:last]
 
-# PURPOSE:          Return the origin of the given namespace
-# PROCEDURE:        If ns is not empty string, list all joints with the matching namespace, else list all joints.
-#                   For list of joints, look for the origin attribute and if it is set to true. If found, return the
-#                   name of the joint, else return "Error".
-# PRESUMPTION:      Origin attribute is on a joint.
-#                   "Error" is not a joint name.
-#                   namespace does not include colon.
-def SIP_ReturnOrigin(ns):
-    joints = []
+        inputHash.update(repr([curCurve, keys, infinity]).encode("utf-8"))
 
-    if ns:
-        joints = cmds.ls((ns + ":*"), type="joint")
-    else:
-        joints = cmds.ls(type="joint")
+    inputHash.update(rigSignature.encode("utf-8"))
+    inputHash.update(optionsSignature.encode("utf-8"))
 
-    if len(joints):
-        for curJoint in joints:
-            if cmds.objExists(curJoint + ".origin") and cmds.getAttr(curJoint + ".origin"):
-                return curJoint
+    return inputHash.hexdigest()
 
-    return "Error"
 
+# PURPOSE:          Decide if an export node needs exporting in an incremental run.
+# PROCEDURE:        Compare the hash and the output file against the manifest entry for the export file.
+#                   Return whether to export and the reason.
+# PRESUMPTION:      None.
+def SIP_ReturnExportDecision(manifest, fileName, inputHash):
+    entry = manifest["exports"].get(fileName)
 
-# PURPOSE:          Removes all nodes tagged as garbage.
-# PROCEDURE:        List all transforms in scene, iterate through the list, anything with the "deleteMe" attribute
-#                   will be deleted.
-# PRESEUMPTIONS:    The deleteMe attribute is the correct name of the attribute signifying garbage.
-def SIP_ClearGarbage():
-    list = cmds.ls(tr=True)
+    if not entry:
+        return True, "not in manifest"
 
-    for cur in list:
-        if cmds.objExists(cur + ".deleteMe"):
-            cmds.delete(cur)
+    if entry.get("hash") != inputHash:
+        return True, "inputs changed"
 
+    outputStamp = SIP_ReturnFileStamp(cmds.workspace(q=True, rd=True) + fileName)
 
-# PURPOSE:          Tag objects for being garbage.
-# PROCEDURE:        If node is valid object and attribute does not exist, add deleteMe attribute.
-# PRESUMPTIONS:     None.
-def SIP_TagForGarbage(node):
-    if cmds.objExists(node) and not cmds.objExists(node + ".deleteMe"):
-        cmds.addAttr(node, shortName="del", longName="deleteMe", at="bool")
-        cmds.setAttr(node + ".deleteMe", True)
+    if outputStamp is None:
+        return True, "output file missing"
 
+    if outputStamp != entry.get("output"):
+        return True, "output file changed on disk"
 
-# PURPOSE:          Return the meshes connected to blendshape nodes.
-# PROCEDURE:        Get a list of blendshape nodes, follow those connections to the mesh shape node,
-#                   Traverse up the hierarchy to find the parent transform node.
-# PRESUMPTION:      Character has a valid namespace, and namespace does not have colon.
-#                   Only exporting polygonal meshes.
-def SIP_FindMeshWithBlendshapes(ns):
-    returnArray = []
+    return False, "inputs and output file unchanged"
 
-    blendshapes = cmds.ls((ns + ":*"), type="blendShape")
-    for curBlendshape in blendshapes:
-        downstreamNodes = cmds.listHistory(curBlendshape, future=True)
-        for curNode in downstreamNodes:
-            if cmds.objectType(curNode, isType="mesh"):
-                parents = cmds.listRelatives(curNode, parent=True)
-                returnArray.append(parents[0])
 
-    return returnArray
+# PURPOSE:          Print the report returned by the export procs.
+# PROCEDURE:        One line per export node with what was done and why.
+# PRESUMPTION:      None.
+def SIP_PrintExportReport(report):
+    for curEntry in report:
+        print(curEntry["action"] + ": " + curEntry["exportNode"] + " -> " + str(curEntry["file"]) + " (" +
+              curEntry["reason"] + ")")
 
 
 
-#######################################
+######################################
 #
-#    Export settings node procs
+#    Evaluation procs
 #
-#######################################
-
+######################################
 
+# Set to False to let viewports redraw while exporting.
+SIP_SuspendRefresh = True
 
-# PURPOSE:          Return all export nodes connected to given origin.
-# PROCEDURE:        If origin is valid and has the exportNode attribute, return list of export nodes connected to it.
-# PRESUMPTION:      Only export nodes are connected to exportNode attribute.
-def SIP_ReturnFBXExportNodes(origin):
-    exportNodeList = []
+# Set to False to export in whatever evaluation mode the user left Maya in.
+SIP_AutoEvaluationMode = True
 
-    if cmds.objExists(origin + ".exportNode"):
-        exportNodeList = cmds.listConnections(origin + ".exportNode")
+# Evaluation Manager modes from fastest to slowest. "off" is the DG.
+SIP_EvaluationModes = ["parallel", "serial", "off"]
 
-    return exportNodeList
+# Rigs with any of these node types are not exported in parallel, or not with the Evaluation Manager at all. Add plugin
+# nodes that are not thread safe or that do not work with the Evaluation Manager here. The legacy dynamics nodes make
+# the Evaluation Manager hand the scene back to the DG anyway.
+SIP_SerialEvaluationNodeTypes = ["expression"]
+SIP_DGEvaluationNodeTypes = ["particle", "rigidBody", "rigidSolver", "fluidShape"]
 
+# Evaluation mode to use for a rig, by rig file name (without folder) or namespace. Overrides the automatic choice.
+SIP_RigEvaluationModes = {}
 
-# PURPOSE:          Connect the fbx export node to the origin.
-# PROCEDURE:        Check if attributes exist in nodes are valid, if they are, connect attributes.
-# PRESUMPTIONS:     None.
-def SIP_ConnectFBXExportNodeToOrigin(exportNode, origin):
-    if cmds.objExists(origin) and cmds.objExists(exportNode):
-        if not cmds.objExists(origin + ".exportNode"):
-            SIP_TagForExportNode(origin)
-        if not cmds.objExists(exportNode + ".exportNode"):
-            SIP_AddFBXNodeAttrs(fbxExportNode)
-        cmds.connectAttr(origin + ".exportNode", exportNode + ".exportNode")
+# Set to True to export each rig once in every mode that is safe for it before picking the fastest, e.g. while
+# choosing SIP_RigEvaluationModes. Off, a rig is exported in the fastest safe mode unless another measured faster.
+SIP_ExploreEvaluationModes = False
 
+# With SIP_AutoEvaluationMode, the time of every exported clip is added to this summary in the workspace root, per rig
+# and mode.
+SIP_EvaluationLogName = "fbxEvaluationModes.json"
 
-# PURPOSE:          Delete given export node.
-# PROCEDURE:        If object exists, delete.
-# PRESUMPTION:      none.
-def SIP_DeleteFBXExportNode(exportNode):
-    if cmds.objExists(exportNode):
-        cmds.delete(exportNode)
 
+# PURPOSE:          Return the Evaluation Manager mode.
+# PROCEDURE:        Query the evaluationManager.
+# PRESUMPTION:      None.
+def SIP_ReturnEvaluationMode():
+    mode = cmds.evaluationManager(query=True, mode=True)
+    return mode[0] if isinstance(mode, list) else mode
 
-# PURPOSE:          To add the attributes to the export node to store our export settings.
-# PROCEDURE:        For each attribute we want to add, check if it exists. If it doesn't exist, add.
-# PRESUMPTION:      Assume fbxExportNode is a valid object.
-def SIP_AddFBXNodeAttrs(fbxExportNode):
-    if not cmds.attributeQuery("export", node=fbxExportNode, exists=True):
-        cmds.addAttr(fbxExportNode, longName="export", at="bool")
 
-    if not cmds.attributeQuery("moveToOrigin", node=fbxExportNode, exists=True):
-        cmds.addAttr(fbxExportNode, longName="moveToOrigin", at="bool")
+# PURPOSE:          Switch the Evaluation Manager mode.
+# PROCEDURE:        Only set it when it differs, switching rebuilds the evaluation graph.
+# PRESUMPTION:      mode is one of SIP_EvaluationModes.
+def SIP_SetEvaluationMode(mode):
+    if mode and SIP_ReturnEvaluationMode() != mode:
+        cmds.evaluationManager(mode=mode)
 
-    if not cmds.attributeQuery("zeroOrigin", node=fbxExportNode, exists=True):
-        cmds.addAttr(fbxExportNode, longName="zeroOrigin", at="bool")
 
-    if not cmds.attributeQuery("exportName", node=fbxExportNode, exists=True):
-        cmds.addAttr(fbxExportNode, longName="exportName", dt="string")
+# PURPOSE:          Return the name a rig's evaluation modes are looked up and logged by.
+# PROCEDURE:        The referenced file's name without its folder, or the namespace if the origin is not referenced.
+# PRESUMPTION:      None.
+def SIP_ReturnRigName(origin):
+    if cmds.referenceQuery(origin, isNodeReferenced=True):
+        return os.path.basename(cmds.referenceQuery(origin, filename=True, withoutCopyNumber=True))
 
-    if not cmds.attributeQuery("useSubRange", node=fbxExportNode, exists=True):
-        cmds.addAttr(fbxExportNode, longName="useSubRange", at="bool")
+    return SIP_ReturnNamespace(origin)
 
-    if not cmds.attributeQuery("startFrame", node=fbxExportNode, exists=True):
-        cmds.addAttr(fbxExportNode, longName="startFrame", at="float")
 
-    if not cmds.attributeQuery("endFrame", node=fbxExportNode, exists=True):
-        cmds.addAttr(fbxExportNode, longName="endFrame", at="float")
+# PURPOSE:          Pick the evaluation mode to export a character in.
+# PROCEDURE:        Use SIP_RigEvaluationModes if it names the rig. Otherwise leave out the modes the rig's node types
+#                   are not safe in. If the Evaluation Manager fell back to the DG while exporting the rig before, use
+#                   the DG. Otherwise take the fastest safe mode, unless the evaluation log measured another safe mode
+#                   faster than it. With SIP_ExploreEvaluationModes, modes the rig has not been logged in are tried
+#                   first.
+# PRESUMPTION:      origin is the character's origin.
+def SIP_ReturnRigEvaluationMode(characterName, origin):
+    rigName = SIP_ReturnRigName(origin)
 
-    if not cmds.attributeQuery("exportMeshes", node=fbxExportNode, exists=True):
-        cmds.addAttr(fbxExportNode, longName="exportMeshes", at="message")
+    for curName in [rigName, characterName]:
+        if curName in SIP_RigEvaluationModes:
+            return SIP_RigEvaluationModes[curName]
 
-    if not cmds.attributeQuery("exportNode", node=fbxExportNode, exists=True):
-        cmds.addAttr(fbxExportNode, shortName="xnd", longName="exportNode", at="message")
+    modes = list(SIP_EvaluationModes)
+    prefix = characterName + ":*" if characterName else "*"
 
-    if not cmds.attributeQuery("animLayers", node=fbxExportNode, exists=True):
-        cmds.addAttr(fbxExportNode, longName="animLayers", dt="string")
+    if SIP_DGEvaluationNodeTypes and cmds.ls(prefix, type=SIP_DGEvaluationNodeTypes):
+        return "off"
 
+    if SIP_SerialEvaluationNodeTypes and cmds.ls(prefix, type=SIP_SerialEvaluationNodeTypes):
+        modes = ["serial", "off"]
 
-# PURPOSE:          Create the export node to store our export settings.
-# PROCEDURE:        Create an empty transform node, send it to SIP_AddFBXNodeAttrs to add the needed attributes.
-# PRESUMPTION:      None.
-def SIP_CreateFBXExportNode(characterName):
-    fbxExportNode = cmds.group(em=True, name=characterName + "FBXExportNode#")
-    SIP_AddFBXNodeAttrs(fbxExportNode)
-    cmds.setAttr(fbxExportNode+".export", 1)
-    return fbxExportNode
+    stats = SIP_ReturnEvaluationModeStats().get(rigName, {})
 
+    if [cur for cur in modes if stats.get(cur, {}).get("fallbacks")]:
+        return "off"
 
+    if SIP_ExploreEvaluationModes:
+        for curMode in modes:
+            if curMode not in stats:
+                return curMode
 
+    measured = [cur for cur in modes if stats.get(cur, {}).get("fps")]
 
-######################################
-#
-#    Model export procs
-#
-######################################
+    # Slower modes only win on measured speed, against a measured fastest safe mode.
+    if modes[0] in measured:
+        return max(measured, key=lambda cur: stats[cur]["fps"])
 
+    return modes[0]
 
 
-# PURPOSE:          To connect meshes to the export node so the exporter can find them.
-# PROCEDURE:        Check to make sure meshes and exportNode is valid, check for attribute "exportNode".
-#                   If no attribute, add it. Then connect attributes.
-# PRESUMPTION:      exportNode is an actual exportNode, and meshes is a list of transform nodes for polygon meshes.
-def SIP_ConnectFBXExportNodeToMeshes(exportNode, meshes):
+# PURPOSE:          Add an exported clip's time to the evaluation log.
+# PROCEDURE:        Add the frames and seconds to the rig's totals for the mode, and count a fallback if the Evaluation
+#                   Manager handed the clip to the DG. The log is a summary, so it does not grow with every export.
+#                   It is written to a temp file that then replaces it, so parallel workers sharing the workspace never
+#                   read half a log. A log that cannot be read is left alone rather than replaced with this one clip.
+#                   Errors are warned about, never raised.
+# PRESUMPTION:      seconds only covers the clip's own export, not the export rig's build or pre-bake.
+def SIP_LogEvaluationTiming(rigName, mode, frames, seconds, fallback=False):
+    logPath = cmds.workspace(q=True, rd=True) + SIP_EvaluationLogName
+    log = SIP_LoadEvaluationLog(logPath)
 
-    if cmds.objExists(exportNode):
-        if not cmds.objExists(exportNode + ".exportMeshes"):
-            SIP_AddFBXNodeAttrs(exportNode)
+    if log is None:
+        cmds.warning("Could not read the evaluation log " + logPath + ", the clip's time is not logged.\n")
+        return
 
-        for curMesh in meshes:
-            if cmds.objExists(curMesh):
-                if not cmds.objExists(curMesh + ".exportMeshes"):
-                    SIP_TagForMeshExport(curMesh)
+    modeStats = log["rigs"].setdefault(rigName, {}).setdefault(mode, {"exports": 0, "frames": 0, "seconds": 0.0,
+                                                                      "fallbacks": 0})
+    modeStats["exports"] += 1
+    modeStats["frames"] += frames
+    modeStats["seconds"] += seconds
+    modeStats["fallbacks"] += int(fallback)
+    modeStats["time"] = time.strftime("%Y-%m-%d %H:%M:%S")
 
-                cmds.connectAttr(exportNode + ".exportMeshes", curMesh + ".exportMeshes", force=True)
+    tempPath = logPath + "." + str(os.getpid()) + ".tmp"
 
+    try:
+        with open(tempPath, "w") as logFile:
+            json.dump(log, logFile, indent=2, sort_keys=True)
 
+        # os.replace is Python 3 only. Python 2 on Windows cannot rename over a file.
+        if hasattr(os, "replace"):
+            os.replace(tempPath, logPath)
+        else:
+            if os.name == "nt" and os.path.exists(logPath):
+                os.remove(logPath)
 
-# PURPOSE:          To disconnect the message attribute between the export node and the meshes.
-# PROCEDURE:        Itterate through list of meshes and if mesh exists, disconnect.
-# PRESUMPTION:      That node and mesh are connected via export exportMeshes message attr.
-def SIP_DisconnectFBXExporterNodeToMeshes(exportNode, meshes):
-    if cmds.objExists(exportNode):
-        for curMesh in meshes:
-            if cmds.objExists(curMesh):
-                cmds.disconnectAttr(exportNode + ".exportMeshes", curMesh + ".exportMeshes")
+            os.rename(tempPath, logPath)
+    except (IOError, OSError) as error:
+        cmds.warning("Could not write the evaluation log: " + str(error) + "\n")
 
 
-# PURPOSE:          Return a list of meshes connected to the export node.
-# PROCEDURE:        List connections to exportNode attribute.
-# PRESUMPTION:      exportMeshes attribute is used to connect to export meshes, exportMeshes are valid.
-def SIP_ReturnConnectedMeshes(exportNode):
-    meshes = cmds.listConnections((exportNode + ".exportMeshes"), source=False, destination=True)
-    return meshes
+# PURPOSE:          Load the evaluation log.
+# PROCEDURE:        Read the json summary. If it is missing, start a new one. If it cannot be read or is not a log,
+#                   return None so it is not written over.
+# PRESUMPTION:      None.
+def SIP_LoadEvaluationLog(logPath):
+    if not os.path.isfile(logPath):
+        return {"rigs": {}}
 
+    try:
+        with open(logPath, "r") as logFile:
+            log = json.load(logFile)
+    except (IOError, OSError, ValueError):
+        return None
 
+    if not isinstance(log, dict) or not isinstance(log.get("rigs"), dict):
+        return None
 
-######################################
-#
-#    Animation export procs
-#
-######################################
+    return log
 
 
-# PUPROSE:
-# PROCEDURE:
-# PRESUMPTION:
-def SIP_UnlockJointTransforms(root):
-    hierarchy = cmds.listRelatives(root, ad=True, f=True)
+# PURPOSE:          Return the frames per second measured for each rig in each evaluation mode.
+# PROCEDURE:        Read the evaluation log and add the frames per second of each rig and mode. Empty if the log
+#                   cannot be read.
+#                   Returns {rig: {mode: {"exports", "frames", "seconds", "fallbacks", "fps"}}}.
+# PRESUMPTION:      None.
+def SIP_ReturnEvaluationModeStats():
+    log = SIP_LoadEvaluationLog(cmds.workspace(q=True, rd=True) + SIP_EvaluationLogName)
+    stats = log["rigs"] if log else {}
 
-    hierarchy.append(root)
+    for curRig in stats.values():
+        for curMode in curRig.values():
+            curMode["fps"] = curMode["frames"] / curMode["seconds"] if curMode["seconds"] else 0.0
 
-    for cur in hierarchy:
-        cmds.setAttr((cur + '.translateX'), lock=False)
-        cmds.setAttr((cur + '.translateY'), lock=False)
-        cmds.setAttr((cur + '.translateZ'), lock=False)
-        cmds.setAttr((cur + '.rotateX'), lock=False)
-        cmds.setAttr((cur + '.rotateY'), lock=False)
-        cmds.setAttr((cur + '.rotateZ'), lock=False)
-        cmds.setAttr((cur + '.scaleX'), lock=False)
-        cmds.setAttr((cur + '.scaleY'), lock=False)
-        cmds.setAttr((cur + '.scaleZ'), lock=False)
+    return stats
 
 
+# Set to True to stop the other referenced characters from evaluating while a character is exported. Crowded scenes
+# bake faster. The nodes of the other references are blocked too: their nodeState is set back when the export ends,
+# but Maya keeps both changes as reference edits if the scene is saved.
+SIP_IsolateCharacterEvaluation = False
 
-# PUPROSE:          Connect given node to another given node via specified transform.
-# PROCEDURE:        Call connectAttr
-# PRESUMPTION:      Assume that the 2 nodes exist and transform type is valid.
-def SIP_ConnectAttrs(sourceNode, destNode, transform):
-    cmds.connectAttr(sourceNode + "." + transform + "X", destNode + "." + transform + "X")
-    cmds.connectAttr(sourceNode + "." + transform + "Y", destNode + "." + transform + "Y")
-    cmds.connectAttr(sourceNode + "." + transform + "Z", destNode + "." + transform + "Z")
+# Node types blocked when they feed the other references from outside, like the shot's anim curves.
+SIP_IsolationNodeTypes = ["animCurve", "constraint", "expression", "geometryFilter"]
 
+# nodeState values.
+_SIP_NodeStateNormal = 0
+_SIP_NodeStateBlocking = 2
 
 
-# PURPOSE:          To copy the skeleton and connect the copy to the original bind.
-# PROCEDURE:        Duplicate hierarchy, delete everything that is not a joint, unlock all the joints,
-#                   connect the translates, rotates, and scales. Parent copy to the world. Add deleteMe attr.
-# PRESUMPTION:      No joints are children of anything but other joints.
-def SIP_CopyAndConnectSkeleton(origin):
-    newHierarchy = []
+# PURPOSE:          Return the nodes to block while a character is exported.
+# PROCEDURE:        Take every DG and DAG node in the namespace of a loaded reference other than the character's, and
+#                   the nodes of SIP_IsolationNodeTypes that feed them from outside, like the shot's anim curves. Leave
+#                   out what the character depends on: the history of its joints and meshes, like a prop the hand is
+#                   constrained to, the origin's DAG parents and their history, like a vehicle the origin rides, and
+#                   the DAG parents of all of those, whose world matrices their children need.
+# PRESUMPTION:      origin is the character's origin. Characters are referenced under their own namespace.
+def SIP_ReturnIsolationNodes(characterName, origin, meshes):
+    namespaces = []
 
-    if origin != "Error" and cmds.objExists(origin):
-        dupHierarchy = cmds.duplicate(origin)
-        tempHierarchy = cmds.listRelatives(dupHierarchy[0], allDescendents=True, f=True)
+    for curRef in cmds.file(query=True, reference=True) or []:
+        if not cmds.file(curRef, query=True, deferReference=True):
+            ns = cmds.file(curRef, query=True, namespace=True)
 
-        for cur in tempHierarchy:
-            if cmds.objExists(cur):
-                if cmds.objectType(cur) != "joint":
-                    cmds.delete(cur)
+            if ns != characterName:
+                namespaces.append(ns)
 
-        SIP_UnlockJointTransforms(dupHierarchy[0])
+    if not namespaces:
+        return []
 
-        origHierarchy = cmds.listRelatives(origin, ad=True, type="joint")
-        newHierarchy = cmds.listRelatives(dupHierarchy[0], ad=True, type="joint")
+    originPath = cmds.ls(origin, long=True)[0].split("|")
+    drivenNodes = cmds.listRelatives(origin, allDescendents=True, type="joint", fullPath=True) or []
+    drivenNodes.append(origin)
+    drivenNodes.extend(meshes)
+    # listHistory does not follow DAG parents, so add them.
+    drivenNodes.extend("|".join(originPath[:index]) for index in range(2, len(originPath)))
+    history = cmds.listHistory(drivenNodes) or []
+    liveNodes = set(history)
+    liveParents = set()
 
-        origHierarchy.append(origin)
-        newHierarchy.append(dupHierarchy[0])
+    for curPath in cmds.ls(history, long=True) if history else []:
+        parts = curPath.split("|")
+        liveParents.update("|".join(parts[:index]) for index in range(2, len(parts)))
 
-        for index in range(len(origHierarchy)):
-            SIP_ConnectAttrs(origHierarchy[index], newHierarchy[index], "translate")
-            SIP_ConnectAttrs(origHierarchy[index], newHierarchy[index], "rotate")
-            SIP_ConnectAttrs(origHierarchy[index], newHierarchy[index], "scale")
+    # ls with no names lists the whole scene.
+    if liveParents:
+        liveNodes.update(cmds.ls(list(liveParents)) or [])
 
-        cmds.parent(dupHierarchy[0], world=True)
-        SIP_TagForGarbage(dupHierarchy[0])
+    others = cmds.ls([cur + ":*" for cur in namespaces]) or []
 
-    return newHierarchy
+    if not others:
+        return []
 
+    nodes = set(others)
+    nodes.update(cmds.ls(cmds.listConnections(others, source=True, destination=False) or [],
+                         type=SIP_IsolationNodeTypes) or [])
+    nodes.difference_update(liveNodes)
 
+    return sorted(nodes)
 
-# PURPOSE:          Translate export skeleton to origin. May or may not kill origin animation depending on input.
-# PROCEDURE:        Bake the animation onto the origin. Create an animLayer. animLayer will either be additive or
-#                   override depending on parameters we pass it. Add deleteMe attr to animLayer. Move to origin.
-# PRESUMPTION:      Origin is valid, end frame is greater than start frame, zeroOrigin is boolean.
-def SIP_TransformToOrigin(origin, startFrame, endFrame, zeroOrigin):
-    cmds.bakeResults(origin, t=(startFrame, endFrame),
-                     at=["rx", "ry", "rz", "sx", "sy", "sz", "tx", "ty", "tz"], hi="none")
 
-    cmds.select(clear=True)
-    cmds.select(origin)
-    newAnimLayer=""
+# PURPOSE:          Block the evaluation of nodes for the duration of a block.
+# PROCEDURE:        Context manager. Set the nodeState of the nodes that are Normal, and not locked or connected, to
+#                   Blocking in one DG modifier, and set the same plugs back to Normal in one more when the block
+#                   ends, even by an error. Nodes deleted since they were listed are skipped. Yields the number of
+#                   nodes blocked.
+# PRESUMPTION:      nodes come from SIP_ReturnIsolationNodes.
+@contextlib.contextmanager
+def SIP_IsolatedEvaluation(nodes):
+    plugs = []
+    # ls with no names lists the whole scene.
+    existing = cmds.ls(nodes) if nodes else []
 
-    if zeroOrigin:
-        # Kills origin animation.
-        newAnimLayer = cmds.animLayer(aso=True, mute=False, solo=False, override=True, passthrough=True, lock=False)
-        cmds.setAttr(newAnimLayer + ".rotationAccumulationMode", 0)
-        cmds.setAttr(newAnimLayer + ".scaleAccumulationMode", 1)
-    else:
-        # Shifts the origin animation.
-        newAnimLayer = cmds.animLayer(aso=True, mute=False, solo=False, override=False, passthrough=False, lock=False)
+    if existing:
+        modifier = om.MDGModifier()
 
-    SIP_TagForGarbage(newAnimLayer)
+        for curFn in SIP_ReturnDependNodeFns(existing):
+            plug = curFn.findPlug("nodeState", False)
 
-    # Turn animLayer on.
-    cmds.animLayer(newAnimLayer, edit=True, weight=1)
-    cmds.setKeyframe(newAnimLayer + ".weight")
+            if plug.asInt() == _SIP_NodeStateNormal and not plug.isLocked and not plug.isDestination:
+                modifier.newPlugValueInt(plug, _SIP_NodeStateBlocking)
+                plugs.append(plug)
 
-    # Move origin animation to world origin.
-    cmds.setAttr(origin + ".translate", 0, 0, 0)
-    cmds.setAttr(origin + ".rotate", 0, 0, 0)
-    cmds.setKeyframe(origin, al=newAnimLayer, t=startFrame)
+        modifier.doIt()
 
+    try:
+        yield len(plugs)
+    finally:
+        if plugs:
+            modifier = om.MDGModifier()
 
+            for curPlug in plugs:
+                modifier.newPlugValueInt(curPlug, _SIP_NodeStateNormal)
 
+            modifier.doIt()
 
 
 ######################################
 #
-#    AnimLayers procs
+#    Export procs
 #
 ######################################
 
+# Open SIP_ExportTransaction blocks. Only the outermost one suspends refresh and restores the evaluation mode.
+_SIP_ExportTransactionDepth = [0]
 
-# PURPOSE:          Record the animLayer settings used in the animation and store in the exportNode as a string.
-# PROCEDURE:        List all the animLayers, query their mute and solo attributes. List them in one single string.
-#                   Uses ; as sentinel value to split separate animLayers.
-#                   Uses , as sentinel value to split separate fields for animLayer.
-#                   Uses = as sentinel value to split separate attrs from their values in field.
-# PRESUMPTION:      None.
-def SIP_SetAnimLayerSettings(exportNode):
-    if not cmds.attributeQuery("animLayers", node=exportNode, exists=True):
-        SIP_AddFBXNodeAttrs(exportNode)
-
-    animLayers = cmds.ls(type="animLayer")
-    animLayerCommandStr = ""
-
-    for curLayer in animLayers:
-        mute = cmds.animLayer(curLayer, query=True, mute=True)
-        solo = cmds.animLayer(curLayer, query=True, solo=True)
-        animLayerCommandStr += (curLayer + ",  mute = " + str(mute) + ", solo = " + str(solo) + ";")
-
-    cmds.setAttr(exportNode + ".animLayers", animLayerCommandStr, type="string")
-
-# PURPOSE:          Set the animLayers based on the string value in the exportNode.
-# PROCEDURE:        Use the predefined sentinel values to split the string for the separate animLayers.
-#                   And parse out the attributes and their values, then set.
-# PRESUMPTION:      Uses ; as sentinel value to split separate animLayers.
-#                   Uses , as sentinel value to split separate fields for animLayer.
-#                   Uses = as sentinel value to split separate attrs from their values in field.
-#                   Order is Layer, mute, solo.
-def SIP_SetAnimLayersFromSettings(exportNode):
-    if cmds.objExists(exportNode) and cmds.objExists(exportNode + ".animLayers"):
-        animLayersRootString = cmds.getAttr(exportNode + ".animLayers", asString=True)
+# Set to False to leave Maya's undo queue on during exports. Every duplicate, connect, bake and delete an export does
+# is otherwise recorded, which adds up to gigabytes of undo history over a day of exports.
+SIP_UndoFreeExport = True
 
-        if animLayersRootString:
-            animLayerEntries = animLayersRootString.split(";")
 
-            for curEntry in animLayerEntries:
-                if curEntry:
-                    fields = curEntry.split(",")
+# PURPOSE:          Run an export without recording undo or redrawing and put the user's scene state back afterwards.
+# PROCEDURE:        Context manager. Record the selection, the current time, the animLayer state, the evaluation mode
+#                   and the parent of each of nodes, turn undo off without flushing the user's undo history and suspend
+#                   viewport refresh. When the block ends, even by an error or an interrupt, put the parents,
+#                   animLayers, time, selection and evaluation mode back, then resume refresh and turn undo back on if
+#                   it was on. Pass animLayers=False when the block leaves the layers to something else that restores
+#                   them, like a queued export between clips. Nested transactions leave refresh and the evaluation
+#                   mode to the outermost one.
+# PRESUMPTION:      nodes are DAG nodes the block may re-parent. They are tracked by UUID, so re-parenting and
+#                   renaming are fine.
+@contextlib.contextmanager
+def SIP_ExportTransaction(nodes=None, animLayers=True):
+    outermost = not _SIP_ExportTransactionDepth[0]
+    evaluationMode = SIP_ReturnEvaluationMode() if outermost and SIP_AutoEvaluationMode else None
+    undoState = SIP_UndoFreeExport and cmds.undoInfo(query=True, stateWithoutFlush=True)
+    selection = cmds.ls(selection=True, long=True) or []
+    currentTime = cmds.currentTime(query=True)
+    layerState = SIP_ReturnAnimLayerState() if animLayers else None
+    parents = []
 
-                    animLayerField = fields[0]
-                    curMuteField = fields[1]
-                    curSoloField = fields[2]
+    for curNode in nodes or []:
+        parentNode = cmds.listRelatives(curNode, parent=True, fullPath=True)
+        parents.append((cmds.ls(curNode, uuid=True)[0], parentNode[0] if parentNode else ""))
 
-                    muteFieldStr = curMuteField.split(" = ")
-                    soloFieldStr = curMuteField.split(" = ")
+    if undoState:
+        cmds.undoInfo(stateWithoutFlush=False)
 
-                    # convert strings to bool values
-                    muteFieldBool = True
-                    soloFieldBool = True
+    if outermost and SIP_SuspendRefresh:
+        cmds.refresh(suspend=True)
 
-                    if muteFieldStr[1] != "True":
-                        muteFieldBool = False
+    _SIP_ExportTransactionDepth[0] += 1
 
-                    if soloFieldStr[1] != "True":
-                        soloFieldBool = False
+    try:
+        yield
+    finally:
+        _SIP_ExportTransactionDepth[0] -= 1
 
-                    cmds.animLayer(animLayerField, edit=True, mute=muteFieldBool, solo=soloFieldBool)
+        try:
+            for curUuid, parentNode in parents:
+                node = cmds.ls(curUuid, long=True)
 
-def SIP_ClearAnimLayerSettings(exportNode):
-    cmds.setAttr(exportNode + ".animLayers", "", type="string")
+                if not node:
+                    continue
 
-######################################
-#
-#    Export procs
-#
-######################################
+                curParent = cmds.listRelatives(node[0], parent=True, fullPath=True)
+
+                if parentNode and parentNode != (curParent[0] if curParent else "") and cmds.objExists(parentNode):
+                    cmds.parent(node[0], parentNode)
+                elif not parentNode and curParent:
+                    cmds.parent(node[0], world=True)
+
+            if layerState is not None:
+                SIP_RestoreAnimLayerState(layerState)
+
+            if cmds.currentTime(query=True) != currentTime:
+                cmds.currentTime(currentTime, edit=True)
+
+            selection = cmds.ls(selection, long=True) or []
+
+            if selection:
+                cmds.select(selection, replace=True)
+            else:
+                cmds.select(clear=True)
+
+            if evaluationMode:
+                SIP_SetEvaluationMode(evaluationMode)
+        finally:
+            if outermost and SIP_SuspendRefresh:
+                cmds.refresh(suspend=False)
+
+            if undoState:
+                cmds.undoInfo(stateWithoutFlush=True)
+
+# PURPOSE:          Export the current selection to the file named on the export node.
+# PROCEDURE:        Build the path from the workspace and the exportName setting and export selected.
+#                   Return the path written, or an empty string if the export node has no file name.
+# PRESUMPTION:      Project is set. settings, if given, are the export node's SIP_FBXExportSettings.
+def SIP_ExportFBX(exportNode, settings=None):
+    if settings is None:
+        settings = SIP_ReturnFBXExportSettings(exportNode)
 
-def SIP_ExportFBX(exportNode):
     curWorkspace = cmds.workspace(q=True, rd=True)
-    fileName = cmds.getAttr(exportNode + ".exportName")
+    fileName = settings.exportName
 
     if fileName:
         newFBX = curWorkspace + fileName
         #newFBX = fileName
-        cmds.file(newFBX, force=True, type='FBX export', pr=True, es=True)
+
+        # Includes the plugin's own bake when the options ask for one.
+        with SIP_TimingSpan("fbxWrite", exportNode=exportNode, file=newFBX) as writeTags:
+            cmds.file(newFBX, force=True, type='FBX export', pr=True, es=True)
+            writeTags["fileSize"] = os.path.getsize(newFBX) if os.path.isfile(newFBX) else 0
+
+        return newFBX
     else:
         cmds.warning("No Valid Export Filename for Export Node " + exportNode + "\n")
 
-def SIP_ExportFBXAnimation(characterName, exportNode):
-    SIP_ClearGarbage()
-    characters = []
+    return ""
 
-    if characterName:
-        characters.append(characterName)
-    else:
-        reference = cmds.file(reference=1, query=True)
+# PURPOSE:          Return the frame range an export node exports.
+# PROCEDURE:        Use the scene's playback range unless the export node uses a sub range.
+# PRESUMPTION:      settings are the export node's SIP_FBXExportSettings.
+def SIP_ReturnExportNodeFrameRange(settings):
+    if settings.useSubRange:
+        return settings.startFrame, settings.endFrame
+
+    return cmds.playbackOptions(query=True, minTime=1), cmds.playbackOptions(query=True, maxTime=1)
 
-        for curRef in reference:
-            characters.append(cmds.file(curRef, namespace=1, query=True))
+# PURPOSE:          Return the FBX option preset an animation clip is exported with.
+# PROCEDURE:        An origin layer and driven blendshapes still need the plugin to bake, but on a pre-baked rig that no
+#                   longer pulls the character's rig for the joints. Extracted root motion is plain keys.
+# PRESUMPTION:      None.
+def SIP_ReturnAnimationPreset(preBaked, moveToOrigin, liveBlendshapes):
+    if preBaked and (not moveToOrigin or SIP_ArrayRootMotion) and not liveBlendshapes:
+        return "animationPreBaked"
 
-    for curCharacter in characters:
-        # Get the meshes with blendshapes
-        meshes = SIP_FindMeshWithBlendshapes(curCharacter)
-        # Get origin.
-        origin = SIP_ReturnOrigin(curCharacter)
+    return "animation"
 
-        exportNodes = []
 
-        if exportNode:
-            exportNodes.append(exportNode)
-        else:
-            exportNodes = SIP_ReturnFBXExportNodes(origin)
+# PURPOSE:          Work out what an animation export of one character will do.
+# PROCEDURE:        Find the character's animation export nodes and their frame ranges and animLayer states, and pick
+#                   its evaluation mode. In incremental mode, export nodes whose hashed inputs and output file match
+#                   the manifest are left out and appended to report as skipped.
+#                   Returns a dict for SIP_IterExportCharacterAnimation and SIP_PreBakeCharacterExportRigs.
+# PRESUMPTION:      An empty exportNode exports every export node of the character.
+def SIP_ReturnCharacterExportPlan(characterName, exportNode, incremental, manifest, report):
+    # Get the meshes with blendshapes
+    meshes = SIP_FindMeshWithBlendshapes(characterName)
+    # Get origin.
+    origin = SIP_ReturnOrigin(characterName)
+
+    exportNodes = []
+
+    if exportNode:
+        exportNodes.append(exportNode)
+    else:
+        exportNodes = SIP_ReturnFBXExportNodes(origin)
+
+    # Export nodes connected to meshes are model export nodes.
+    animExportNodes = []
+    settings = {}
 
+    if origin != "Error":
         for curExportNode in exportNodes:
-            test = SIP_ReturnConnectedMeshes(curExportNode)
+            settings[curExportNode] = SIP_ReturnFBXExportSettings(curExportNode)
+
+            if settings[curExportNode].export and not SIP_ReturnConnectedMeshes(curExportNode):
+                animExportNodes.append(curExportNode)
+
+    frameRanges = {}
+    layerStates = {}
+    layerSettings = {}
+    animLayerState = SIP_ReturnAnimLayerState()
+
+    for curExportNode in animExportNodes:
+        frameRanges[curExportNode] = SIP_ReturnExportNodeFrameRange(settings[curExportNode])
+        layerStates[curExportNode] = SIP_ReturnExportAnimLayerState(settings[curExportNode].animLayers,
+                                                                    animLayerState)
+        # Export nodes that end up with the same layer state share a pre-bake.
+        layerSettings[curExportNode] = SIP_ReturnAnimLayerSettingsString(layerStates[curExportNode])
+
+    inputHashes = {}
+    exportReasons = {}
+    liveBlendshapes = SIP_HasDrivenBlendshapes(meshes) if animExportNodes else False
+
+    if incremental and animExportNodes:
+        with SIP_TimingSpan("incrementalHash", character=characterName, exportNodes=len(animExportNodes)):
+            curveKeys = SIP_ReturnCharacterCurveKeys(origin, meshes)
+            # Export nodes without recorded animLayers export with the scene's layer state.
+            rigSignature = SIP_ReturnRigSignature(origin) + SIP_ReturnAnimLayerSettingsString(animLayerState)
+            changedExportNodes = []
+
+            for curExportNode in animExportNodes:
+                fileName = settings[curExportNode].exportName
+                preset = SIP_ReturnAnimationPreset(SIP_PreBakeAnimation, settings[curExportNode].moveToOrigin,
+                                                   liveBlendshapes)
+                optionsSignature = SIP_ReturnFBXOptionsSignature(
+                    SIP_ReturnFBXOptions(preset, overrides=SIP_ReturnFBXOptionOverrides(settings[curExportNode])))
+                nodeRigSignature = rigSignature
+
+                # How the origin is moved changes the file.
+                if settings[curExportNode].moveToOrigin:
+                    nodeRigSignature += repr((SIP_ArrayRootMotion, SIP_RootMotionAttr))
+
+                inputHashes[curExportNode] = SIP_ReturnExportNodeHash(settings[curExportNode],
+                                                                      frameRanges[curExportNode], curveKeys,
+                                                                      nodeRigSignature, optionsSignature)
+                doExport, reason = SIP_ReturnExportDecision(manifest, fileName, inputHashes[curExportNode])
+
+                if doExport:
+                    changedExportNodes.append(curExportNode)
+                    exportReasons[curExportNode] = reason
+                else:
+                    report.append({"character": characterName, "exportNode": curExportNode, "file": fileName,
+                                   "action": "skipped", "reason": reason})
+
+            animExportNodes = changedExportNodes
+
+    rigName = ""
+    evaluationMode = ""
+
+    if animExportNodes:
+        rigName = SIP_ReturnRigName(origin)
+
+        if SIP_AutoEvaluationMode:
+            evaluationMode = SIP_ReturnRigEvaluationMode(characterName, origin)
+
+    return {"character": characterName, "origin": origin, "meshes": meshes, "exportNodes": animExportNodes,
+            "settings": settings, "frameRanges": frameRanges, "layerStates": layerStates,
+            "layerSettings": layerSettings, "animLayerState": animLayerState, "inputHashes": inputHashes,
+            "exportReasons": exportReasons, "rigName": rigName, "evaluationMode": evaluationMode,
+            "liveBlendshapes": liveBlendshapes}
+
+
+# PURPOSE:          Pre-bake the export rigs of several characters in one timeline pass.
+# PROCEDURE:        Baking steps through time, so its cost is the frames evaluated, not the curves written. AnimLayers
+#                   are scene wide, so one pass bakes one layer setup: the one the most frames are exported with.
+#                   Build the export rig of every character with clips in that setup, switch the layers to it and
+#                   bake all the rigs with one SIP_PreBakeExportRig over the union of the clips' ranges, in the
+#                   slowest of the characters' evaluation modes. Then put the layers back.
+#                   Returns {character: (exportRig, layerSettings)} for SIP_IterExportCharacterAnimation, or an empty
+#                   dict if fewer than two characters would share the pass.
+# PRESUMPTION:      plans come from SIP_ReturnCharacterExportPlan, taken with the same scene animLayer state.
+def SIP_PreBakeCharacterExportRigs(plans):
+    frames = {}
+
+    for curPlan in plans:
+        for curExportNode in curPlan["exportNodes"]:
+            startFrame, endFrame = curPlan["frameRanges"][curExportNode]
+            curSettings = curPlan["layerSettings"][curExportNode]
+            frames[curSettings] = frames.get(curSettings, 0) + int(endFrame - startFrame) + 1
+
+    if not frames:
+        return {}
+
+    bakeSettings = max(sorted(frames), key=lambda cur: frames[cur])
+    groups = []
+
+    for curPlan in plans:
+        group = [cur for cur in curPlan["exportNodes"] if curPlan["layerSettings"][cur] == bakeSettings]
+
+        if group:
+            groups.append((curPlan, group))
+
+    if len(groups) < 2:
+        return {}
+
+    bakeStart = min(curPlan["frameRanges"][cur][0] for curPlan, group in groups for cur in group)
+    bakeEnd = max(curPlan["frameRanges"][cur][1] for curPlan, group in groups for cur in group)
+    modes = [curPlan["evaluationMode"] for curPlan, group in groups if curPlan["evaluationMode"]]
+    animLayerState = groups[0][0]["animLayerState"]
+    exportRigs = {}
+
+    with SIP_TimingSpan("sharedPreBake", characters=len(groups), frames=int(bakeEnd - bakeStart) + 1) as bakeTags:
+        for curPlan, group in groups:
+            with SIP_TimingSpan("copySkeleton", character=curPlan["character"]) as rigTags:
+                exportRigs[curPlan["character"]] = (SIP_CopyAndConnectSkeleton(curPlan["origin"]), bakeSettings)
+                rigTags["joints"] = len(exportRigs[curPlan["character"]][0])
+
+        joints = [cur for curRig, curSettings in exportRigs.values() for cur in curRig]
+        bakeTags["joints"] = len(joints)
+
+        with SIP_TimingSpan("animLayers"):
+            liveLayerState = SIP_ApplyAnimLayerState(groups[0][0]["layerStates"][groups[0][1][0]], animLayerState)
+
+        try:
+            # A rig that is only safe in a slower mode makes the whole pass use it.
+            if modes:
+                SIP_SetEvaluationMode(max(modes, key=lambda cur: SIP_EvaluationModes.index(cur)
+                                          if cur in SIP_EvaluationModes else len(SIP_EvaluationModes)))
+
+            with SIP_TimingSpan("preBake", joints=len(joints), frames=int(bakeEnd - bakeStart) + 1,
+                                exportNodes=sum(len(group) for curPlan, group in groups)) as preBakeTags:
+                preBakeTags["method"] = SIP_PreBakeExportRig(joints, bakeStart, bakeEnd)
+        finally:
+            with SIP_TimingSpan("animLayers"):
+                SIP_RestoreAnimLayerState(animLayerState, liveLayerState)
+
+    return exportRigs
+
+
+# PURPOSE:          Export the animation of one character, one clip at a time.
+# PROCEDURE:        Generator. Build and (pre-)bake an export rig and export the range of each of the plan's export
+#                   nodes. A rig for the character in preBakedRigs, from SIP_PreBakeCharacterExportRigs, is taken out
+#                   of it and used for the clips in its layer setup, the other rigs in it are not cleared as garbage.
+#                   Append what was done to each export node to report.
+#                   Yields a "start" event before and an "exported" event after each clip. Closing the generator
+#                   between clips still clears the garbage and restores the anim layers.
+# PRESUMPTION:      Called by SIP_IterExportFBXAnimation. plan comes from SIP_ReturnCharacterExportPlan.
+def SIP_IterExportCharacterAnimation(plan, incremental, manifest, report, preBakedRigs=None):
+    characterName = plan["character"]
+
+    with SIP_TimingSpan("character", character=characterName) as characterTags:
+        meshes = plan["meshes"]
+        origin = plan["origin"]
+        animExportNodes = list(plan["exportNodes"])
+        settings = plan["settings"]
+        frameRanges = plan["frameRanges"]
+        layerStates = plan["layerStates"]
+        layerSettings = plan["layerSettings"]
+        inputHashes = plan["inputHashes"]
+        exportReasons = plan["exportReasons"]
+        rigName = plan["rigName"]
+        evaluationMode = plan["evaluationMode"]
+        animLayerState = plan["animLayerState"]
+        liveLayerState = animLayerState
+
+        if preBakedRigs is None:
+            preBakedRigs = {}
+
+        # The export rig is built once per character (once per animLayer setup when pre-baking) and reset between
+        # export nodes.
+        exportRig, bakedLayerSettings = preBakedRigs.pop(characterName, ([], None))
+        sharedLayerSettings = bakedLayerSettings
+        originMove = ""
+
+        # Set to False once the curve pre-bake probe finds the skeleton rig driven, so later setups skip it.
+        useCurves = None
+
+        characterTags["exportNodes"] = len(animExportNodes)
+
+        # A pre-bake is only valid for one animLayer setup, so group export nodes that share one, starting with the
+        # setup of a shared pre-bake.
+        if SIP_PreBakeAnimation:
+            animExportNodes.sort(key=lambda cur: (layerSettings[cur] != sharedLayerSettings, layerSettings[cur]))
+
+        liveBlendshapes = plan["liveBlendshapes"]
+        isolationNodes = []
+
+        if animExportNodes:
+            characterTags["evaluationMode"] = evaluationMode or SIP_ReturnEvaluationMode()
+
+            if SIP_IsolateCharacterEvaluation:
+                with SIP_TimingSpan("isolationNodes") as isolationTags:
+                    isolationNodes = SIP_ReturnIsolationNodes(characterName, origin, meshes)
+                    isolationTags["nodes"] = len(isolationNodes)
+
+        # Also runs when a queued export is cancelled between clips.
+        try:
+            for curExportNode in animExportNodes:
+                startFrame, endFrame = frameRanges[curExportNode]
+                frames = int(endFrame - startFrame) + 1
+
+                # Lets a queued export show what comes next before the clip is exported, see SIP_RunExportQueueStep.
+                yield {"event": "start", "character": characterName, "exportNode": curExportNode, "frames": frames}
+
+                # Set for every clip, queued exports give the user their own mode back between clips.
+                SIP_SetEvaluationMode(evaluationMode)
+                sharedPreBake = sharedLayerSettings is not None and layerSettings[curExportNode] == sharedLayerSettings
+
+                # Blocked per clip, like the evaluation mode, so the other characters play between queued clips.
+                with SIP_TimingSpan("exportNode", character=characterName, exportNode=curExportNode,
+                                    frames=frames, evaluationMode=characterTags["evaluationMode"],
+                                    sharedPreBake=sharedPreBake) as nodeTags, \
+                        SIP_IsolatedEvaluation(isolationNodes) as isolatedNodes:
+                    nodeTags["isolatedNodes"] = isolatedNodes
+
+                    if (exportRig and bakedLayerSettings is not None and
+                            layerSettings[curExportNode] != bakedLayerSettings):
+                        with SIP_TimingSpan("clearGarbage"):
+                            SIP_ClearGarbage(keep=[cur[0][-1] for cur in preBakedRigs.values()])
+                        exportRig = []
+
+                    if not exportRig:
+                        with SIP_TimingSpan("copySkeleton") as rigTags:
+                            exportRig = SIP_CopyAndConnectSkeleton(origin)
+                            rigTags["joints"] = len(exportRig)
+                        bakedLayerSettings = None
+                    else:
+                        with SIP_TimingSpan("resetExportRig", joints=len(exportRig)):
+                            SIP_ResetExportRig(origin, exportRig, originMove, preBaked=bakedLayerSettings is not None)
+
+                    nodeTags["joints"] = len(exportRig)
+                    originMove = ""
+
+                    # Only the layers that differ from the previous export node are touched.
+                    with SIP_TimingSpan("animLayers"):
+                        liveLayerState = SIP_ApplyAnimLayerState(layerStates[curExportNode], liveLayerState)
+
+                    if SIP_PreBakeAnimation and bakedLayerSettings is None:
+                        group = [cur for cur in animExportNodes if layerSettings[cur] == layerSettings[curExportNode]]
+                        bakeStart = min(frameRanges[cur][0] for cur in group)
+                        bakeEnd = max(frameRanges[cur][1] for cur in group)
+
+                        with SIP_TimingSpan("preBake", joints=len(exportRig), frames=int(bakeEnd - bakeStart) + 1,
+                                            exportNodes=len(group)) as preBakeTags:
+                            preBakeTags["method"] = SIP_PreBakeExportRig(exportRig, bakeStart, bakeEnd,
+                                                                         useCurves=useCurves)
+                        bakedLayerSettings = layerSettings[curExportNode]
+
+                        if preBakeTags["method"] == "bakeResults":
+                            useCurves = False
+
+                    # Only the clip's own export is logged: the rig build and pre-bake are shared by several clips.
+                    clipStart = _SIP_TimingClock()
+                    moveToOrigin = settings[curExportNode].moveToOrigin
+
+                    if moveToOrigin:
+                        # The copied origin is always last in the export rig.
+                        newOrigin = exportRig[-1]
+                        zeroOriginFlag = settings[curExportNode].zeroOrigin
+
+                        with SIP_TimingSpan("transformToOrigin", bake=bakedLayerSettings is None,
+                                            rootMotion=SIP_ArrayRootMotion):
+                            if SIP_ArrayRootMotion:
+                                originMove = SIP_ExtractRootMotion(newOrigin, startFrame, endFrame, zeroOriginFlag,
+                                                                   bake=bakedLayerSettings is None)
+                            else:
+                                originMove = SIP_TransformToOrigin(newOrigin, startFrame, endFrame, zeroOriginFlag,
+                                                                   bake=bakedLayerSettings is None)
+
+                    cmds.select(clear=True)
+                    cmds.select(exportRig, add=True)
+                    cmds.select(meshes, add=True)
+
+                    preset = SIP_ReturnAnimationPreset(bakedLayerSettings is not None, moveToOrigin, liveBlendshapes)
+                    nodeTags["preset"] = preset
+
+                    with SIP_TimingSpan("fbxOptions", preset=preset) as optionTags:
+                        optionTags["sent"] = len(SIP_ApplyFBXOptions(
+                            SIP_ReturnFBXOptions(preset, startFrame, endFrame,
+                                                 SIP_ReturnFBXOptionOverrides(settings[curExportNode]))))
+
+                    newFBX = SIP_ExportFBX(curExportNode, settings[curExportNode])
+                    clipSeconds = _SIP_TimingClock() - clipStart
+                    fileName = settings[curExportNode].exportName
+
+                    if not newFBX:
+                        reason = "no export file name"
+                    elif incremental:
+                        reason = exportReasons[curExportNode]
+                        manifest["exports"][fileName] = {"exportNode": curExportNode,
+                                                         "hash": inputHashes[curExportNode],
+                                                         "output": SIP_ReturnFileStamp(newFBX)}
+                    else:
+                        reason = "incremental export off"
+
+                    report.append({"character": characterName, "exportNode": curExportNode, "file": fileName,
+                                   "action": "exported" if newFBX else "failed", "reason": reason})
+
+                    if newFBX and incremental:
+                        report[-1]["manifestEntry"] = manifest["exports"][fileName]
+
+                if report[-1]["action"] == "exported" and SIP_AutoEvaluationMode:
+                    # The Evaluation Manager hands the scene to the DG when it cannot evaluate it.
+                    fallback = evaluationMode not in ["", "off"] and SIP_ReturnEvaluationMode() == "off"
+                    SIP_LogEvaluationTiming(rigName, characterTags["evaluationMode"], frames, clipSeconds, fallback)
+
+                yield {"event": "exported", "character": characterName, "exportNode": curExportNode, "frames": frames,
+                       "action": report[-1]["action"]}
+        finally:
+            with SIP_TimingSpan("clearGarbage"):
+                SIP_ClearGarbage(keep=[cur[0][-1] for cur in preBakedRigs.values()])
+
+            with SIP_TimingSpan("animLayers"):
+                SIP_RestoreAnimLayerState(animLayerState, liveLayerState)
+
+
+# PURPOSE:          Export the animation of one, several or all characters, one clip at a time.
+# PROCEDURE:        Generator. Plan every character's export with SIP_ReturnCharacterExportPlan and, when more than one
+#                   character has clips, pre-bake their export rigs together with SIP_PreBakeCharacterExportRigs. Then
+#                   export each character with SIP_IterExportCharacterAnimation and pass its events on.
+#                   With incremental (or SIP_IncrementalExport when not given), export nodes whose hashed inputs and
+#                   output file match the manifest are skipped. If a manifest is passed in, the caller owns it and it
+#                   is not saved here. What was done to each export node and why is appended to report, and printed
+#                   with SIP_PrintExportReports. Closing the generator between clips saves the manifest for the clips
+#                   that were exported.
+# PRESUMPTION:      characterName is a namespace or a list of them, empty for every referenced character. An empty
+#                   exportNode exports every export node.
+def SIP_IterExportFBXAnimation(characterName, exportNode, incremental=None, manifest=None, report=None):
+    with SIP_TimingSpan("exportAnimation", character=characterName, exportNode=exportNode):
+        with SIP_TimingSpan("clearGarbage"):
+            SIP_ClearGarbage(sceneScan=True)
+
+        characters = []
+
+        if report is None:
+            report = []
+
+        if incremental is None:
+            incremental = SIP_IncrementalExport
+
+        saveManifest = incremental and manifest is None
+
+        if incremental and manifest is None:
+            manifest = SIP_LoadExportManifest()
+
+        # Options may have been changed outside this module since the last export, so send them all once per run.
+        SIP_InvalidateFBXOptions()
+
+        if isinstance(characterName, (list, tuple)):
+            characters.extend(characterName)
+        elif characterName:
+            characters.append(characterName)
+        else:
+            reference = cmds.file(reference=1, query=True)
 
-            if cmds.getAttr(curExportNode + ".export") and origin != "Error" and not test:
-                exportRig = SIP_CopyAndConnectSkeleton(origin)
+            for curRef in reference:
+                characters.append(cmds.file(curRef, namespace=1, query=True))
 
-                startFrame = cmds.playbackOptions(query=True, minTime=1)
-                endFrame = cmds.playbackOptions(query=True, minTime=1)
+        preBakedRigs = {}
 
-                subAnimCheck = cmds.getAttr(curExportNode + ".useSubRange")
+        try:
+            with SIP_TimingSpan("plan", characters=len(characters)):
+                plans = [SIP_ReturnCharacterExportPlan(cur, exportNode, incremental, manifest, report)
+                         for cur in characters]
 
-                if subAnimCheck:
-                    startFrame = cmds.getAttr(curExportNode + ".startFrame")
-                    endFrame = cmds.getAttr(curExportNode + ".endFrame")
+            if SIP_PreBakeAnimation and SIP_SharedPreBake:
+                preBakedRigs = SIP_PreBakeCharacterExportRigs(plans)
 
-                if cmds.getAttr(curExportNode + ".moveToOrigin"):
-                    newOrigin = cmds.listConnections(origin + ".translateX", source=False, d=True)
-                    zeroOriginFlag = cmds.getAttr(curExportNode + ".zeroOrigin")
-                    SIP_TransformToOrigin(newOrigin[0], startFrame, endFrame, zeroOriginFlag)
+            for curPlan in plans:
+                steps = SIP_IterExportCharacterAnimation(curPlan, incremental, manifest, report, preBakedRigs)
 
-                cmds.select(clear=True)
-                cmds.select(exportRig, add=True)
-                cmds.select(meshes, add=True)
+                try:
+                    for curEvent in steps:
+                        yield curEvent
+                finally:
+                    steps.close()
+        finally:
+            # Rigs of characters that were not reached, when the export was closed or failed.
+            if preBakedRigs:
+                with SIP_TimingSpan("clearGarbage"):
+                    SIP_ClearGarbage()
 
-                SIP_SetAnimLayersFromSettings(curExportNode)
+            if saveManifest:
+                SIP_SaveExportManifest(manifest)
 
-                mel.eval("SIP_SetFBXExportOptions_animation(" + str(startFrame) + "," + str(endFrame) + ")")
+            if SIP_PrintExportReports:
+                SIP_PrintExportReport(report)
 
-                SIP_ExportFBX(curExportNode)
 
-            SIP_ClearGarbage()
+# PURPOSE:          Export the animation of one, several or all characters.
+# PROCEDURE:        Run SIP_IterExportFBXAnimation to the end in an SIP_ExportTransaction. Return a report with what was
+#                   done to each export node and why.
+# PRESUMPTION:      characterName is a namespace or a list of them, empty for every referenced character. An empty
+#                   exportNode exports every export node.
+def SIP_ExportFBXAnimation(characterName, exportNode, incremental=None, manifest=None):
+    report = []
 
+    with SIP_ExportTransaction():
+        for curEvent in SIP_IterExportFBXAnimation(characterName, exportNode, incremental, manifest, report):
+            pass
 
+    return report
+
+
+# PURPOSE:          Export the skeleton and meshes of the scene's character for one or all model export nodes.
+# PROCEDURE:        In an SIP_ExportTransaction, parent the origin to the world once, select it with each export
+#                   node's meshes and export. The transaction puts the origin back under its parent afterwards.
+#                   Return a report with what was done to each export node, like SIP_ExportFBXAnimation.
+# PRESUMPTION:      Scene has one origin. An empty exportNode exports every export node.
 def SIP_ExportFBXCharacter(exportNode):
     origin = SIP_ReturnOrigin("")
     exportNodes = []
+    report = []
 
     if exportNode:
         exportNodes.append(exportNode)
     else:
         exportNodes = SIP_ReturnFBXExportNodes(origin)
 
-    parentNode = cmds.listRelatives(origin, parent=True, fullPath=True)
+    SIP_InvalidateFBXOptions()
+
+    with SIP_ExportTransaction([origin]):
+        # Every export node exports the origin from the world, not only the first one.
+        if cmds.listRelatives(origin, parent=True):
+            origin = cmds.parent(origin, world=True)[0]
+
+        with SIP_TimingSpan("exportCharacter", character=SIP_ReturnNamespace(origin), exportNode=exportNode):
+            for curExportNode in exportNodes:
+                settings = SIP_ReturnFBXExportSettings(curExportNode)
+
+                if settings.export:
+                    with SIP_TimingSpan("exportNode", character=SIP_ReturnNamespace(origin),
+                                        exportNode=curExportNode, preset="model") as nodeTags:
+                        with SIP_TimingSpan("fbxOptions", preset="model") as optionTags:
+                            optionTags["sent"] = len(SIP_ApplyFBXOptions(
+                                SIP_ReturnFBXOptions("model", overrides=SIP_ReturnFBXOptionOverrides(settings))))
+
+                        cmds.select(clear=True)
+
+                        meshes = SIP_ReturnConnectedMeshes(curExportNode)
+                        cmds.select(origin, add=True)
+                        cmds.select(meshes, add=True)
+                        nodeTags["meshes"] = len(meshes or [])
+
+                        newFBX = SIP_ExportFBX(curExportNode, settings)
+                        report.append({"character": SIP_ReturnNamespace(origin), "exportNode": curExportNode,
+                                       "file": settings.exportName,
+                                       "action": "exported" if newFBX else "failed",
+                                       "reason": "model export" if newFBX else "no export file name"})
+
+    return report
+
+
+######################################
+#
+#    Export queue procs
+#
+######################################
+
+# Set to False to make the exporter window's animation export buttons export right away instead of queueing.
+SIP_QueueUIExports = True
+
+# Animation exports queued from the exporter window. They run a clip at a time on idle events so Maya stays usable.
+_SIP_ExportQueue = {"jobs": [], "steps": None, "scriptJob": None, "cancel": False, "clip": None, "report": [],
+                    "jobReport": [], "status": "", "totalFrames": 0, "doneFrames": 0, "jobDoneFrames": 0,
+                    "exportedFrames": 0, "exportedSeconds": 0.0}
+
+
+# PURPOSE:          Return the clips an animation export of a character will export, to measure its progress.
+# PROCEDURE:        Same export nodes as SIP_IterExportCharacterAnimation: the given one or all of the character's,
+#                   with export on and no meshes. Return (exportNode, frames) pairs.
+# PRESUMPTION:      characterName is a namespace. Incremental skips are not known yet, they count as done when the
+#                   character is finished.
+def SIP_ReturnAnimationExportClips(characterName, exportNode):
+    clips = []
+    origin = SIP_ReturnOrigin(characterName)
+
+    if origin == "Error":
+        return clips
+
+    for curExportNode in ([exportNode] if exportNode else SIP_ReturnFBXExportNodes(origin) or []):
+        settings = SIP_ReturnFBXExportSettings(curExportNode)
+
+        if settings.export and not SIP_ReturnConnectedMeshes(curExportNode):
+            startFrame, endFrame = SIP_ReturnExportNodeFrameRange(settings)
+            clips.append((curExportNode, int(endFrame - startFrame) + 1))
+
+    return clips
+
+
+# PURPOSE:          Queue the animation export of one or several characters, or of one export node.
+# PROCEDURE:        Count the frames to export and add the job to the queue. Several characters are one job, so they
+#                   share one pre-bake pass like in SIP_ExportFBXAnimation. If the queue is not running, reset its
+#                   progress and start an idle event scriptJob that runs SIP_RunExportQueueStep.
+#                   Return False if there is nothing to export.
+# PRESUMPTION:      characterName is a namespace with an origin, or a list of them. Needs Maya's UI for idle events.
+def SIP_QueueFBXAnimationExport(characterName, exportNode="", incremental=None):
+    queue = _SIP_ExportQueue
+    characters = list(characterName) if isinstance(characterName, (list, tuple)) else [characterName]
+    clips = [cur for curCharacter in characters for cur in SIP_ReturnAnimationExportClips(curCharacter, exportNode)]
+
+    if not clips:
+        cmds.warning("Nothing to export for " + ", ".join(characters) + "\n")
+        return False
+
+    if queue["scriptJob"] is None:
+        queue.update({"cancel": False, "clip": None, "report": [], "status": "", "totalFrames": 0, "doneFrames": 0,
+                      "exportedFrames": 0, "exportedSeconds": 0.0})
+        queue["scriptJob"] = cmds.scriptJob(idleEvent="import FBXAnimationExporter as FBX\n"
+                                                      "FBX.SIP_RunExportQueueStep()")
+
+    frames = sum(cur[1] for cur in clips)
+    queue["jobs"].append({"character": characterName, "exportNode": exportNode, "incremental": incremental,
+                          "frames": frames})
+    queue["totalFrames"] += frames
+
+    SIP_FBXExporterUI_UpdateExportQueueProgress()
+    return True
+
+
+# PURPOSE:          Run the next step of the export queue.
+# PROCEDURE:        Called on idle events. Start the next job's SIP_IterExportFBXAnimation if none is running, then
+#                   advance it by one event: either up to the next clip, so the window can show it, or through the
+#                   export of that clip, in an SIP_ExportTransaction. Stop the queue when it is empty, cancelled or an
+#                   export fails.
+# PRESUMPTION:      Started by SIP_QueueFBXAnimationExport.
+def SIP_RunExportQueueStep():
+    queue = _SIP_ExportQueue
+    start = _SIP_TimingClock()
+
+    try:
+        # Undo stays off only while a step runs. The anim layers are restored by the export itself when it ends.
+        with SIP_ExportTransaction(animLayers=False):
+            if queue["cancel"]:
+                SIP_StopExportQueue("Cancelled")
+                return
+
+            if queue["steps"] is None:
+                if not queue["jobs"]:
+                    SIP_StopExportQueue("Done")
+                    return
+
+                job = queue["jobs"][0]
+                queue["jobReport"] = []
+                queue["steps"] = SIP_IterExportFBXAnimation(job["character"], job["exportNode"], job["incremental"],
+                                                            report=queue["jobReport"])
+                queue["jobDoneFrames"] = 0
+
+            try:
+                event = next(queue["steps"])
+            except StopIteration:
+                # Clips the incremental export skipped count as done.
+                job = queue["jobs"].pop(0)
+                queue["doneFrames"] += max(0, job["frames"] - queue["jobDoneFrames"])
+                queue["report"].extend(queue["jobReport"])
+                queue["jobReport"] = []
+                queue["steps"] = None
+                queue["clip"] = None
+                return
+
+            if event["event"] == "start":
+                queue["clip"] = event
+            else:
+                queue["clip"] = None
+                queue["doneFrames"] += event["frames"]
+                queue["jobDoneFrames"] += event["frames"]
+                queue["exportedFrames"] += event["frames"]
+                queue["exportedSeconds"] += _SIP_TimingClock() - start
+    except Exception:
+        SIP_StopExportQueue("Failed")
+        raise
+    finally:
+        SIP_FBXExporterUI_UpdateExportQueueProgress()
+
+
+# PURPOSE:          Cancel the queued exports.
+# PROCEDURE:        Flag the queue. The clip being exported, if any, is finished first: the next step stops the queue.
+# PRESUMPTION:      None.
+def SIP_CancelExportQueue():
+    if _SIP_ExportQueue["scriptJob"] is not None:
+        _SIP_ExportQueue["cancel"] = True
+        _SIP_ExportQueue["status"] = "Cancelling"
+        SIP_FBXExporterUI_UpdateExportQueueProgress()
+
+
+# PURPOSE:          Stop the export queue.
+# PROCEDURE:        Close the running export, which restores the anim layers and saves the manifest for the clips
+#                   that were exported, then clear the garbage, drop the queued jobs and kill the idle scriptJob.
+# PRESUMPTION:      status is shown in the exporter window.
+def SIP_StopExportQueue(status):
+    queue = _SIP_ExportQueue
+
+    try:
+        with SIP_ExportTransaction(animLayers=False):
+            if queue["steps"] is not None:
+                queue["steps"].close()
+                queue["report"].extend(queue["jobReport"])
+
+            SIP_ClearGarbage()
+    finally:
+        scriptJob = queue["scriptJob"]
+        queue.update({"jobs": [], "steps": None, "scriptJob": None, "cancel": False, "clip": None, "jobReport": [],
+                      "status": status})
+
+        if scriptJob is not None and cmds.scriptJob(exists=scriptJob):
+            cmds.scriptJob(kill=scriptJob, force=True)
 
-    if parentNode:
-        cmds.parent(origin, world=True)
 
-    for curExportNode in exportNodes:
-        if cmds.getAttr(curExportNode + ".export"):
-            mel.eval("SIP_SetFBXExportOptions_model()")
+# PURPOSE:          Return the progress of the export queue.
+# PROCEDURE:        Frames per second are measured over the clips exported so far. The ETAs divide the frames left
+#                   (in the queue and in the next clip) by it, and are None until a clip has been exported.
+# PRESUMPTION:      None.
+def SIP_ReturnExportQueueProgress():
+    queue = _SIP_ExportQueue
+    fps = queue["exportedFrames"] / queue["exportedSeconds"] if queue["exportedSeconds"] else 0.0
+    remaining = max(0, queue["totalFrames"] - queue["doneFrames"])
+    clip = queue["clip"]
+
+    return {"running": queue["scriptJob"] is not None, "status": queue["status"], "jobs": len(queue["jobs"]),
+            "totalFrames": queue["totalFrames"], "doneFrames": min(queue["doneFrames"], queue["totalFrames"]),
+            "fps": fps, "eta": remaining / fps if fps else None, "clip": clip["exportNode"] if clip else "",
+            "clipFrames": clip["frames"] if clip else 0, "clipEta": clip["frames"] / fps if clip and fps else None,
+            "report": queue["report"] + queue["jobReport"]}
 
-            cmds.select(clear=True)
 
-            meshes = SIP_ReturnConnectedMeshes(curExportNode)
-            cmds.select(origin, add=True)
-            cmds.select(meshes, add=True)
+# PURPOSE:          Return seconds as a short string for ETAs.
+# PROCEDURE:        "?" for None, else seconds, or minutes and seconds from a minute up.
+# PRESUMPTION:      None.
+def SIP_ReturnDurationString(seconds):
+    if seconds is None:
+        return "?"
 
-            SIP_ExportFBX(curExportNode)
+    if seconds < 60:
+        return "%ds" % round(seconds)
 
-            if parentNode:
-                cmds.parent(origin, parentNode[0])
+    return "%dm%02ds" % divmod(int(round(seconds)), 60)
 
 
 ######################################
@@ -537,10 +3039,16 @@ def SIP_ExportFBXCharacter(exportNode):
 # PRESUMPTIONS:      Origin is going to be a joint. Rigs are not referenced in.
 def SIP_FBXExporterUI_PopulateModelRootJointsPanel():
     cmds.textScrollList("sip_FBXExporter_window_modelsOriginTextScrollList", edit=True, removeAll=True)
-    origin = SIP_ReturnOrigin("")
+    origins = SIP_ReturnOrigins("")
 
-    if origin != "Error":
-        cmds.textScrollList("sip_FBXExporter_window_modelsOriginTextScrollList", edit=True, ebg=False, append=origin)
+    if origins:
+        # More than one origin is listed in yellow so it can be fixed from here.
+        if len(origins) > 1:
+            cmds.textScrollList("sip_FBXExporter_window_modelsOriginTextScrollList", edit=True, bgc=[1, 0.8, 0.1],
+                                append=origins)
+        else:
+            cmds.textScrollList("sip_FBXExporter_window_modelsOriginTextScrollList", edit=True, ebg=False,
+                                append=origins)
     else:
         joints = cmds.ls(type="joint")
         for curJoint in joints:
@@ -630,28 +3138,28 @@ def SIP_FBXExporterUI_UpdateModelExportSettings():
     cmds.textFieldButtonGrp("sip_FBXExporter_window_modelExportFileNameTextFieldButtonGrp", edit=True, enable=True,
                             text="")
 
-    SIP_AddFBXNodeAttrs(exportNodes[0])
-
     if exportNodes:
+        settings = SIP_ReturnFBXExportSettings(exportNodes[0])
+
         cmds.textFieldButtonGrp("sip_FBXExporter_window_modelExportFileNameTextFieldButtonGrp", edit=True,
-                                text=cmds.getAttr(exportNodes[0] + ".exportName"))
+                                text=settings.exportName)
         cmds.checkBoxGrp("sip_FBXExporter_window_modelExportCheckBoxGrp", edit=True, enable=True,
-                         value1=cmds.getAttr(exportNodes[0] + ".export"))
+                         value1=settings.export)
 
 # PURPOSE:          Update the selected export node with the options set in the UI.
-# PROCEDURE:        Read in the values of the UI and call setAttr on the selected export node.
-# PRESUMPTION:      Selected export node is valid and has the needed attributes.
+# PROCEDURE:        Read in the values of the UI and write the settings that changed to the selected export node.
+# PRESUMPTION:      Selected export node is valid.
 def SIP_FBXExporterUI_UpdateExportNodeFromModelSettings():
     exportNodes = cmds.textScrollList("sip_FBXExporter_window_modelsExportNodesTextScrollList", query=True,
                                       selectItem=True)
 
     if exportNodes:
-        cmds.setAttr(exportNodes[0] + ".exportName",
-                     cmds.textFieldButtonGrp("sip_FBXExporter_window_modelExportFileNameTextFieldButtonGrp",
-                                             query=True, text=True),
-                     type="string")
-        cmds.setAttr(exportNodes[0] + ".export", cmds.checkBoxGrp("sip_FBXExporter_window_modelExportCheckBoxGrp",
-                                                                  query=True, value1=True))
+        settings = SIP_ReturnFBXExportSettings(exportNodes[0])
+        newSettings = settings._replace(
+            exportName=cmds.textFieldButtonGrp("sip_FBXExporter_window_modelExportFileNameTextFieldButtonGrp",
+                                               query=True, text=True),
+            export=bool(cmds.checkBoxGrp("sip_FBXExporter_window_modelExportCheckBoxGrp", query=True, value1=True)))
+        SIP_WriteFBXExportSettings(exportNodes[0], newSettings, settings)
 
 # PURPOSE:          Export all characters from the scene.
 # PROCEDURE:
@@ -729,33 +3237,31 @@ def SIP_FBXExporterUI_UpdateAnimationExportSettings():
                                       selectItem=True)
 
     if exportNodes:
-        SIP_AddFBXNodeAttrs(exportNodes[0])
+        settings = SIP_ReturnFBXExportSettings(exportNodes[0])
 
         cmds.checkBoxGrp("sip_FBXExporter_window_animationExportCheckBoxGrp", edit=True, enable=True,
-                         value1=cmds.getAttr(exportNodes[0] + ".export"))
+                         value1=settings.export)
         cmds.checkBoxGrp("sip_FBXExporter_window_animationZeroOriginCheckBoxGrp", edit=True, enable=True,
-                         value1=cmds.getAttr(exportNodes[0] + ".moveToOrigin"))
+                         value1=settings.moveToOrigin)
         cmds.checkBoxGrp("sip_FBXExporter_window_animationSubRangeCheckBoxGrp", edit=True, enable=True,
-                         value1=cmds.getAttr(exportNodes[0] + ".useSubRange"))
+                         value1=settings.useSubRange)
 
-        if cmds.getAttr(exportNodes[0] + ".useSubRange"):
+        if settings.useSubRange:
             cmds.floatFieldGrp("sip_FBXExporter_window_animationStartFrameFloatFieldGrp", edit=True, enable=True,
-                               value1=cmds.getAttr(exportNodes[0] + ".startFrame"))
+                               value1=settings.startFrame)
             cmds.floatFieldGrp("sip_FBXExporter_window_animationEndFrameFloatFieldGrp", edit=True, enable=True,
-                               value1=cmds.getAttr(exportNodes[0] + ".endFrame"))
+                               value1=settings.endFrame)
         else:
             cmds.floatFieldGrp("sip_FBXExporter_window_animationStartFrameFloatFieldGrp", edit=True, enable=False)
             cmds.floatFieldGrp("sip_FBXExporter_window_animationEndFrameFloatFieldGrp", edit=True, enable=False)
 
-        if cmds.getAttr(exportNodes[0] + ".moveToOrigin"):
+        if settings.moveToOrigin:
             cmds.checkBoxGrp("sip_FBXExporter_window_animationZeroOriginMotionCheckBoxGrp", edit=True, enable=True,
-                             value1=cmds.getAttr(exportNodes[0] + ".zeroOrigin"))
+                             value1=settings.zeroOrigin)
         else:
             cmds.checkBoxGrp("sip_FBXExporter_window_animationZeroOriginMotionCheckBoxGrp", edit=True, enable=False)
 
-        test = cmds.getAttr(exportNodes[0] + ".animLayers")
-
-        if test:
+        if settings.animLayers:
             cmds.button("sip_FBXExporter_window_animationRecordAnimLayersButton", edit=True, enable=True,
                         label="Re-Record Anim Layers", backgroundColor=[0.25, 0.25, 1.0])
         else:
@@ -766,41 +3272,38 @@ def SIP_FBXExporterUI_UpdateAnimationExportSettings():
         cmds.button("sip_FBXExporter_window_animationPreviewAnimLayersButton", edit=True, enable=True)
 
         cmds.textFieldGrp("sip_FBXExporter_window_animationExportFileNameTextFieldButtonGrp", edit=True, enable=True,
-                          text=cmds.getAttr(exportNodes[0] + ".exportName"))
+                          text=settings.exportName)
 
 # PURPOSE:          To update the selected Export Node with the settings in the UI.
-# PROCEDURE:        Get Export Node from textScrollList. Update export node attributes. setAttrs according to values
-#                   queried in UI.
+# PROCEDURE:        Get Export Node from textScrollList. Build its settings from the values queried in the UI and
+#                   write the ones that changed.
 # PRESUMPTION:      None.
 def SIP_FBXExporterUI_UpdateExportNodeFromAnimationSettings():
     exportNodes = cmds.textScrollList("sip_FBXExporter_window_animationExportNodesTextScrollList", query=True,
                                       selectItem=True)
 
     if exportNodes and cmds.objExists(exportNodes[0]):
-        SIP_AddFBXNodeAttrs(exportNodes[0])
-        cmds.setAttr(exportNodes[0] + ".export", cmds.checkBoxGrp("sip_FBXExporter_window_animationExportCheckBoxGrp",
-                                                                  query=True, value1=True))
-        cmds.setAttr(exportNodes[0] + ".moveToOrigin",
-                     cmds.checkBoxGrp("sip_FBXExporter_window_animationZeroOriginCheckBoxGrp",
-                                      query=True, value1=True))
-        cmds.setAttr(exportNodes[0] + ".zeroOrigin",
-                     cmds.checkBoxGrp("sip_FBXExporter_window_animationZeroOriginMotionCheckBoxGrp",
-                                      query=True, value1=True))
-        cmds.setAttr(exportNodes[0] + ".useSubRange",
-                     cmds.checkBoxGrp("sip_FBXExporter_window_animationSubRangeCheckBoxGrp",
-                                      query=True, value1=True))
-
-        if cmds.getAttr(exportNodes[0] + ".useSubRange"):
-            cmds.setAttr(exportNodes[0] + ".startFrame",
-                         cmds.floatFieldGrp("sip_FBXExporter_window_animationStartFrameFloatFieldGrp", query=True,
-                                            value1=True))
-            cmds.setAttr(exportNodes[0] + ".endFrame",
-                         cmds.floatFieldGrp("sip_FBXExporter_window_animationEndFrameFloatFieldGrp", query=True,
+        settings = SIP_ReturnFBXExportSettings(exportNodes[0])
+        newSettings = settings._replace(
+            export=bool(cmds.checkBoxGrp("sip_FBXExporter_window_animationExportCheckBoxGrp", query=True,
+                                         value1=True)),
+            moveToOrigin=bool(cmds.checkBoxGrp("sip_FBXExporter_window_animationZeroOriginCheckBoxGrp", query=True,
+                                               value1=True)),
+            zeroOrigin=bool(cmds.checkBoxGrp("sip_FBXExporter_window_animationZeroOriginMotionCheckBoxGrp",
+                                             query=True, value1=True)),
+            useSubRange=bool(cmds.checkBoxGrp("sip_FBXExporter_window_animationSubRangeCheckBoxGrp", query=True,
+                                              value1=True)),
+            exportName=cmds.textFieldButtonGrp("sip_FBXExporter_window_animationExportFileNameTextFieldButtonGrp",
+                                               query=True, text=True))
+
+        if newSettings.useSubRange:
+            newSettings = newSettings._replace(
+                startFrame=cmds.floatFieldGrp("sip_FBXExporter_window_animationStartFrameFloatFieldGrp", query=True,
+                                              value1=True),
+                endFrame=cmds.floatFieldGrp("sip_FBXExporter_window_animationEndFrameFloatFieldGrp", query=True,
                                             value1=True))
 
-        cmds.setAttr(exportNodes[0] + ".exportName",
-                     cmds.textFieldButtonGrp("sip_FBXExporter_window_animationExportFileNameTextFieldButtonGrp",
-                                             query=True, text=True), type="string")
+        SIP_WriteFBXExportSettings(exportNodes[0], newSettings, settings)
 
 # PURPOSE:          Create a new export node and connect it to the origin of the character selected in a
 #                   actorsTextScrollList.
@@ -822,27 +3325,69 @@ def SIP_FBXExporterUI_AnimationCreateNewExportNode():
                 SIP_FBXExporterUI_PopulateAnimationExportNodesPanel()
 
 
+# PURPOSE:          Export the animation of one or several characters from the exporter window.
+# PROCEDURE:        Queue it with SIP_QueueFBXAnimationExport, or export it right away if SIP_QueueUIExports is off.
+# PRESUMPTION:      characterName is a namespace or a list of them.
+def SIP_FBXExporterUI_ExportAnimation(characterName, exportNode):
+    if SIP_QueueUIExports:
+        SIP_QueueFBXAnimationExport(characterName, exportNode)
+    else:
+        SIP_ExportFBXAnimation(characterName, exportNode)
+
 def SIP_FBXExporterUI_ExportSelectedAnimation():
     exportNodes = cmds.textScrollList("sip_FBXExporter_window_animationExportNodesTextScrollList", query=True,
                                       selectItem=True)
     ns = cmds.textScrollList("sip_FBXExporter_window_animationActorsTextScrollList", query=True, selectItem=True)
 
     if exportNodes and ns:
-        SIP_ExportFBXAnimation(ns[0], exportNodes[0])
+        SIP_FBXExporterUI_ExportAnimation(ns[0], exportNodes[0])
 
 def SIP_FBXExporterUI_ExportAllAnimationForSelectedCharacter():
     ns = cmds.textScrollList("sip_FBXExporter_window_animationActorsTextScrollList", query=True, selectItem=True)
 
-    SIP_ExportFBXAnimation(ns[0], "")
+    if ns:
+        SIP_FBXExporterUI_ExportAnimation(ns[0], "")
 
 def SIP_FBXExporterUI_ExportAllAnimation():
     ns = cmds.textScrollList("sip_FBXExporter_window_animationActorsTextScrollList", query=True, allItems=True)
 
-    for curChar in ns:
-        origin = SIP_ReturnOrigin(curChar)
+    if SIP_ParallelExport and ns:
+        import FBXAnimationExporter_Batch as Batch
+        Batch.SIP_ExportFBXAnimationParallel([cur for cur in ns if SIP_ReturnOrigin(cur) != "Error"])
+        return
 
-        if origin != "Error":
-            SIP_ExportFBXAnimation(curChar, "")
+    characters = [cur for cur in ns or [] if SIP_ReturnOrigin(cur) != "Error"]
+
+    # Exported, or queued, together so the characters share one pre-bake pass.
+    if characters:
+        SIP_FBXExporterUI_ExportAnimation(characters, "")
+
+# PURPOSE:          Show the export queue's progress in the exporter window.
+# PROCEDURE:        Set the progress bar to the frames done, show the clip being exported with its ETA and the ETA of
+#                   the whole queue, and only enable Cancel while the queue runs.
+# PRESUMPTION:      Does nothing if the exporter window is closed.
+def SIP_FBXExporterUI_UpdateExportQueueProgress():
+    if not cmds.progressBar("sip_FBXExporter_window_exportQueueProgressBar", exists=True):
+        return
+
+    progress = SIP_ReturnExportQueueProgress()
+
+    if progress["clip"]:
+        label = ("Exporting " + progress["clip"] + " (" + str(progress["clipFrames"]) + " frames, " +
+                 SIP_ReturnDurationString(progress["clipEta"]) + ")")
+    elif progress["running"]:
+        label = progress["status"] or "Preparing export"
+    else:
+        label = progress["status"]
+
+    if progress["running"]:
+        label += ("   " + str(progress["doneFrames"]) + "/" + str(progress["totalFrames"]) + " frames at " +
+                  "%.1f" % progress["fps"] + " fps, " + SIP_ReturnDurationString(progress["eta"]) + " left")
+
+    cmds.progressBar("sip_FBXExporter_window_exportQueueProgressBar", edit=True,
+                     maxValue=max(1, progress["totalFrames"]), progress=progress["doneFrames"])
+    cmds.text("sip_FBXExporter_window_exportQueueText", edit=True, label=label)
+    cmds.button("sip_FBXExporter_window_exportQueueCancelButton", edit=True, enable=progress["running"])
 
 ######################################
 #
@@ -992,6 +3537,29 @@ def SIP_FBXExporterUI_RenameExportNode(exportNode):
 
     cmds.deleteUI("sip_FBXExporter_renameExportNode_window")
 
+# PURPOSE:          Turn parallel Export All Animations on or off from the Edit menu.
+# PROCEDURE:        Query the menu item's check box and set SIP_ParallelExport.
+# PRESUMPTION:      Exporter window exists.
+def SIP_FBXExporterUI_SetParallelExport():
+    global SIP_ParallelExport
+    SIP_ParallelExport = cmds.menuItem("sip_FBXExporter_window_parallelExportMenuItem", query=True, checkBox=True)
+
+# PURPOSE:          Turn incremental animation export on or off from the Edit menu.
+# PROCEDURE:        Query the menu item's check box and set SIP_IncrementalExport.
+# PRESUMPTION:      Exporter window exists.
+def SIP_FBXExporterUI_SetIncrementalExport():
+    global SIP_IncrementalExport
+    SIP_IncrementalExport = cmds.menuItem("sip_FBXExporter_window_incrementalExportMenuItem", query=True,
+                                          checkBox=True)
+
+# PURPOSE:          Turn isolated character evaluation on or off from the Edit menu.
+# PROCEDURE:        Query the menu item's check box and set SIP_IsolateCharacterEvaluation.
+# PRESUMPTION:      Exporter window exists.
+def SIP_FBXExporterUI_SetIsolateCharacterEvaluation():
+    global SIP_IsolateCharacterEvaluation
+    SIP_IsolateCharacterEvaluation = cmds.menuItem("sip_FBXExporter_window_isolateEvaluationMenuItem", query=True,
+                                                   checkBox=True)
+
 ######################################
 #
 # Help Windows
@@ -1064,6 +3632,18 @@ def SIP_FBXExporter_UI():
     cmds.menu("sip_FBXExporter_window_editMenu", label="Edit")
     cmds.menuItem(label="Save Settings", parent="sip_FBXExporter_window_editMenu")
     cmds.menuItem(label="Reset Settings", parent="sip_FBXExporter_window_editMenu")
+    cmds.menuItem("sip_FBXExporter_window_incrementalExportMenuItem", label="Incremental Animation Export",
+                  checkBox=SIP_IncrementalExport,
+                  command="import FBXAnimationExporter as FBX\nFBX.SIP_FBXExporterUI_SetIncrementalExport()",
+                  parent="sip_FBXExporter_window_editMenu")
+    cmds.menuItem("sip_FBXExporter_window_parallelExportMenuItem", label="Parallel Export All Animations",
+                  checkBox=SIP_ParallelExport,
+                  command="import FBXAnimationExporter as FBX\nFBX.SIP_FBXExporterUI_SetParallelExport()",
+                  parent="sip_FBXExporter_window_editMenu")
+    cmds.menuItem("sip_FBXExporter_window_isolateEvaluationMenuItem", label="Isolate Character Evaluation",
+                  checkBox=SIP_IsolateCharacterEvaluation,
+                  command="import FBXAnimationExporter as FBX\nFBX.SIP_FBXExporterUI_SetIsolateCharacterEvaluation()",
+                  parent="sip_FBXExporter_window_editMenu")
 
     cmds.menu("sip_FBXExporter_window_helpMenu", label="Edit")
     cmds.menuItem(label="Help on Animation Export",
@@ -1162,12 +3742,19 @@ def SIP_FBXExporter_UI():
                 parent="sip_FBXExporter_window_animationFormLayout")
     cmds.button("sip_FBXExporter_window_animationExportAllAnimationsForSelectedCharacterButton", width=300, height=50,
                 c="import FBXAnimationExporter as FBX\n"
-                  "FBX.SIP_FBXExporterUI_ExportAllAnimationFromSelectedCharacter()",
+                  "FBX.SIP_FBXExporterUI_ExportAllAnimationForSelectedCharacter()",
                 label="Export All Animation for Selected Charater", parent="sip_FBXExporter_window_animationFormLayout")
     cmds.button("sip_FBXExporter_window_animationExportAllAnimationsButton", width=300, height=50,
                 label="Export All Animations",
                 c="import FBXAnimationExporter as FBX\nFBX.SIP_FBXExporterUI_ExportAllAnimation()",
                 parent="sip_FBXExporter_window_animationFormLayout")
+    cmds.progressBar("sip_FBXExporter_window_exportQueueProgressBar", width=300, height=20, minValue=0, maxValue=1,
+                     progress=0, parent="sip_FBXExporter_window_animationFormLayout")
+    cmds.text("sip_FBXExporter_window_exportQueueText", label="", align="left", width=400,
+              parent="sip_FBXExporter_window_animationFormLayout")
+    cmds.button("sip_FBXExporter_window_exportQueueCancelButton", width=100, height=20, label="Cancel", enable=False,
+                c="import FBXAnimationExporter as FBX\nFBX.SIP_CancelExportQueue()",
+                parent="sip_FBXExporter_window_animationFormLayout")
 
     cmds.popupMenu("sip_FBXExporter_window_animationExportNodesPopupMenu", button=3,
                    parent="sip_FBXExporter_window_animationExportNodesTextScrollList")
@@ -1352,6 +3939,20 @@ def SIP_FBXExporter_UI():
                       "sip_FBXExporter_window_animationExportNodesTextScrollList"),
                      ("sip_FBXExporter_window_animationExportAllAnimationsButton", 'left', 100,
                       "sip_FBXExporter_window_animationExportNodesTextScrollList")])
+    cmds.formLayout("sip_FBXExporter_window_animationFormLayout", edit=True,
+                    attachControl=
+                    [("sip_FBXExporter_window_exportQueueProgressBar", 'top', 10,
+                      "sip_FBXExporter_window_animationExportAllAnimationsButton"),
+                     ("sip_FBXExporter_window_exportQueueProgressBar", 'left', 100,
+                      "sip_FBXExporter_window_animationExportNodesTextScrollList"),
+                     ("sip_FBXExporter_window_exportQueueCancelButton", 'top', 10,
+                      "sip_FBXExporter_window_animationExportAllAnimationsButton"),
+                     ("sip_FBXExporter_window_exportQueueCancelButton", 'left', 5,
+                      "sip_FBXExporter_window_exportQueueProgressBar"),
+                     ("sip_FBXExporter_window_exportQueueText", 'top', 5,
+                      "sip_FBXExporter_window_exportQueueProgressBar"),
+                     ("sip_FBXExporter_window_exportQueueText", 'left', 20,
+                      "sip_FBXExporter_window_animationExportNodesTextScrollList")])
 
     # Set up model form layout.
     cmds.formLayout("sip_FBXExporter_window_modelFormLayout", edit=True,
@@ -1423,6 +4024,7 @@ def SIP_FBXExporter_UI():
     # Populate ui
     SIP_FBXExporterUI_PopulateModelRootJointsPanel()
     SIP_FBXExporterUI_PopulateAnimationActorPanel()
+    SIP_FBXExporterUI_UpdateExportQueueProgress()
 
     # scriptJob to refresh ui
     cmds.scriptJob(parent="sip_FBXExporter_window",
@@ -0,0 +1,1030 @@
+import maya.cmds as cmds
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+# FBXAnimationExporter sources its MEL options when imported, so it is only imported once Maya is running.
+
+
+# Number of mayapy workers used for parallel export. 0 uses one per CPU core.
+SIP_ParallelExportWorkers = 0
+
+# Path to mayapy. Empty string looks for it next to the running Maya executable.
+SIP_MayapyPath = ""
+
+# Seconds the export server waits before restarting a session that exited, doubled on every restart in a row up to
+# SIP_SessionRestartMaxSeconds.
+SIP_SessionRestartSeconds = 1.0
+SIP_SessionRestartMaxSeconds = 60.0
+
+# Restarts in a row after which the export server stops with an error. A session that ran for
+# SIP_SessionStableSeconds before exiting starts a new count.
+SIP_SessionMaxRestarts = 5
+SIP_SessionStableSeconds = 300.0
+
+# Seconds a request that waits for its job gets an answer within. Past it the answer is the job's state with an error,
+# and the job stays queued.
+SIP_ServerWaitSeconds = 3600.0
+
+
+
+#######################################
+#
+#    Worker procs
+#
+#######################################
+
+
+
+# PURPOSE:          Start Maya in a headless worker process and load the exporter.
+# PROCEDURE:        Initialize maya.standalone, load the FBX plugin, then import the exporter module and return it.
+# PRESUMPTION:      Running in mayapy. The exporter module and its MEL options file are on the worker's paths.
+def SIP_InitializeWorker():
+    import maya.standalone
+    maya.standalone.initialize(name="python")
+
+    cmds.loadPlugin("fbxmaya", quiet=True)
+
+    import FBXAnimationExporter as FBX
+    return FBX
+
+
+# PURPOSE:          Open a scene for exporting the given characters.
+# PROCEDURE:        With loadAllReferences, open the scene with every reference loaded, so props, vehicles and
+#                   constraint targets in other references still drive the characters. Otherwise open it with no
+#                   references loaded and load every reference whose namespace is one of the characters.
+# PRESUMPTION:      Single-layered referencing. References have namespace. Pass loadAllReferences=False only for
+#                   characters that nothing in another reference drives, their export differs from a serial one
+#                   otherwise.
+def SIP_OpenSceneForCharacters(scene, characters, loadAllReferences=True):
+    if loadAllReferences:
+        cmds.file(scene, open=True, force=True, loadReferenceDepth="all")
+        return
+
+    cmds.file(scene, open=True, force=True, loadReferenceDepth="none")
+
+    for curRef in cmds.ls(type="reference"):
+        try:
+            ns = cmds.referenceQuery(curRef, namespace=True).lstrip(":")
+        except RuntimeError:
+            # sharedReferenceNode and unknown reference nodes have no file.
+            continue
+
+        if ns in characters:
+            cmds.file(loadReference=curRef, loadReferenceDepth="all")
+
+
+# PURPOSE:          Run one worker job: open the scene and export the given characters / export nodes.
+# PROCEDURE:        Set the workspace, open the scene with the needed references, then call SIP_ExportFBXAnimation for
+#                   each [character, exportNode] pair. Errors are caught per pair so one bad character does not stop
+#                   the others. The manifest is only read here; the parent merges the new entries.
+# PRESUMPTION:      job comes from SIP_LaunchExportWorkers.
+def SIP_RunExportJob(FBX, job):
+    with FBX.SIP_TimingSpan("workerJob", scene=job["scene"], exports=len(job["exports"])):
+        cmds.workspace(job["workspace"], openWorkspace=True)
+
+        with FBX.SIP_TimingSpan("openScene", scene=job["scene"]):
+            SIP_OpenSceneForCharacters(job["scene"], [cur[0] for cur in job["exports"]], job["loadAllReferences"])
+
+        manifest = None
+
+        if job["incremental"]:
+            manifest = FBX.SIP_LoadExportManifest()
+
+        results = []
+
+        for curCharacter, curExportNode in job["exports"]:
+            startTime = time.time()
+            result = {"character": curCharacter, "exportNode": curExportNode, "report": [], "error": ""}
+
+            try:
+                result["report"] = FBX.SIP_ExportFBXAnimation(curCharacter, curExportNode,
+                                                              incremental=job["incremental"], manifest=manifest)
+            except Exception:
+                result["error"] = traceback.format_exc()
+                print(result["error"])
+
+            result["seconds"] = time.time() - startTime
+            results.append(result)
+
+        return results
+
+
+# PURPOSE:          Entry point of a worker process.
+# PROCEDURE:        Read the job file, start Maya, run the job and write the results file.
+# PRESUMPTION:      Called from mayapy with paths written by SIP_LaunchExportWorkers.
+def SIP_WorkerMain(jobPath, resultPath):
+    with open(jobPath, "r") as jobFile:
+        job = json.load(jobFile)
+
+    output = {"results": [], "error": ""}
+
+    try:
+        FBX = SIP_InitializeWorker()
+        output["results"] = SIP_RunExportJob(FBX, job)
+    except Exception:
+        output["error"] = traceback.format_exc()
+        print(output["error"])
+
+    with open(resultPath, "w") as resultFile:
+        json.dump(output, resultFile, indent=2)
+
+
+
+# PURPOSE:          Find the Maya project a scene belongs to.
+# PROCEDURE:        Walk up from the scene's folder until a folder with workspace.mel is found.
+# PRESUMPTION:      Returns an empty string if the scene is not inside a project.
+def SIP_FindProjectForScene(scene):
+    curDir = os.path.dirname(os.path.abspath(scene))
+
+    while True:
+        if os.path.isfile(os.path.join(curDir, "workspace.mel")):
+            return curDir
+
+        parentDir = os.path.dirname(curDir)
+
+        if parentDir == curDir:
+            return ""
+
+        curDir = parentDir
+
+
+# PURPOSE:          Open one scene and run the exporter's character and/or animation export on it.
+# PROCEDURE:        Set the project (given, or found from the scene path), open the scene and export. "auto" mode
+#                   exports animation if the scene has references and the character otherwise.
+#                   Return the reports, output files, timings and any error.
+# PRESUMPTION:      mode is "auto", "animation", "character" or "all".
+def SIP_ExportScene(FBX, scene, project, mode, incremental):
+    result = {"scene": scene, "report": [], "outputs": [], "error": "", "openSeconds": 0.0, "exportSeconds": 0.0}
+    startTime = time.time()
+
+    with FBX.SIP_TimingSpan("batchScene", scene=scene, mode=mode):
+        try:
+            project = project or SIP_FindProjectForScene(scene)
+
+            if project:
+                cmds.workspace(project, openWorkspace=True)
+
+            with FBX.SIP_TimingSpan("openScene", scene=scene):
+                cmds.file(scene, open=True, force=True)
+
+            result["openSeconds"] = time.time() - startTime
+            startTime = time.time()
+
+            if mode == "auto":
+                mode = "animation" if cmds.file(reference=True, query=True) else "character"
+
+            if mode in ["character", "all"]:
+                result["report"].extend(FBX.SIP_ExportFBXCharacter(""))
+
+            if mode in ["animation", "all"]:
+                result["report"].extend(FBX.SIP_ExportFBXAnimation("", "", incremental=incremental))
+        except Exception:
+            result["error"] = traceback.format_exc()
+            print(result["error"])
+
+    result["exportSeconds"] = time.time() - startTime
+    result["outputs"] = [cur["file"] for cur in result["report"] if cur["action"] == "exported"]
+    return result
+
+
+# PURPOSE:          Return the file name used for a scene's marker and result files.
+# PROCEDURE:        Hash the scene path.
+# PRESUMPTION:      None.
+def SIP_ReturnSceneKey(scene):
+    return hashlib.sha1(os.path.abspath(scene).encode("utf-8")).hexdigest()[:16]
+
+
+# PURPOSE:          Write json so readers never see a half written file.
+# PROCEDURE:        Write to a temp file next to the target, then rename it over the target.
+# PRESUMPTION:      None.
+def SIP_WriteJsonAtomic(path, data):
+    tempPath = path + ".tmp"
+
+    with open(tempPath, "w") as tempFile:
+        json.dump(data, tempFile, indent=2)
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    os.rename(tempPath, path)
+
+
+# PURPOSE:          Entry point of a batch worker: export several scenes in one Maya session.
+# PROCEDURE:        Start Maya once. For each scene in the job, write a ".started" marker, export the scene and
+#                   write its result file. The parent uses the markers to find the scene a crashed worker was on.
+# PRESUMPTION:      Called from mayapy with a job written by SIP_RunBatchExport.
+def SIP_SceneWorkerMain(jobPath, resultDir):
+    with open(jobPath, "r") as jobFile:
+        job = json.load(jobFile)
+
+    FBX = SIP_InitializeWorker()
+
+    for curScene in job["scenes"]:
+        key = SIP_ReturnSceneKey(curScene)
+        open(os.path.join(resultDir, key + ".started"), "w").close()
+
+        result = SIP_ExportScene(FBX, curScene, job["project"], job["mode"], job["incremental"])
+        SIP_WriteJsonAtomic(os.path.join(resultDir, key + ".json"), result)
+
+        cmds.file(new=True, force=True)
+
+
+
+#######################################
+#
+#    Parallel export procs
+#
+#######################################
+
+
+
+# PURPOSE:          Return the path to mayapy.
+# PROCEDURE:        Use SIP_MayapyPath if set. Otherwise look next to the running executable, then in the bin folder
+#                   next to it (macOS app bundles).
+# PRESUMPTION:      Running inside Maya or mayapy.
+def SIP_ReturnMayapyPath():
+    if SIP_MayapyPath:
+        return SIP_MayapyPath
+
+    mayapyName = "mayapy.exe" if os.name == "nt" else "mayapy"
+    exeDir = os.path.dirname(sys.executable)
+
+    for curDir in [exeDir, os.path.join(exeDir, "..", "bin")]:
+        mayapy = os.path.normpath(os.path.join(curDir, mayapyName))
+
+        if os.path.isfile(mayapy):
+            return mayapy
+
+    return mayapyName
+
+
+# PURPOSE:          Return the environment for worker processes.
+# PROCEDURE:        Copy this process's environment and put the exporter's folder first on PYTHONPATH and
+#                   MAYA_SCRIPT_PATH, so workers find the module and its MEL options file.
+# PRESUMPTION:      The exporter module and the MEL options file live in the same folder as this module.
+def SIP_ReturnWorkerEnvironment():
+    env = dict(os.environ)
+    moduleDir = os.path.dirname(os.path.abspath(__file__))
+
+    for curVar in ["PYTHONPATH", "MAYA_SCRIPT_PATH"]:
+        env[curVar] = moduleDir + os.pathsep + env.get(curVar, "") if env.get(curVar) else moduleDir
+
+    return env
+
+
+# PURPOSE:          Return how many workers to start.
+# PROCEDURE:        Use the given count, else SIP_ParallelExportWorkers, else the CPU count. Never more than jobCount.
+# PRESUMPTION:      None.
+def SIP_ReturnWorkerCount(workers, jobCount):
+    if not workers:
+        workers = SIP_ParallelExportWorkers or multiprocessing.cpu_count()
+
+    return max(1, min(workers, jobCount))
+
+
+# PURPOSE:          Return the job a worker runs for some exports.
+# PROCEDURE:        Return the dict SIP_RunExportJob reads, written to the worker's job file.
+# PRESUMPTION:      scene is saved. exports is a list of [character, exportNode].
+def SIP_ReturnExportJob(scene, workspace, exports, incremental, loadAllReferences=True):
+    return {"scene": scene, "workspace": workspace, "exports": exports, "incremental": incremental,
+            "loadAllReferences": loadAllReferences}
+
+
+# PURPOSE:          Start mayapy workers for a list of exports and wait for them.
+# PROCEDURE:        Deal the [character, exportNode] pairs out to the workers round robin. Write a job file per worker
+#                   to a temp folder, start the workers and wait for all of them. Collect each worker's results,
+#                   return code and log.
+# PRESUMPTION:      scene is saved.
+def SIP_LaunchExportWorkers(scene, workspace, exports, workers, incremental, loadAllReferences=True):
+    tempDir = tempfile.mkdtemp(prefix="sipFBXExport")
+    workerScript = os.path.splitext(os.path.abspath(__file__))[0] + ".py"
+    env = SIP_ReturnWorkerEnvironment()
+    processes = []
+
+    for index in range(workers):
+        share = exports[index::workers]
+
+        if not share:
+            continue
+
+        jobPath = os.path.join(tempDir, "job" + str(index) + ".json")
+        resultPath = os.path.join(tempDir, "result" + str(index) + ".json")
+        logPath = os.path.join(tempDir, "log" + str(index) + ".txt")
+
+        with open(jobPath, "w") as jobFile:
+            json.dump(SIP_ReturnExportJob(scene, workspace, share, incremental, loadAllReferences), jobFile,
+                      indent=2)
+
+        logFile = open(logPath, "w")
+        process = subprocess.Popen([SIP_ReturnMayapyPath(), workerScript, "worker", jobPath, resultPath], env=env,
+                                   stdout=logFile, stderr=subprocess.STDOUT)
+        processes.append((index, process, logFile, resultPath, logPath, share))
+
+    workerResults = []
+
+    for index, process, logFile, resultPath, logPath, share in processes:
+        returnCode = process.wait()
+        logFile.close()
+
+        output = {"results": [], "error": ""}
+
+        try:
+            with open(resultPath, "r") as resultFile:
+                output = json.load(resultFile)
+        except (IOError, OSError, ValueError):
+            output["error"] = "Worker " + str(index) + " exited with code " + str(returnCode) + " without results."
+
+        with open(logPath, "r") as logFile:
+            log = logFile.read()
+
+        workerResults.append({"worker": index, "exports": share, "returnCode": returnCode, "log": log,
+                              "results": output["results"], "error": output["error"]})
+
+    shutil.rmtree(tempDir, ignore_errors=True)
+    return workerResults
+
+
+# PURPOSE:          Add the manifest entries reported by workers to the export manifest.
+# PROCEDURE:        Load the manifest, copy the manifest entry of every exported file from the worker reports, save.
+# PRESUMPTION:      Workers ran with incremental export on.
+def SIP_MergeWorkerManifestEntries(FBX, workerResults):
+    manifest = FBX.SIP_LoadExportManifest()
+
+    for curWorker in workerResults:
+        for curResult in curWorker["results"]:
+            for curEntry in curResult["report"]:
+                if "manifestEntry" in curEntry:
+                    manifest["exports"][curEntry["file"]] = curEntry["manifestEntry"]
+
+    FBX.SIP_SaveExportManifest(manifest)
+
+
+# PURPOSE:          Export the animation of several characters from the open scene in parallel mayapy workers.
+# PROCEDURE:        Each worker opens the saved scene, with every reference loaded unless loadAllReferences is false,
+#                   and runs SIP_ExportFBXAnimation for its share of the characters. Report worker and character
+#                   failures as warnings, merge the incremental manifest and return the per worker results.
+# PRESUMPTION:      Scene is saved; workers export the file on disk, not unsaved changes.
+#                   Empty characterNames exports every referenced character.
+def SIP_ExportFBXAnimationParallel(characterNames=None, workers=None, incremental=None, loadAllReferences=True):
+    import FBXAnimationExporter as FBX
+
+    scene = cmds.file(query=True, sceneName=True)
+
+    if not scene:
+        cmds.warning("Save the scene before exporting in parallel.\n")
+        return []
+
+    if cmds.file(query=True, modified=True):
+        cmds.warning("Scene has unsaved changes. Parallel export uses the saved file.\n")
+
+    if incremental is None:
+        incremental = FBX.SIP_IncrementalExport
+
+    if not characterNames:
+        characterNames = [cmds.file(cur, namespace=True, query=True) for cur in cmds.file(reference=True, query=True)]
+
+    exports = [[cur, ""] for cur in characterNames]
+
+    if not exports:
+        return []
+
+    workerResults = SIP_LaunchExportWorkers(scene, cmds.workspace(q=True, rd=True), exports,
+                                            SIP_ReturnWorkerCount(workers, len(exports)), incremental,
+                                            loadAllReferences)
+
+    for curWorker in workerResults:
+        if curWorker["error"]:
+            cmds.warning("Parallel export worker " + str(curWorker["worker"]) + " failed:\n" + curWorker["error"])
+
+        for curResult in curWorker["results"]:
+            if curResult["error"]:
+                cmds.warning("Export of " + curResult["character"] + " failed:\n" + curResult["error"])
+
+            if FBX.SIP_PrintExportReports:
+                FBX.SIP_PrintExportReport(curResult["report"])
+
+    if incremental:
+        SIP_MergeWorkerManifestEntries(FBX, workerResults)
+
+    return workerResults
+
+
+
+#######################################
+#
+#    Batch export procs
+#
+#######################################
+
+
+
+# PURPOSE:          Expand scene arguments into a list of scene files.
+# PROCEDURE:        Expand globs (also on shells that do not), read one scene per line from any list file, drop
+#                   duplicates and keep the order.
+# PRESUMPTION:      None.
+def SIP_ReturnBatchScenes(sceneArgs, sceneLists):
+    scenes = []
+
+    for curList in sceneLists or []:
+        with open(curList, "r") as listFile:
+            sceneArgs = sceneArgs + [cur.strip() for cur in listFile if cur.strip()]
+
+    for curArg in sceneArgs:
+        for curScene in sorted(glob.glob(curArg)) or [curArg]:
+            curScene = os.path.abspath(curScene)
+
+            if curScene not in scenes:
+                scenes.append(curScene)
+
+    return scenes
+
+
+# PURPOSE:          Load or start the batch manifest that shards scenes between workers.
+# PROCEDURE:        Read the manifest from the work folder. Scenes already done are kept unless force is set, any
+#                   other scene is reset to pending with no attempts.
+# PRESUMPTION:      None.
+def SIP_LoadBatchManifest(manifestPath, scenes, force):
+    manifest = {"scenes": {}}
+
+    try:
+        with open(manifestPath, "r") as manifestFile:
+            manifest = json.load(manifestFile)
+    except (IOError, OSError, ValueError):
+        pass
+
+    for curScene in scenes:
+        entry = manifest["scenes"].get(curScene)
+
+        if force or not entry or entry["status"] != "done":
+            manifest["scenes"][curScene] = {"status": "pending", "attempts": 0, "result": None}
+
+    return manifest
+
+
+# PURPOSE:          Record a failed attempt at scenes in the batch manifest.
+# PROCEDURE:        Count an attempt and store error as the result of each scene. Scenes with attempts left go back
+#                   to pending, the others are failed. Returns the scenes to retry.
+# PRESUMPTION:      None.
+def SIP_FailBatchScenes(manifest, scenes, error, retries):
+    retry = []
+
+    for curScene in scenes:
+        entry = manifest["scenes"][curScene]
+        entry["attempts"] += 1
+        entry["result"] = {"scene": curScene, "report": [], "outputs": [], "openSeconds": 0.0, "exportSeconds": 0.0,
+                           "error": error}
+
+        if entry["attempts"] <= retries:
+            entry["status"] = "pending"
+            retry.append(curScene)
+        else:
+            entry["status"] = "failed"
+
+    return retry
+
+
+# PURPOSE:          Export many scenes with a pool of mayapy workers that each reuse their session for several scenes.
+# PROCEDURE:        Keep up to workers processes running, each given the next scenesPerWorker pending scenes. When a
+#                   worker exits, record the result of every scene it finished in the manifest. The scene it was on
+#                   when it crashed counts an attempt and is retried up to retries times; scenes it never started
+#                   go back to pending. A worker that exits before starting any scene (bad mayapy, no license, import
+#                   error) or cannot be launched counts an attempt against all its scenes, so a broken setup fails
+#                   the batch instead of respawning workers forever. The manifest is saved after every change, so a
+#                   rerun with the same workDir only exports what is not done.
+#                   Return the summary, which is also written to summaryPath.
+# PRESUMPTION:      Running in mayapy or Maya.
+def SIP_RunBatchExport(scenes, workDir, summaryPath="", workers=None, scenesPerWorker=4, project="", mode="auto",
+                       incremental=False, retries=1, force=False):
+    resultDir = os.path.join(workDir, "results")
+
+    if not os.path.isdir(resultDir):
+        os.makedirs(resultDir)
+
+    manifestPath = os.path.join(workDir, "batchManifest.json")
+    manifest = SIP_LoadBatchManifest(manifestPath, scenes, force)
+    SIP_WriteJsonAtomic(manifestPath, manifest)
+
+    workerScript = os.path.splitext(os.path.abspath(__file__))[0] + ".py"
+    env = SIP_ReturnWorkerEnvironment()
+    pending = [cur for cur in scenes if manifest["scenes"][cur]["status"] == "pending"]
+    workers = SIP_ReturnWorkerCount(workers, len(pending))
+    running = []
+    jobIndex = 0
+    batchStart = time.time()
+
+    while pending or running:
+        while pending and len(running) < workers:
+            share = pending[:scenesPerWorker]
+            pending = pending[scenesPerWorker:]
+
+            for curScene in share:
+                key = SIP_ReturnSceneKey(curScene)
+
+                for curExt in [".started", ".json"]:
+                    if os.path.exists(os.path.join(resultDir, key + curExt)):
+                        os.remove(os.path.join(resultDir, key + curExt))
+
+                manifest["scenes"][curScene]["status"] = "running"
+
+            jobPath = os.path.join(workDir, "job" + str(jobIndex) + ".json")
+            logPath = os.path.join(workDir, "job" + str(jobIndex) + ".log")
+            SIP_WriteJsonAtomic(jobPath, {"scenes": share, "project": project, "mode": mode,
+                                          "incremental": incremental})
+
+            logFile = open(logPath, "w")
+            jobIndex += 1
+
+            try:
+                process = subprocess.Popen([SIP_ReturnMayapyPath(), workerScript, "scene-worker", jobPath, resultDir],
+                                           env=env, stdout=logFile, stderr=subprocess.STDOUT)
+            except OSError as error:
+                logFile.close()
+                pending += SIP_FailBatchScenes(manifest, share, "Could not start worker: " + str(error), retries)
+            else:
+                running.append((process, logFile, logPath, share))
+
+            SIP_WriteJsonAtomic(manifestPath, manifest)
+
+        time.sleep(0.5)
+
+        for curJob in list(running):
+            process, logFile, logPath, share = curJob
+
+            if process.poll() is None:
+                continue
+
+            running.remove(curJob)
+            logFile.close()
+
+            started = [cur for cur in share for curExt in [".started", ".json"]
+                       if os.path.exists(os.path.join(resultDir, SIP_ReturnSceneKey(cur) + curExt))]
+
+            if not started:
+                pending += SIP_FailBatchScenes(manifest, share, "Worker exited with code " + str(process.returncode) +
+                                               " before exporting any scene. See " + logPath, retries)
+                SIP_WriteJsonAtomic(manifestPath, manifest)
+                continue
+
+            for curScene in share:
+                key = SIP_ReturnSceneKey(curScene)
+                entry = manifest["scenes"][curScene]
+
+                if os.path.exists(os.path.join(resultDir, key + ".json")):
+                    with open(os.path.join(resultDir, key + ".json"), "r") as resultFile:
+                        entry["result"] = json.load(resultFile)
+
+                    entry["attempts"] += 1
+                    entry["status"] = "failed" if entry["result"]["error"] else "done"
+                elif os.path.exists(os.path.join(resultDir, key + ".started")):
+                    # The worker crashed on this scene.
+                    pending += SIP_FailBatchScenes(manifest, [curScene], "Worker exited with code " +
+                                                   str(process.returncode) + " while exporting this scene. See " +
+                                                   logPath, retries)
+                else:
+                    # The worker crashed before getting to this scene.
+                    entry["status"] = "pending"
+                    pending.append(curScene)
+
+            SIP_WriteJsonAtomic(manifestPath, manifest)
+
+    summary = {"seconds": time.time() - batchStart, "scenes": []}
+
+    for curScene in scenes:
+        entry = manifest["scenes"][curScene]
+        result = entry["result"] or {}
+        summary["scenes"].append({"scene": curScene, "status": entry["status"], "attempts": entry["attempts"],
+                                  "openSeconds": result.get("openSeconds", 0.0),
+                                  "exportSeconds": result.get("exportSeconds", 0.0),
+                                  "outputs": result.get("outputs", []), "report": result.get("report", []),
+                                  "error": result.get("error", "")})
+
+    summary["done"] = len([cur for cur in summary["scenes"] if cur["status"] == "done"])
+    summary["failed"] = len([cur for cur in summary["scenes"] if cur["status"] == "failed"])
+
+    SIP_WriteJsonAtomic(summaryPath or os.path.join(workDir, "summary.json"), summary)
+    return summary
+
+
+
+#######################################
+#
+#    Export server procs
+#
+#######################################
+
+
+
+_SIP_SpoolFolders = ["queue", "running", "done", "logs"]
+
+
+# PURPOSE:          Make sure the spool folders exist and return their paths.
+# PROCEDURE:        Create queue, running, done and logs under the spool folder if needed.
+# PRESUMPTION:      None.
+def SIP_ReturnSpoolFolders(spoolDir):
+    folders = {}
+
+    for curFolder in _SIP_SpoolFolders:
+        folders[curFolder] = os.path.join(spoolDir, curFolder)
+
+        if not os.path.isdir(folders[curFolder]):
+            os.makedirs(folders[curFolder])
+
+    return folders
+
+
+# PURPOSE:          Queue an export request for the export server.
+# PROCEDURE:        Give the job a time ordered id and write it to the queue folder.
+# PRESUMPTION:      job has "scene" and optionally "type" ("animation" or "character"), "character", "exportNode",
+#                   "project", "incremental" and "loadAllReferences".
+def SIP_SubmitSpoolJob(spoolDir, job):
+    folders = SIP_ReturnSpoolFolders(spoolDir)
+    jobId = "%014d_%s" % (int(time.time() * 1000), uuid.uuid4().hex[:8])
+
+    job = dict(job)
+    job["id"] = jobId
+    SIP_WriteJsonAtomic(os.path.join(folders["queue"], jobId + ".json"), job)
+
+    return jobId
+
+
+# PURPOSE:          Return the state of a queued export request.
+# PROCEDURE:        Look for the job in the done, running and queue folders.
+# PRESUMPTION:      None.
+def SIP_ReturnSpoolJobStatus(spoolDir, jobId):
+    folders = SIP_ReturnSpoolFolders(spoolDir)
+    donePath = os.path.join(folders["done"], jobId + ".json")
+
+    if os.path.exists(donePath):
+        with open(donePath, "r") as doneFile:
+            return {"id": jobId, "state": "done", "result": json.load(doneFile)}
+
+    if glob.glob(os.path.join(folders["running"], jobId + ".*.json")):
+        return {"id": jobId, "state": "running"}
+
+    if os.path.exists(os.path.join(folders["queue"], jobId + ".json")):
+        return {"id": jobId, "state": "queued"}
+
+    return {"id": jobId, "state": "unknown"}
+
+
+# PURPOSE:          Take the oldest queued job for a session.
+# PROCEDURE:        Move the job file into the running folder tagged with the session name. The rename is atomic, so
+#                   if another session took the job first, try the next one.
+# PRESUMPTION:      Queue and running folders are on the same drive.
+def SIP_ClaimSpoolJob(folders, sessionName):
+    for curJob in sorted(os.listdir(folders["queue"])):
+        if not curJob.endswith(".json"):
+            continue
+
+        jobId = curJob[:-len(".json")]
+        runningPath = os.path.join(folders["running"], jobId + "." + sessionName + ".json")
+
+        try:
+            os.rename(os.path.join(folders["queue"], curJob), runningPath)
+        except OSError:
+            continue
+
+        with open(runningPath, "r") as jobFile:
+            return json.load(jobFile), runningPath
+
+    return None, ""
+
+
+# PURPOSE:          Run one export server job in the warm session.
+# PROCEDURE:        Set the project and open the scene. Animation jobs for one character with "loadAllReferences" set to
+#                   false only load that character's reference. Run SIP_ExportFBXAnimation or SIP_ExportFBXCharacter
+#                   and return their report with timings and any error.
+# PRESUMPTION:      job comes from SIP_SubmitSpoolJob.
+def SIP_RunServerJob(FBX, job):
+    result = {"id": job["id"], "report": [], "outputs": [], "error": "", "openSeconds": 0.0, "exportSeconds": 0.0}
+    startTime = time.time()
+
+    with FBX.SIP_TimingSpan("serverJob", scene=job["scene"], job=job["id"]):
+        try:
+            project = job.get("project") or SIP_FindProjectForScene(job["scene"])
+
+            if project:
+                cmds.workspace(project, openWorkspace=True)
+
+            with FBX.SIP_TimingSpan("openScene", scene=job["scene"]):
+                if job.get("type", "animation") == "animation" and job.get("character"):
+                    SIP_OpenSceneForCharacters(job["scene"], [job["character"]], job.get("loadAllReferences", True))
+                else:
+                    cmds.file(job["scene"], open=True, force=True)
+
+            result["openSeconds"] = time.time() - startTime
+            startTime = time.time()
+
+            if job.get("type", "animation") == "animation":
+                result["report"] = FBX.SIP_ExportFBXAnimation(job.get("character", ""), job.get("exportNode", ""),
+                                                              incremental=job.get("incremental", False))
+            else:
+                result["report"] = FBX.SIP_ExportFBXCharacter(job.get("exportNode", ""))
+        except Exception:
+            result["error"] = traceback.format_exc()
+            print(result["error"])
+
+    result["exportSeconds"] = time.time() - startTime
+    result["outputs"] = [cur["file"] for cur in result["report"] if cur["action"] == "exported"]
+    return result
+
+
+# PURPOSE:          Entry point of a warm export session.
+# PROCEDURE:        Start Maya, load the FBX plugin and source the exporter once. Then keep taking jobs from the spool
+#                   queue, run them, write the result to the done folder and reset to a new scene, until the spool
+#                   has a "stop" file.
+# PRESUMPTION:      Called from mayapy by SIP_ServeExports.
+def SIP_SpoolWorkerMain(spoolDir, sessionName, pollSeconds=0.5):
+    folders = SIP_ReturnSpoolFolders(spoolDir)
+    FBX = SIP_InitializeWorker()
+    print("Export session " + sessionName + " ready.")
+
+    while not os.path.exists(os.path.join(spoolDir, "stop")):
+        job, runningPath = SIP_ClaimSpoolJob(folders, sessionName)
+
+        if not job:
+            time.sleep(pollSeconds)
+            continue
+
+        print("Export session " + sessionName + " running job " + job["id"] + ": " + job["scene"])
+        result = SIP_RunServerJob(FBX, job)
+        SIP_WriteJsonAtomic(os.path.join(folders["done"], job["id"] + ".json"), result)
+        os.remove(runningPath)
+
+        cmds.file(new=True, force=True)
+
+
+# Handles one json request per line for SIP_ServeExports: {"command": "submit", "job": {...}, "wait": false} or
+# {"command": "status", "id": "..."}. A waiting submit can set "timeout" seconds, default SIP_ServerWaitSeconds.
+class SIP_ExportRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for curLine in self.rfile:
+            try:
+                request = json.loads(curLine.decode("utf-8"))
+
+                if request.get("command") == "submit":
+                    jobId = SIP_SubmitSpoolJob(self.server.spoolDir, request["job"])
+                    response = SIP_ReturnSpoolJobStatus(self.server.spoolDir, jobId)
+                    timeout = float(request.get("timeout", SIP_ServerWaitSeconds))
+                    deadline = time.time() + timeout
+
+                    while request.get("wait") and response["state"] != "done":
+                        if time.time() >= deadline:
+                            response["error"] = "Job not done after " + str(timeout) + " seconds."
+                            break
+
+                        time.sleep(0.25)
+                        response = SIP_ReturnSpoolJobStatus(self.server.spoolDir, jobId)
+                elif request.get("command") == "status":
+                    response = SIP_ReturnSpoolJobStatus(self.server.spoolDir, request["id"])
+                else:
+                    response = {"error": "Unknown command."}
+            except Exception:
+                response = {"error": traceback.format_exc()}
+
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+# PURPOSE:          Start a warm session process.
+# PROCEDURE:        Start mayapy with the spool-worker command, logging to the spool's logs folder. Returns the
+#                   process, the log file and the start time.
+# PRESUMPTION:      None.
+def SIP_StartSpoolSession(spoolDir, folders, sessionName):
+    logFile = open(os.path.join(folders["logs"], sessionName + ".log"), "a")
+    workerScript = os.path.splitext(os.path.abspath(__file__))[0] + ".py"
+
+    try:
+        process = subprocess.Popen([SIP_ReturnMayapyPath(), workerScript, "spool-worker", spoolDir, sessionName],
+                                   env=SIP_ReturnWorkerEnvironment(), stdout=logFile, stderr=subprocess.STDOUT)
+    except OSError:
+        logFile.close()
+        raise
+
+    return process, logFile, time.time()
+
+
+# PURPOSE:          Run the export server: keep warm Maya sessions taking export requests from a spool folder.
+# PROCEDURE:        Start sessions mayapy processes running SIP_SpoolWorkerMain. If port is given, also accept
+#                   requests as json lines on localhost and queue them in the spool. Restart any session that dies,
+#                   with a delay that doubles on each restart in a row, and fail the job it was running. A session
+#                   that keeps exiting (bad mayapy, no license, import error) stops the server after
+#                   SIP_SessionMaxRestarts restarts. Ctrl+C (or a "stop" file in the spool) stops the sessions, and
+#                   the request listener is shut down however the server stops. Returns the error that stopped the
+#                   server, empty if it was stopped.
+# PRESUMPTION:      Requests can also be queued by other processes with SIP_SubmitSpoolJob or the submit command.
+def SIP_ServeExports(spoolDir, sessions=1, port=0):
+    spoolDir = os.path.abspath(spoolDir)
+    folders = SIP_ReturnSpoolFolders(spoolDir)
+    stopPath = os.path.join(spoolDir, "stop")
+
+    if os.path.exists(stopPath):
+        os.remove(stopPath)
+
+    server = None
+
+    if port:
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", port), SIP_ExportRequestHandler)
+        server.daemon_threads = True
+        server.spoolDir = spoolDir
+        # A daemon, so an error that skips the shutdown below does not keep the process alive.
+        listener = threading.Thread(target=server.serve_forever)
+        listener.daemon = True
+        listener.start()
+        print("Export server listening on 127.0.0.1:" + str(port))
+
+    sessionNames = ["session" + str(index) for index in range(max(1, sessions))]
+    running = {}
+    restarts = dict.fromkeys(sessionNames, 0)
+    restartTimes = {}
+    error = ""
+
+    try:
+        for curName in sessionNames:
+            running[curName] = SIP_StartSpoolSession(spoolDir, folders, curName)
+
+        while not error and not os.path.exists(stopPath):
+            time.sleep(1.0)
+
+            for curName in sessionNames:
+                process, logFile, startTime = running[curName]
+
+                if not process:
+                    if time.time() >= restartTimes[curName]:
+                        print("Restarting export session " + curName)
+                        running[curName] = SIP_StartSpoolSession(spoolDir, folders, curName)
+
+                    continue
+
+                if process.poll() is None:
+                    continue
+
+                logFile.close()
+                running[curName] = (None, None, startTime)
+
+                for curRunning in glob.glob(os.path.join(folders["running"], "*." + curName + ".json")):
+                    jobId = os.path.basename(curRunning).split(".")[0]
+                    SIP_WriteJsonAtomic(os.path.join(folders["done"], jobId + ".json"),
+                                        {"id": jobId, "report": [], "outputs": [], "openSeconds": 0.0,
+                                         "exportSeconds": 0.0,
+                                         "error": "Export session " + curName + " exited with code " +
+                                                  str(process.returncode) + " while running this job."})
+                    os.remove(curRunning)
+
+                if time.time() - startTime >= SIP_SessionStableSeconds:
+                    restarts[curName] = 0
+
+                restarts[curName] += 1
+
+                if restarts[curName] > SIP_SessionMaxRestarts:
+                    error = ("Export session " + curName + " exited " + str(restarts[curName]) + " times in a row, "
+                             "last with code " + str(process.returncode) + ". See " +
+                             os.path.join(folders["logs"], curName + ".log"))
+                    break
+
+                delay = min(SIP_SessionRestartSeconds * 2 ** (restarts[curName] - 1), SIP_SessionRestartMaxSeconds)
+                restartTimes[curName] = time.time() + delay
+                print("Export session " + curName + " exited with code " + str(process.returncode) +
+                      ", restarting in " + str(delay) + " seconds")
+    except OSError as startError:
+        error = "Could not start export session: " + str(startError)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            open(stopPath, "w").close()
+
+            for process, logFile, startTime in running.values():
+                if process:
+                    process.wait()
+                    logFile.close()
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+
+    return error
+
+
+
+#######################################
+#
+#    Command line
+#
+#######################################
+
+
+
+# PURPOSE:          Command line entry point, run with mayapy.
+# PROCEDURE:        Parse the sub command and its arguments and run it.
+# PRESUMPTION:      None.
+def SIP_BatchMain(argv):
+    parser = argparse.ArgumentParser(description="FBX animation exporter batch tools.")
+    subParsers = parser.add_subparsers(dest="command")
+
+    exportParser = subParsers.add_parser("export", help="Export many scene files with a pool of mayapy workers.")
+    exportParser.add_argument("scenes", nargs="*", help="Scene files or glob patterns.")
+    exportParser.add_argument("--scene-list", action="append", help="Text file with one scene path per line.")
+    exportParser.add_argument("--work-dir", default="fbxBatchExport",
+                              help="Folder for the shard manifest, logs and results. Rerun with the same folder to "
+                                   "resume.")
+    exportParser.add_argument("--summary", default="", help="Summary json path. Default: <work-dir>/summary.json")
+    exportParser.add_argument("--workers", type=int, default=0, help="Worker processes. Default: one per core.")
+    exportParser.add_argument("--scenes-per-worker", type=int, default=4,
+                              help="Scenes a worker exports before it is replaced.")
+    exportParser.add_argument("--project", default="", help="Maya project. Default: found from each scene path.")
+    exportParser.add_argument("--mode", default="auto", choices=["auto", "animation", "character", "all"])
+    exportParser.add_argument("--incremental", action="store_true", help="Skip unchanged animation export nodes.")
+    exportParser.add_argument("--retries", type=int, default=1, help="Retries for a scene that crashes its worker.")
+    exportParser.add_argument("--force", action="store_true", help="Export scenes the manifest has as done.")
+    exportParser.add_argument("--timing-dir", default="", help="Write each scene's timing spans to this folder.")
+
+    serveParser = subParsers.add_parser("serve", help="Keep warm Maya sessions running export requests.")
+    serveParser.add_argument("--spool", default="fbxExportSpool", help="Spool folder the requests are queued in.")
+    serveParser.add_argument("--sessions", type=int, default=1, help="Number of warm Maya sessions.")
+    serveParser.add_argument("--port", type=int, default=0, help="Also accept requests on this localhost port.")
+    serveParser.add_argument("--timing-dir", default="", help="Write each job's timing spans to this folder.")
+
+    submitParser = subParsers.add_parser("submit", help="Queue an export request for a running server.")
+    submitParser.add_argument("scene")
+    submitParser.add_argument("--spool", default="fbxExportSpool")
+    submitParser.add_argument("--type", default="animation", choices=["animation", "character"])
+    submitParser.add_argument("--character", default="", help="Character namespace. Default: all characters.")
+    submitParser.add_argument("--export-node", default="", help="Export node. Default: all export nodes.")
+    submitParser.add_argument("--project", default="", help="Maya project. Default: found from the scene path.")
+    submitParser.add_argument("--incremental", action="store_true")
+    submitParser.add_argument("--wait", action="store_true", help="Wait for the result and print it.")
+
+    spoolWorkerParser = subParsers.add_parser("spool-worker", help="Run a warm session (started by serve).")
+    spoolWorkerParser.add_argument("spoolDir")
+    spoolWorkerParser.add_argument("sessionName")
+
+    workerParser = subParsers.add_parser("worker", help="Run a parallel export job (started by the exporter).")
+    workerParser.add_argument("jobPath")
+    workerParser.add_argument("resultPath")
+
+    sceneWorkerParser = subParsers.add_parser("scene-worker", help="Run a batch export job (started by export).")
+    sceneWorkerParser.add_argument("jobPath")
+    sceneWorkerParser.add_argument("resultDir")
+
+    args = parser.parse_args(argv)
+
+    # Worker processes inherit the environment, see SIP_TimingLogDir.
+    if getattr(args, "timing_dir", ""):
+        os.environ["SIP_FBX_TIMING_DIR"] = os.path.abspath(args.timing_dir)
+
+    if args.command == "export":
+        scenes = SIP_ReturnBatchScenes(args.scenes, args.scene_list)
+        summary = SIP_RunBatchExport(scenes, os.path.abspath(args.work_dir), args.summary, args.workers,
+                                     max(1, args.scenes_per_worker), args.project, args.mode, args.incremental,
+                                     args.retries, args.force)
+        print(json.dumps(summary, indent=2))
+        return 1 if summary["failed"] else 0
+    elif args.command == "serve":
+        error = SIP_ServeExports(args.spool, args.sessions, args.port)
+
+        if error:
+            sys.stderr.write(error + "\n")
+            return 1
+    elif args.command == "submit":
+        jobId = SIP_SubmitSpoolJob(args.spool, {"scene": os.path.abspath(args.scene), "type": args.type,
+                                                "character": args.character, "exportNode": args.export_node,
+                                                "project": args.project, "incremental": args.incremental})
+        status = SIP_ReturnSpoolJobStatus(args.spool, jobId)
+
+        while args.wait and status["state"] != "done":
+            time.sleep(0.5)
+            status = SIP_ReturnSpoolJobStatus(args.spool, jobId)
+
+        print(json.dumps(status, indent=2))
+    elif args.command == "spool-worker":
+        SIP_SpoolWorkerMain(args.spoolDir, args.sessionName)
+    elif args.command == "worker":
+        SIP_WorkerMain(args.jobPath, args.resultPath)
+    elif args.command == "scene-worker":
+        SIP_SceneWorkerMain(args.jobPath, args.resultDir)
+    else:
+        parser.print_help()
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(SIP_BatchMain(sys.argv[1:]))
@@ -0,0 +1,745 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import FBXAnimationExporter_MayaStandIn as standIn
+
+# Benchmarks for FBXAnimationExporter that run without Maya, on parametric scenes built in the in-memory stand-in
+# (FBXAnimationExporter_MayaStandIn). Stand-in seconds only show the exporter's own Python and command overhead, not
+# Maya's evaluation or FBX writing, so the number of cmds/mel calls per benchmark is recorded alongside them. The
+# command counts are the figure to compare against a real Maya profile.
+#
+# Every run also checks the exporter's per-procedure command budgets (SIP_CommandBudgets). The check command does
+# only that, and checks that both root motion paths, and a parallel export worker, export the same animation as the
+# default export, so a regression fails with a non-zero exit code.
+#
+#   python FBXAnimationExporter_Benchmark.py run --characters 4 --joints 60 --export-nodes 4 --frames 240
+#   python FBXAnimationExporter_Benchmark.py compare
+#   python FBXAnimationExporter_Benchmark.py check
+
+
+# Results are appended to this json lines file, one line per benchmark run. It is kept in the user's home folder, out
+# of the repository, so results from every checkout end up in one file.
+SIP_BenchmarkResultsPath = os.path.join(os.path.expanduser("~"), "fbxExportBenchmarks.jsonl")
+
+# Scene the check command runs the benchmarks on: big enough to catch per-joint and per-node queries.
+SIP_BudgetCheckParams = {"characters": 2, "joints": 30, "exportNodes": 3, "frames": 60, "animLayers": 2,
+                         "rigDepth": 2}
+
+SIP_Benchmarks = ["exportAnimation", "exportAnimationIncremental", "exportCharacter", "populateUI", "clearGarbage",
+                  "preBakeBakeResults", "preBakeCurves"]
+
+_SIP_Channels = ["translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ"]
+
+# Set by SIP_ReturnExporter, the exporter can only be imported once the stand-in is installed.
+_SIP_Exporter = []
+
+
+
+#######################################
+#
+#    Scene procs
+#
+#######################################
+
+
+
+# PURPOSE:          Return the exporter module, imported against the stand-in.
+# PROCEDURE:        Install the stand-in and import FBXAnimationExporter the first time, from the folder of this file
+#                   so its MEL options file is found.
+# PRESUMPTION:      Not running inside Maya.
+def SIP_ReturnExporter():
+    if not _SIP_Exporter:
+        standIn.SIP_InstallMayaStandIn()
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+
+        try:
+            import FBXAnimationExporter
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+        _SIP_Exporter.append(FBXAnimationExporter)
+
+    return _SIP_Exporter[0]
+
+
+# PURPOSE:          Key every animated channel of a node.
+# PROCEDURE:        One curve per channel with a key every keyStep frames, driving the channel through rigDepth
+#                   unitConversion nodes to stand in for the rig's evaluation cost.
+# PRESUMPTION:      seed makes every channel's curve different.
+def SIP_KeyBenchmarkNode(node, channels, frames, keyStep, rigDepth, seed):
+    scene = standIn.SIP_ReturnStandInScene()
+
+    for index, curChannel in enumerate(channels):
+        keys = [[float(curFrame), float((curFrame * (seed + index + 1)) % 37) - 18.0]
+                for curFrame in range(1, frames + 1, keyStep)] + [[float(frames), float(seed)]]
+        curve = standIn.SIP_KeyPlug(node, curChannel, keys)
+        source = (curve, "output")
+
+        if rigDepth:
+            scene.Disconnect(source, (node, curChannel))
+
+        for curDepth in range(rigDepth):
+            conversion = scene.CreateNode("unitConversion", node.name.rpartition(":")[0] + ":unitConversion#"
+                                          if ":" in node.name else "unitConversion#", reference=node.reference)
+            scene.Connect(source, (conversion, "input"))
+            source = (conversion, "output")
+
+        if rigDepth:
+            scene.Connect(source, (node, curChannel))
+
+
+# PURPOSE:          Build a character: a joint tree under a rig group and a body mesh with a keyed blendShape.
+# PROCEDURE:        Joints are a balanced binary tree under the root, so the depth grows with log(joints). Every joint's
+#                   translate and rotate are keyed, see SIP_KeyBenchmarkNode. Returns the root joint and the mesh
+#                   transform.
+# PRESUMPTION:      ns is empty for a character in the root namespace.
+def SIP_BuildBenchmarkCharacter(ns, joints, frames, keyStep=5, rigDepth=2, reference=""):
+    scene = standIn.SIP_ReturnStandInScene()
+    prefix = ns + ":" if ns else ""
+
+    rig = scene.CreateNode("transform", prefix + "Rig", reference=reference)
+    jointNodes = [scene.CreateNode("joint", prefix + "Root", rig, reference)]
+
+    for index in range(1, joints):
+        jointNodes.append(scene.CreateNode("joint", prefix + "Joint_%03d" % index, jointNodes[(index - 1) // 2],
+                                           reference))
+
+    for index, curJoint in enumerate(jointNodes):
+        SIP_KeyBenchmarkNode(curJoint, _SIP_Channels, frames, keyStep, rigDepth, index)
+
+    geo = scene.CreateNode("transform", prefix + "Geo", reference=reference)
+    body = scene.CreateNode("transform", prefix + "Body", geo, reference)
+    shape = scene.CreateNode("mesh", prefix + "BodyShape", body, reference)
+    blendShape = scene.CreateNode("blendShape", prefix + "BodyBlend", reference=reference)
+    scene.Connect((blendShape, "outputGeometry"), (shape, "inMesh"))
+    standIn.SIP_KeyPlug(blendShape, "weight", [[1.0, 0.0], [float(frames), 1.0]])
+
+    return jointNodes[0].name, body.name
+
+
+# PURPOSE:          Build an animation scene of referenced characters with export nodes.
+# PROCEDURE:        characters characters, each with joints joints and exportNodes export nodes that split the frames
+#                   into sub ranges. Every other export node moves to origin, and the export nodes record different
+#                   states of animLayers anim layers. Returns the stand-in scene.
+# PRESUMPTION:      workspace is an empty folder the FBX files and the manifest are written to.
+def SIP_BuildAnimationBenchmarkScene(workspace, characters=2, joints=30, exportNodes=2, frames=120, animLayers=2,
+                                     rigDepth=2):
+    FBX = SIP_ReturnExporter()
+    scene = standIn.SIP_NewStandInScene(workspace)
+    FBX.cmds.playbackOptions(minTime=1, maxTime=frames)
+
+    layers = []
+
+    for index in range(animLayers):
+        layers.append(FBX.cmds.animLayer("Layer%02d" % index))
+
+    for curCharacter in range(characters):
+        ns = "char%02d" % curCharacter
+        reference = os.path.join(workspace, "rigs", ns + ".ma")
+        scene.references.append((reference, ns))
+
+        origin, body = SIP_BuildBenchmarkCharacter(ns, joints, frames, rigDepth=rigDepth, reference=reference)
+        FBX.SIP_TagForOrigin(origin)
+        length = max(1, frames // exportNodes)
+
+        for curExportNode in range(exportNodes):
+            exportNode = FBX.SIP_CreateFBXExportNode(ns)
+            FBX.SIP_ConnectFBXExportNodeToOrigin(exportNode, origin)
+            settings = FBX.SIP_ReturnFBXExportSettings(exportNode)
+            FBX.SIP_WriteFBXExportSettings(exportNode, settings._replace(
+                exportName="anim/%s_clip%02d.fbx" % (ns, curExportNode), moveToOrigin=bool(curExportNode % 2),
+                useSubRange=exportNodes > 1, startFrame=1 + curExportNode * length,
+                endFrame=min(frames, (curExportNode + 1) * length)), settings)
+
+            for index, curLayer in enumerate(layers):
+                FBX.cmds.animLayer(curLayer, edit=True, mute=bool((curExportNode >> index) & 1))
+
+            FBX.SIP_SetAnimLayerSettings(exportNode)
+
+    for curLayer in layers:
+        FBX.cmds.animLayer(curLayer, edit=True, mute=False)
+
+    return scene
+
+
+# PURPOSE:          Build a model scene: one character in the root namespace with model export nodes.
+# PROCEDURE:        The character's rig is under a group, so exports re-parent the origin. Each export node is
+#                   connected to the body and its own extra mesh. Returns the stand-in scene.
+# PRESUMPTION:      workspace is an empty folder the FBX files are written to.
+def SIP_BuildModelBenchmarkScene(workspace, joints=30, exportNodes=2):
+    FBX = SIP_ReturnExporter()
+    scene = standIn.SIP_NewStandInScene(workspace)
+    characterGroup = scene.CreateNode("transform", "Character")
+
+    origin, body = SIP_BuildBenchmarkCharacter("", joints, 2, rigDepth=0)
+    FBX.cmds.parent("Rig", characterGroup.name)
+    FBX.SIP_TagForOrigin(origin)
+
+    for curExportNode in range(exportNodes):
+        mesh = scene.CreateNode("transform", "Prop%02d" % curExportNode)
+        scene.CreateNode("mesh", "Prop%02dShape" % curExportNode, mesh)
+
+        exportNode = FBX.SIP_CreateFBXExportNode("Model")
+        FBX.SIP_ConnectFBXExportNodeToOrigin(exportNode, origin)
+        FBX.SIP_ConnectFBXExportNodeToMeshes(exportNode, [body, mesh.name])
+        settings = FBX.SIP_ReturnFBXExportSettings(exportNode)
+        FBX.SIP_WriteFBXExportSettings(exportNode, settings._replace(exportName="model/model%02d.fbx" % curExportNode),
+                                       settings)
+
+    return scene
+
+
+
+#######################################
+#
+#    Benchmark procs
+#
+#######################################
+
+
+
+# PURPOSE:          Run the steps of one benchmark.
+# PROCEDURE:        Returns (setup, run). setup builds a fresh scene and is not timed, run is the timed part.
+# PRESUMPTION:      params holds characters, joints, exportNodes, frames, animLayers and rigDepth.
+def SIP_ReturnBenchmarkSteps(name, params, workspace):
+    FBX = SIP_ReturnExporter()
+
+    def animationScene():
+        SIP_BuildAnimationBenchmarkScene(workspace, params["characters"], params["joints"], params["exportNodes"],
+                                         params["frames"], params["animLayers"], params["rigDepth"])
+
+    if name == "exportAnimation":
+        return animationScene, lambda: FBX.SIP_ExportFBXAnimation("", "", incremental=False)
+
+    if name == "exportAnimationIncremental":
+        def setup():
+            animationScene()
+            manifestPath = FBX.SIP_ReturnExportManifestPath()
+
+            if os.path.isfile(manifestPath):
+                os.remove(manifestPath)
+
+            FBX.SIP_ExportFBXAnimation("", "", incremental=True)
+
+        return setup, lambda: FBX.SIP_ExportFBXAnimation("", "", incremental=True)
+
+    if name == "exportCharacter":
+        return (lambda: SIP_BuildModelBenchmarkScene(workspace, params["joints"], params["exportNodes"]),
+                lambda: FBX.SIP_ExportFBXCharacter(""))
+
+    if name == "populateUI":
+        def populate():
+            FBX.SIP_FBXExporterUI_PopulateAnimationActorPanel()
+            actors = FBX.cmds.textScrollList("sip_FBXExporter_window_animationActorsTextScrollList", query=True,
+                                             allItems=True) or []
+
+            for curActor in actors:
+                FBX.cmds.textScrollList("sip_FBXExporter_window_animationActorsTextScrollList", edit=True,
+                                        selectItem=curActor)
+                FBX.SIP_FBXExporterUI_PopulateAnimationExportNodesPanel()
+                exportNodes = FBX.cmds.textScrollList("sip_FBXExporter_window_animationExportNodesTextScrollList",
+                                                      query=True, allItems=True) or []
+
+                for curExportNode in exportNodes:
+                    FBX.cmds.textScrollList("sip_FBXExporter_window_animationExportNodesTextScrollList", edit=True,
+                                            selectItem=curExportNode)
+                    FBX.SIP_FBXExporterUI_UpdateAnimationExportSettings()
+
+        return animationScene, populate
+
+    if name == "clearGarbage":
+        def setup():
+            animationScene()
+
+            for curOrigin in FBX.SIP_ReturnOrigins(""):
+                FBX.SIP_CopyAndConnectSkeleton(curOrigin)
+
+        return setup, lambda: FBX.SIP_ClearGarbage(sceneScan=True)
+
+    if name in ("preBakeBakeResults", "preBakeCurves"):
+        # Curves keyed straight on the joints, as from mocap, so both pre bake paths apply.
+        exportRigs = []
+
+        def setup():
+            SIP_BuildAnimationBenchmarkScene(workspace, params["characters"], params["joints"], params["exportNodes"],
+                                             params["frames"], 0, 0)
+            exportRigs[:] = [FBX.SIP_CopyAndConnectSkeleton(curOrigin) for curOrigin in FBX.SIP_ReturnOrigins("")]
+
+        def preBake():
+            for curRig in exportRigs:
+                FBX.SIP_PreBakeExportRig(curRig, 1, params["frames"], useCurves=name == "preBakeCurves")
+
+        return setup, preBake
+
+    raise ValueError("Unknown benchmark: " + name)
+
+
+# PURPOSE:          Time one benchmark and count the commands it runs.
+# PROCEDURE:        Run setup and the timed step repeats times, keeping the seconds of each. Then run it once more with
+#                   the command profiler on and record the total and per command calls and any command budget
+#                   violations. Output is discarded.
+# PRESUMPTION:      None.
+def SIP_RunBenchmark(name, params, repeats=3):
+    FBX = SIP_ReturnExporter()
+    workspace = tempfile.mkdtemp(prefix="fbxBenchmark_")
+    setup, run = SIP_ReturnBenchmarkSteps(name, params, workspace)
+    seconds = []
+    commands = {}
+    violations = []
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+
+    try:
+        for index in range(repeats):
+            setup()
+            start = FBX._SIP_TimingClock()
+            run()
+            seconds.append(FBX._SIP_TimingClock() - start)
+
+        setup()
+        FBX.SIP_ResetCommandProfile()
+        FBX.SIP_EnableCommandProfiler()
+
+        try:
+            run()
+        finally:
+            FBX.SIP_DisableCommandProfiler()
+
+        for curEntry in FBX.SIP_ReturnCommandProfile():
+            commands[curEntry["command"]] = commands.get(curEntry["command"], 0) + curEntry["calls"]
+
+        violations = FBX.SIP_ReturnCommandBudgetViolations()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    seconds.sort()
+    return {"benchmark": name, "min": seconds[0], "median": seconds[len(seconds) // 2], "seconds": seconds,
+            "commandCalls": sum(commands.values()), "commands": commands, "budgetViolations": violations}
+
+
+# PURPOSE:          Check that no budgeted procedure of the exporter runs more commands than its budget.
+# PROCEDURE:        Run each benchmark's step once on a fresh scene in SIP_CommandBudget, which fails if a procedure in
+#                   SIP_CommandBudgets goes over its budget. Also fail if a budgeted procedure never ran, so the
+#                   check cannot pass by not reaching it. Returns the failure messages, empty if every budget held.
+# PRESUMPTION:      params as for SIP_ReturnBenchmarkSteps.
+def SIP_CheckCommandBudgets(params, benchmarks=None):
+    FBX = SIP_ReturnExporter()
+    failures = []
+    budgetedCalls = {}
+
+    for curBenchmark in benchmarks or SIP_Benchmarks:
+        workspace = tempfile.mkdtemp(prefix="fbxBenchmark_")
+        setup, run = SIP_ReturnBenchmarkSteps(curBenchmark, params, workspace)
+
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+
+        try:
+            setup()
+            FBX.SIP_ResetCommandProfile()
+
+            with FBX.SIP_CommandBudget(label=curBenchmark):
+                run()
+        except AssertionError as error:
+            failures.append(str(error))
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+            shutil.rmtree(workspace, ignore_errors=True)
+
+        for curName, calls in FBX.SIP_ReturnBudgetedCalls().items():
+            budgetedCalls[curName] = budgetedCalls.get(curName, 0) + calls
+
+    if not benchmarks:
+        for curName in sorted(FBX.SIP_CommandBudgets):
+            if not budgetedCalls.get(curName):
+                failures.append(curName + " has a command budget but no benchmark runs it.")
+
+    return failures
+
+
+# PURPOSE:          Check that the root motion paths export the same animation where they should.
+# PROCEDURE:        Export the animation benchmark scene with the playhead away from the clips' start frames and
+#                   alternate characters zeroing the origin. With the origins turning, export with and without
+#                   SIP_PreBakeAnimation on the array path. With the origins keeping their heading, also export on the
+#                   animLayer path, which offsets each channel on its own and so only matches then. Compare every
+#                   file's samples against the array, pre-baked export of the same scene. Returns the failure
+#                   messages, empty if every export matched.
+# PRESUMPTION:      params as for SIP_ReturnBenchmarkSteps.
+def SIP_CheckRootMotionPaths(params, tolerance=1e-3):
+    FBX = SIP_ReturnExporter()
+    saved = FBX.SIP_ArrayRootMotion, FBX.SIP_PreBakeAnimation
+    exports = {}
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+
+    try:
+        for turning in [True, False]:
+            for arrayRootMotion in [True] if turning else [True, False]:
+                for preBake in [True, False]:
+                    workspace = tempfile.mkdtemp(prefix="fbxBenchmark_")
+
+                    try:
+                        scene = SIP_BuildAnimationBenchmarkScene(workspace, params["characters"], params["joints"],
+                                                                 params["exportNodes"], params["frames"],
+                                                                 params["animLayers"], params["rigDepth"])
+
+                        for index, curOrigin in enumerate(sorted(FBX.SIP_ReturnOrigins(""))):
+                            for curExportNode in FBX.SIP_ReturnFBXExportNodes(curOrigin):
+                                settings = FBX.SIP_ReturnFBXExportSettings(curExportNode)
+                                FBX.SIP_WriteFBXExportSettings(curExportNode, settings._replace(
+                                    zeroOrigin=bool(index % 2)), settings)
+
+                            for curChannel in [] if turning else ["rotateX", "rotateY", "rotateZ"]:
+                                originNode = scene.Resolve(curOrigin)
+                                scene.Disconnect(scene.Input(originNode, curChannel)[0], (originNode, curChannel))
+                                originNode.attrs[curChannel].value = 0.0
+
+                        FBX.cmds.currentTime(params["frames"], edit=True)
+                        FBX.SIP_ArrayRootMotion, FBX.SIP_PreBakeAnimation = arrayRootMotion, preBake
+                        FBX.SIP_ExportFBXAnimation("", "", incremental=False)
+
+                        exports[(turning, arrayRootMotion, preBake)] = dict(
+                            (os.path.relpath(cur, workspace), standIn.SIP_ReadStandInFBX(cur)[1])
+                            for cur in scene.exports)
+                    finally:
+                        shutil.rmtree(workspace, ignore_errors=True)
+    finally:
+        FBX.SIP_ArrayRootMotion, FBX.SIP_PreBakeAnimation = saved
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    failures = []
+
+    for (turning, arrayRootMotion, preBake), files in sorted(exports.items()):
+        label = "turning=%s SIP_ArrayRootMotion=%s SIP_PreBakeAnimation=%s" % (turning, arrayRootMotion, preBake)
+        reference = exports[(turning, True, True)]
+
+        for curPath in sorted(set(reference) | set(files)):
+            samples, expected = files.get(curPath), reference.get(curPath)
+
+            if samples is None or expected is None:
+                failures.append("%s: %s is only exported by one path." % (label, curPath))
+            elif len(samples) != len(expected) or \
+                    any(abs(cur - other) > tolerance for cur, other in zip(samples, expected)):
+                failures.append("%s: %s differs from the array root motion export." % (label, curPath))
+
+    return failures
+
+
+# PURPOSE:          Check the root motion math on an origin that turns while it moves.
+# PROCEDURE:        The origin starts a quarter turn around Y, steps forward along its own X axis, then turns another
+#                   quarter. Relative to the start frame that is a step along X, then a quarter turn, in every rotate
+#                   order. Then the same with the first quarter turn in the joint orient, which the rotate channels
+#                   have to leave out. Returns the failure messages, empty if the math held.
+# PRESUMPTION:      None.
+def SIP_CheckRootMotionMath(tolerance=1e-6):
+    FBX = SIP_ReturnExporter()
+    quarter = math.pi / 2.0 / FBX.om.MAngle.uiToInternal(1.0)
+    failures = []
+
+    # Channels by frames: translate XYZ, rotate XYZ. A quarter turn around Y points the origin's X axis down -Z.
+    translate = [[10.0, 10.0, 10.0], [0.0, 0.0, 0.0], [0.0, -5.0, -5.0]]
+    cases = [((0.0, 0.0, 0.0), [quarter, quarter, 2.0 * quarter], [0.0, 0.0, quarter]),
+             ((0.0, quarter, 0.0), [0.0, 0.0, quarter], [-quarter, -quarter, 0.0])]
+
+    for jointOrient, rotateY, movedRotateY in cases:
+        samples = translate + [[0.0] * 3, rotateY, [0.0] * 3]
+        expected = [[0.0, 5.0, 5.0], [0.0] * 3, [0.0] * 3, [0.0] * 3, movedRotateY, [0.0] * 3]
+
+        for rotateOrder in range(6):
+            moved = FBX.SIP_ReturnRootMotion(samples, 0, False, rotateOrder, jointOrient)[0]
+
+            if any(abs(cur - other) > tolerance for curChannel, curExpected in zip(moved, expected)
+                   for cur, other in zip(curChannel, curExpected)):
+                failures.append("Root motion of a turning origin with rotate order %d and joint orient %s is %s, "
+                                "not %s." % (rotateOrder, jointOrient, moved, expected))
+
+    return failures
+
+
+# PURPOSE:          Check that the curve pre-bake keys the same times and values as bakeResults.
+# PROCEDURE:        Build a one character benchmark scene keyed directly on its joints and pre-bake its export rig over
+#                   a range with a fractional start and end, once from the curves and once with bakeResults. Compare
+#                   the keys of every channel. Returns the failure messages, empty if they matched.
+# PRESUMPTION:      None.
+def SIP_CheckCurvePreBake(startFrame=0.5, endFrame=8.25, tolerance=1e-3):
+    FBX = SIP_ReturnExporter()
+    workspace = tempfile.mkdtemp(prefix="fbxBenchmark_")
+    keys = {}
+
+    try:
+        for curMethod in ["curves", "bakeResults"]:
+            SIP_BuildAnimationBenchmarkScene(workspace, 1, 3, 1, 10, 0, 0)
+            exportRig = FBX.SIP_CopyAndConnectSkeleton(FBX.SIP_ReturnOrigins("")[0])
+
+            if FBX.SIP_PreBakeExportRig(exportRig, startFrame, endFrame, curMethod == "curves") != curMethod:
+                return ["The benchmark character did not pre-bake with " + curMethod + "."]
+
+            keys[curMethod] = {}
+
+            for curPlug in [joint + "." + cur for joint in exportRig for cur in FBX._SIP_BakeChannels]:
+                keys[curMethod][curPlug] = (FBX.cmds.keyframe(curPlug, query=True, timeChange=True) or [],
+                                            FBX.cmds.keyframe(curPlug, query=True, valueChange=True) or [])
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    failures = []
+
+    for curPlug in sorted(keys["bakeResults"]):
+        times, values = keys["curves"][curPlug]
+        expectedTimes, expectedValues = keys["bakeResults"][curPlug]
+
+        if times != expectedTimes or any(abs(cur - other) > tolerance for cur, other in zip(values, expectedValues)):
+            failures.append("Curve pre-bake of %s from %s to %s keyed %s at %s, bakeResults %s at %s."
+                            % (curPlug, startFrame, endFrame, values, times, expectedValues, expectedTimes))
+
+    return failures
+
+
+# PURPOSE:          Check that a parallel export worker exports the same animation as a serial export.
+# PROCEDURE:        Build the animation benchmark scene with a prop reference whose keys drive the first character's
+#                   root, and save it. Export every character serially, then run the job FBXAnimationExporter_Batch
+#                   gives a worker, one character per job, in this process: each opens the saved scene the way a
+#                   worker does. Compare every file's samples. Returns the failure messages, empty if they matched.
+# PRESUMPTION:      params as for SIP_ReturnBenchmarkSteps.
+def SIP_CheckParallelExport(params, tolerance=1e-3):
+    FBX = SIP_ReturnExporter()
+    import FBXAnimationExporter_Batch as Batch
+
+    serialWorkspace = tempfile.mkdtemp(prefix="fbxBenchmark_")
+    parallelWorkspace = tempfile.mkdtemp(prefix="fbxBenchmark_")
+    exports = {}
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+
+    try:
+        scene = SIP_BuildAnimationBenchmarkScene(serialWorkspace, params["characters"], params["joints"],
+                                                 params["exportNodes"], params["frames"], params["animLayers"],
+                                                 params["rigDepth"])
+        characters = sorted(cur.partition(":")[0] for cur in FBX.SIP_ReturnOrigins(""))
+
+        # A prop in its own reference drives a character, like a vehicle or a constraint target.
+        propReference = os.path.join(serialWorkspace, "rigs", "prop.ma")
+        scene.references.append((propReference, "prop"))
+        prop = scene.CreateNode("transform", "prop:Ctrl", reference=propReference)
+        SIP_KeyBenchmarkNode(prop, ["translateX"], params["frames"], 5, 0, len(characters))
+        scene.Connect((prop, "translateX"), (scene.Resolve(characters[0] + ":Root"), "translateY"))
+
+        scenePath = standIn.SIP_SaveStandInScene(os.path.join(serialWorkspace, "scene.ma"))
+        FBX.SIP_ExportFBXAnimation("", "", incremental=False)
+        exports["serial"] = dict((os.path.relpath(cur, serialWorkspace), standIn.SIP_ReadStandInFBX(cur)[1])
+                                 for cur in scene.exports)
+        exports["parallel"] = {}
+
+        for curCharacter in characters:
+            job = Batch.SIP_ReturnExportJob(scenePath, parallelWorkspace, [[curCharacter, ""]], False)
+            Batch.SIP_RunExportJob(FBX, job)
+            exports["parallel"].update((os.path.relpath(cur, parallelWorkspace), standIn.SIP_ReadStandInFBX(cur)[1])
+                                       for cur in standIn.SIP_ReturnStandInScene().exports)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        shutil.rmtree(serialWorkspace, ignore_errors=True)
+        shutil.rmtree(parallelWorkspace, ignore_errors=True)
+
+    failures = []
+
+    for curPath in sorted(set(exports["serial"]) | set(exports["parallel"])):
+        samples, expected = exports["parallel"].get(curPath), exports["serial"].get(curPath)
+
+        if samples is None or expected is None:
+            failures.append("Parallel export: %s is only exported by one of the serial and parallel exports." %
+                            curPath)
+        elif len(samples) != len(expected) or \
+                any(abs(cur - other) > tolerance for cur, other in zip(samples, expected)):
+            failures.append("Parallel export: %s differs from the serial export." % curPath)
+
+    return failures
+
+
+
+#######################################
+#
+#    Results procs
+#
+#######################################
+
+
+
+# PURPOSE:          Return the commit the benchmark ran on.
+# PROCEDURE:        Ask git for the short hash of HEAD and whether the tree has changes. Empty if git is not available.
+# PRESUMPTION:      None.
+def SIP_ReturnBenchmarkCommit():
+    folder = os.path.dirname(os.path.abspath(__file__))
+
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=folder).decode().strip()
+        dirty = subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                        cwd=folder).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "", False
+
+    return commit, bool(dirty)
+
+
+# PURPOSE:          Run the benchmarks and append the results to the results file.
+# PROCEDURE:        One json line per benchmark with the commit, the time, the scene parameters, the seconds and the
+#                   command counts. Returns the results.
+# PRESUMPTION:      None.
+def SIP_RunBenchmarks(params, benchmarks=None, repeats=3, resultsPath=None):
+    commit, dirty = SIP_ReturnBenchmarkCommit()
+    results = []
+
+    for curBenchmark in benchmarks or SIP_Benchmarks:
+        result = SIP_RunBenchmark(curBenchmark, params, repeats)
+        result.update({"commit": commit, "dirty": dirty, "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                       "params": params, "python": sys.version.split()[0]})
+        results.append(result)
+        print("%-28s min %8.4fs  median %8.4fs  %7d commands" % (curBenchmark, result["min"], result["median"],
+                                                                result["commandCalls"]))
+
+        for curViolation in result["budgetViolations"]:
+            print("    over budget: %s ran %d commands, budget %d" % (curViolation["procedure"],
+                                                                     curViolation["calls"], curViolation["budget"]))
+
+    with open(resultsPath or SIP_BenchmarkResultsPath, "a") as resultsFile:
+        for curResult in results:
+            resultsFile.write(json.dumps(curResult, sort_keys=True) + "\n")
+
+    return results
+
+
+# PURPOSE:          Return the stored results.
+# PROCEDURE:        Read the json lines, skipping broken lines.
+# PRESUMPTION:      None.
+def SIP_LoadBenchmarkResults(resultsPath=None):
+    results = []
+    resultsPath = resultsPath or SIP_BenchmarkResultsPath
+
+    if os.path.isfile(resultsPath):
+        with open(resultsPath) as resultsFile:
+            for curLine in resultsFile:
+                try:
+                    results.append(json.loads(curLine))
+                except ValueError:
+                    pass
+
+    return results
+
+
+# PURPOSE:          Print the stored results of each benchmark and scene, oldest first, with the change in median
+#                   seconds and command calls from the previous run.
+# PROCEDURE:        Group by benchmark and parameters. Only runs with the same parameters are compared.
+# PRESUMPTION:      None.
+def SIP_PrintBenchmarkComparison(results, benchmark=""):
+    groups = {}
+
+    for curResult in results:
+        if not benchmark or curResult["benchmark"] == benchmark:
+            key = curResult["benchmark"] + " " + json.dumps(curResult["params"], sort_keys=True)
+            groups.setdefault(key, []).append(curResult)
+
+    for curKey in sorted(groups):
+        print(curKey)
+        previous = None
+
+        for curResult in groups[curKey]:
+            change = ""
+
+            if previous:
+                change = "  %+7.1f%%  %+d commands" % (
+                    100.0 * (curResult["median"] - previous["median"]) / max(previous["median"], 1e-9),
+                    curResult["commandCalls"] - previous["commandCalls"])
+
+            print("    %-10s %s  median %8.4fs  %7d commands%s" % (
+                curResult["commit"] + ("+" if curResult["dirty"] else ""), curResult["time"], curResult["median"],
+                curResult["commandCalls"], change))
+            previous = curResult
+
+
+
+# PURPOSE:          Command line entry point, run with a plain Python, not mayapy.
+# PROCEDURE:        Parse the sub command and its arguments and run it.
+# PRESUMPTION:      None.
+def SIP_BenchmarkMain(argv):
+    parser = argparse.ArgumentParser(description="FBX exporter benchmarks on stand-in scenes.")
+    subParsers = parser.add_subparsers(dest="command")
+
+    runParser = subParsers.add_parser("run", help="Run benchmarks and store the results.")
+    runParser.add_argument("benchmarks", nargs="*", help="Benchmarks to run, of " + ", ".join(SIP_Benchmarks) +
+                                                         ". Default: all.")
+    runParser.add_argument("--characters", type=int, default=2)
+    runParser.add_argument("--joints", type=int, default=30, help="Joints per character.")
+    runParser.add_argument("--export-nodes", type=int, default=2, help="Export nodes per character.")
+    runParser.add_argument("--frames", type=int, default=120)
+    runParser.add_argument("--anim-layers", type=int, default=2)
+    runParser.add_argument("--rig-depth", type=int, default=2,
+                           help="Nodes between each curve and its joint, stands in for rig evaluation.")
+    runParser.add_argument("--repeats", type=int, default=3)
+    runParser.add_argument("--results", default="", help="Results file. Default: " + SIP_BenchmarkResultsPath)
+
+    checkParser = subParsers.add_parser("check", help="Fail if an exporter procedure goes over its command budget "
+                                                      "or an export path disagrees with the default one.")
+    checkParser.add_argument("benchmarks", nargs="*", help="Benchmarks to check with. Default: all.")
+
+    compareParser = subParsers.add_parser("compare", help="Print stored results across commits.")
+    compareParser.add_argument("benchmark", nargs="?", default="")
+    compareParser.add_argument("--results", default="")
+
+    args = parser.parse_args(argv)
+
+    for curBenchmark in getattr(args, "benchmarks", []):
+        if curBenchmark not in SIP_Benchmarks:
+            parser.error("unknown benchmark " + curBenchmark)
+
+    if args.command == "run":
+        params = {"characters": args.characters, "joints": args.joints, "exportNodes": args.export_nodes,
+                  "frames": args.frames, "animLayers": args.anim_layers, "rigDepth": args.rig_depth}
+        results = SIP_RunBenchmarks(params, args.benchmarks, max(1, args.repeats), args.results)
+
+        if [cur for cur in results if cur["budgetViolations"]]:
+            return 1
+    elif args.command == "check":
+        failures = SIP_CheckCommandBudgets(SIP_BudgetCheckParams, args.benchmarks)
+
+        if not args.benchmarks:
+            failures.extend(SIP_CheckRootMotionPaths(SIP_BudgetCheckParams))
+            failures.extend(SIP_CheckRootMotionMath())
+            failures.extend(SIP_CheckCurvePreBake())
+            failures.extend(SIP_CheckParallelExport(SIP_BudgetCheckParams))
+
+        for curFailure in failures:
+            print(curFailure)
+
+        print("%d check failures" % len(failures) if failures else "Checks ok")
+
+        if failures:
+            return 1
+    elif args.command == "compare":
+        SIP_PrintBenchmarkComparison(SIP_LoadBenchmarkResults(args.results), args.benchmark)
+    else:
+        parser.print_help()
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(SIP_BenchmarkMain(sys.argv[1:]))
@@ -0,0 +1,1685 @@
+import copy
+import fnmatch
+import json
+import math
+import os
+import sys
+import types
+import uuid
+from array import array
+
+# In-memory stand-in for the parts of maya.cmds, maya.mel and maya.api.OpenMaya that FBXAnimationExporter uses, so its
+# logic can run (and be benchmarked) without a licensed Maya. A scene is plain Python objects: nodes with attributes,
+# plug connections, namespaces, references, joints, meshes, blendShapes, anim curves and anim layers.
+#
+# It is a stand-in, not an emulator:
+#   - Anim layers blend their keys over the base value: override layers replace it, additive layers add to it. Node
+#     states are stored and queried but do not change evaluation.
+#   - Curves interpolate linearly. Connections and unitConversion nodes pass values straight through.
+#   - Scenes are "saved" and "opened" as in-memory copies. Nodes of an unloaded reference stay in the scene but do
+#     not drive anything.
+#   - The FBX export samples the selected joints over the export range and writes the samples, binary or ASCII as
+#     set by the FBX options, instead of an FBX file.
+#   - UI commands just remember the flags they are given. textScrollList keeps its items and selection.
+
+
+#######################################
+#
+#    Scene
+#
+#######################################
+
+
+# Type -> parent type, for type filters (ls -type transform also lists joints).
+_SIP_TypeParents = {"joint": "transform", "transform": "dagNode", "mesh": "shape", "shape": "dagNode",
+                    "blendShape": "geometryFilter", "skinCluster": "geometryFilter",
+                    "animCurveTL": "animCurve", "animCurveTA": "animCurve", "animCurveTU": "animCurve",
+                    "animCurveTT": "animCurve", "animCurveUL": "animCurve", "animCurveUA": "animCurve",
+                    "animCurveUU": "animCurve"}
+
+_SIP_DagTypes = ["transform", "joint", "mesh"]
+
+# Static attributes per node type, as (longName, shortName, type, default, childNames, childShortNames).
+_SIP_XYZ = ["X", "Y", "Z"]
+
+
+def _SIP_Vector(longName, shortName, default=0.0):
+    return (longName, shortName, "double3", default, [longName + cur for cur in _SIP_XYZ],
+            [shortName + cur.lower() for cur in _SIP_XYZ])
+
+
+_SIP_TransformAttrs = [_SIP_Vector("translate", "t"), _SIP_Vector("rotate", "r"), _SIP_Vector("scale", "s", 1.0),
+                       ("visibility", "v", "bool", True, None, None),
+                       ("rotateOrder", "ro", "long", 0, None, None)]
+
+_SIP_NodeAttrs = {
+    "transform": _SIP_TransformAttrs,
+    "joint": _SIP_TransformAttrs + [_SIP_Vector("jointOrient", "jo"), _SIP_Vector("rotateAxis", "ra"),
+                                    _SIP_Vector("inverseScale", "is", 1.0),
+                                    ("segmentScaleCompensate", "ssc", "bool", True, None, None)],
+    "mesh": [("inMesh", "i", "message", None, None, None), ("outMesh", "o", "message", None, None, None)],
+    "blendShape": [("weight", "w", "float", 0.0, None, None), ("input", "ip", "message", None, None, None),
+                   ("outputGeometry", "og", "message", None, None, None)],
+    "skinCluster": [("input", "ip", "message", None, None, None),
+                    ("outputGeometry", "og", "message", None, None, None)],
+    "unitConversion": [("input", "i", "float", 0.0, None, None), ("output", "o", "float", 0.0, None, None)],
+    "animCurve": [("input", "i", "float", 0.0, None, None), ("output", "o", "float", 0.0, None, None),
+                  ("preInfinity", "pri", "long", 0, None, None), ("postInfinity", "poi", "long", 0, None, None)],
+    "animLayer": [("mute", "mte", "bool", False, None, None), ("solo", "sol", "bool", False, None, None),
+                  ("lock", "lo", "bool", False, None, None), ("weight", "w", "float", 1.0, None, None),
+                  ("override", "o", "bool", False, None, None), ("passthrough", "pth", "bool", False, None, None),
+                  ("rotationAccumulationMode", "ram", "long", 1, None, None),
+                  ("scaleAccumulationMode", "sam", "long", 0, None, None)],
+}
+
+
+class SIP_StandInAttr(object):
+    __slots__ = ("name", "short", "type", "value", "parent", "children", "locked")
+
+    def __init__(self, name, short, attrType, value, parent=None):
+        self.name = name
+        self.short = short
+        self.type = attrType
+        self.value = value
+        self.parent = parent
+        self.children = []
+        self.locked = False
+
+
+class SIP_StandInNode(object):
+    __slots__ = ("name", "type", "parent", "children", "attrs", "aliases", "uuid", "reference", "keys", "members",
+                 "alive")
+
+    def __init__(self, name, nodeType, reference=""):
+        self.name = name
+        self.type = nodeType
+        self.parent = None
+        self.children = []
+        self.attrs = {}
+        self.aliases = {}
+        self.uuid = str(uuid.uuid4()).upper()
+        self.reference = reference
+        self.keys = []
+        self.members = []
+        self.alive = True
+
+        template = _SIP_NodeAttrs.get(nodeType) or _SIP_NodeAttrs.get(_SIP_TypeParents.get(nodeType), [])
+
+        for longName, shortName, attrType, default, childNames, childShorts in template:
+            self.AddAttr(longName, shortName, attrType, default)
+
+            for childName, childShort in zip(childNames or [], childShorts or []):
+                self.AddAttr(childName, childShort, "double", default, parent=longName)
+
+        # Every Maya node has a nodeState.
+        self.AddAttr("nodeState", "nds", "long", 0)
+
+    def AddAttr(self, longName, shortName, attrType, default, parent=None):
+        attr = SIP_StandInAttr(longName, shortName, attrType, default, parent)
+        self.attrs[longName] = attr
+        self.aliases[longName] = longName
+
+        if shortName:
+            self.aliases[shortName] = longName
+
+        if parent:
+            self.attrs[parent].children.append(longName)
+
+        return attr
+
+    def Attr(self, name):
+        longName = self.aliases.get(name)
+        return self.attrs[longName] if longName else None
+
+    # Nodes are their own MObjects.
+    def hasFn(self, fnType):
+        return SIP_IsType(self.type, fnType)
+
+
+# PURPOSE:          Return whether a node type is, or derives from, one of the given types.
+# PROCEDURE:        Walk up _SIP_TypeParents.
+# PRESUMPTION:      wanted is a string or a list of strings.
+def SIP_IsType(nodeType, wanted):
+    if isinstance(wanted, str):
+        wanted = [wanted]
+
+    while nodeType:
+        if nodeType in wanted:
+            return True
+        nodeType = _SIP_TypeParents.get(nodeType)
+
+    return False
+
+
+class SIP_StandInScene(object):
+    def __init__(self):
+        self.nodes = {}
+        self.byUuid = {}
+        self.inputs = {}
+        self.outputs = {}
+        self.layerPlugs = {}
+        self.selection = []
+        self.references = []
+        self.minTime = 1.0
+        self.maxTime = 120.0
+        self.currentTime = 1.0
+        self.undo = True
+        self.evaluationMode = "parallel"
+        self.refreshSuspended = False
+        self.workspace = os.getcwd() + "/"
+        self.fbxOptions = {}
+        self.fbxTakes = []
+        self.ui = {}
+        self.warnings = []
+        self.exports = []
+        self.sceneName = ""
+        self.unloaded = set()
+
+    # Nodes
+
+    def UniqueName(self, name):
+        if "#" in name:
+            index = 1
+            while name.replace("#", str(index)) in self.nodes:
+                index += 1
+            return name.replace("#", str(index))
+
+        if name not in self.nodes:
+            return name
+
+        base = name.rstrip("0123456789")
+        index = 1
+        while base + str(index) in self.nodes:
+            index += 1
+        return base + str(index)
+
+    def CreateNode(self, nodeType, name=None, parent=None, reference=""):
+        node = SIP_StandInNode(self.UniqueName(name or nodeType + "#"), nodeType, reference)
+        self.nodes[node.name] = node
+        self.byUuid[node.uuid] = node
+
+        if parent is not None:
+            self.Reparent(node, parent)
+
+        SIP_FireNodeCallbacks("added", node)
+        return node
+
+    def Resolve(self, name):
+        if isinstance(name, SIP_StandInNode):
+            return name if name.alive else None
+
+        return self.nodes.get(name.rpartition("|")[2]) or self.byUuid.get(name)
+
+    def ResolvePlug(self, plug):
+        nodeName, _, attrName = plug.partition(".")
+        node = self.Resolve(nodeName)
+
+        if node is None:
+            raise ValueError("No object matches name: " + plug)
+
+        attr = node.Attr(attrName)
+
+        if attr is None:
+            raise ValueError("No object matches name: " + plug)
+
+        return node, attr.name
+
+    def FullPath(self, node):
+        if node.type not in _SIP_DagTypes:
+            return node.name
+
+        path = ""
+        while node is not None:
+            path = "|" + node.name + path
+            node = node.parent
+        return path
+
+    def Reparent(self, node, parent):
+        if node.parent is not None:
+            node.parent.children.remove(node)
+
+        node.parent = parent
+
+        if parent is not None:
+            parent.children.append(node)
+
+    def Descendants(self, node):
+        result = []
+
+        for curChild in node.children:
+            result.append(curChild)
+            result.extend(self.Descendants(curChild))
+
+        return result
+
+    def Rename(self, node, newName):
+        del self.nodes[node.name]
+        node.name = self.UniqueName(newName.lstrip(":"))
+        self.nodes[node.name] = node
+        return node.name
+
+    def Delete(self, nodes):
+        doomed = []
+
+        for curNode in nodes:
+            if curNode.alive and curNode not in doomed:
+                doomed.append(curNode)
+                doomed.extend(cur for cur in self.Descendants(curNode) if cur not in doomed)
+
+            if curNode.type == "animLayer":
+                doomed.extend(cur for cur in curNode.keys if cur.alive and cur not in doomed)
+
+        doomedSet = set(doomed)
+
+        # Curves that only drive deleted nodes go with them, like in Maya.
+        for curNode in list(doomed):
+            for curAttr in curNode.attrs:
+                srcNode, srcAttr = self.inputs.get((curNode, curAttr), (None, None))
+
+                if srcNode is not None and SIP_IsType(srcNode.type, "animCurve") and srcNode not in doomedSet:
+                    if all(cur[0] in doomedSet for cur in self.outputs.get((srcNode, srcAttr), [])):
+                        doomed.append(srcNode)
+                        doomedSet.add(srcNode)
+
+        for curNode in doomed:
+            for curAttr in curNode.attrs:
+                if (curNode, curAttr) in self.inputs:
+                    self.Disconnect(self.inputs[(curNode, curAttr)], (curNode, curAttr))
+
+                for curDest in list(self.outputs.get((curNode, curAttr), [])):
+                    self.Disconnect((curNode, curAttr), curDest)
+
+            if curNode.parent is not None and curNode.parent not in doomedSet:
+                curNode.parent.children.remove(curNode)
+
+            curNode.alive = False
+            self.nodes.pop(curNode.name, None)
+            self.byUuid.pop(curNode.uuid, None)
+
+            if curNode in self.selection:
+                self.selection.remove(curNode)
+
+            SIP_FireNodeCallbacks("removed", curNode)
+
+    # Connections, keyed by (node, longAttrName)
+
+    def Connect(self, source, dest, force=True):
+        if dest in self.inputs:
+            if not force:
+                raise RuntimeError("Destination is already connected: " + dest[0].name + "." + dest[1])
+            self.Disconnect(self.inputs[dest], dest)
+
+        self.inputs[dest] = source
+        self.outputs.setdefault(source, []).append(dest)
+
+    def Disconnect(self, source, dest):
+        if self.inputs.get(dest) == source:
+            del self.inputs[dest]
+            self.outputs[source].remove(dest)
+
+            if not self.outputs[source]:
+                del self.outputs[source]
+
+    def Input(self, node, attrName):
+        if (node, attrName) in self.inputs:
+            return self.inputs[(node, attrName)], None
+
+        parent = node.attrs[attrName].parent
+
+        if parent and (node, parent) in self.inputs:
+            return self.inputs[(node, parent)], node.attrs[parent].children.index(attrName)
+
+        return None, None
+
+    def ConnectedNodes(self, node, attrName=None, source=True, destination=True):
+        result = []
+
+        for curAttr in ([attrName] if attrName else list(node.attrs)):
+            if source and (node, curAttr) in self.inputs:
+                result.append(self.inputs[(node, curAttr)][0])
+
+            if destination:
+                result.extend(cur[0] for cur in self.outputs.get((node, curAttr), []))
+
+        return result
+
+    # References
+
+    def ReferenceNodes(self):
+        return dict((ns + "RN", (path, ns)) for path, ns in self.references)
+
+    # Evaluation
+
+    def Evaluate(self, node, attrName, time):
+        value = self.EvaluateBase(node, attrName, time)
+
+        for layer, curve in self.layerPlugs.get((node, attrName), []):
+            if not layer.alive or not curve.alive or layer.attrs["mute"].value:
+                continue
+
+            if layer.attrs["override"].value:
+                value = SIP_EvaluateCurve(curve.keys, time)
+            else:
+                value += self.Evaluate(layer, "weight", time) * SIP_EvaluateCurve(curve.keys, time)
+
+        return value
+
+    def EvaluateBase(self, node, attrName, time):
+        source, childIndex = self.Input(node, attrName)
+
+        if source is None or source[0].reference in self.unloaded:
+            return node.attrs[attrName].value
+
+        srcNode, srcAttr = source
+
+        if childIndex is not None:
+            srcAttr = srcNode.attrs[srcAttr].children[childIndex]
+
+        if SIP_IsType(srcNode.type, "animCurve"):
+            return SIP_EvaluateCurve(srcNode.keys, time)
+
+        if srcNode.type == "unitConversion":
+            return self.Evaluate(srcNode, "input", time)
+
+        return self.Evaluate(srcNode, srcAttr, time)
+
+
+# PURPOSE:          Evaluate a curve's keys at a time.
+# PROCEDURE:        Clamp outside the keys, interpolate linearly between them.
+# PRESUMPTION:      keys is a list of [time, value] sorted by time.
+def SIP_EvaluateCurve(keys, time):
+    if not keys:
+        return 0.0
+
+    if time <= keys[0][0]:
+        return keys[0][1]
+
+    if time >= keys[-1][0]:
+        return keys[-1][1]
+
+    low, high = 0, len(keys) - 1
+
+    while high - low > 1:
+        mid = (low + high) // 2
+        if keys[mid][0] <= time:
+            low = mid
+        else:
+            high = mid
+
+    (t0, v0), (t1, v1) = keys[low], keys[high]
+    return v0 + (v1 - v0) * (time - t0) / (t1 - t0)
+
+
+_SIP_Scene = SIP_StandInScene()
+_SIP_Callbacks = {}
+_SIP_CallbackIds = [0]
+_SIP_SavedScenes = {}
+
+
+# PURPOSE:          Return the current stand-in scene.
+# PROCEDURE:        Return the module level scene.
+# PRESUMPTION:      None.
+def SIP_ReturnStandInScene():
+    return _SIP_Scene
+
+
+# PURPOSE:          Start a new, empty stand-in scene.
+# PROCEDURE:        Replace the scene and fire the after new scene callbacks, so module caches are invalidated.
+# PRESUMPTION:      None.
+def SIP_NewStandInScene(workspace=None):
+    global _SIP_Scene
+    oldWorkspace = _SIP_Scene.workspace
+
+    _SIP_Scene = SIP_StandInScene()
+    _SIP_Scene.workspace = workspace.rstrip("/") + "/" if workspace else oldWorkspace
+    SIP_FireSceneCallbacks(OpenMaya.MSceneMessage.kAfterNew)
+    return _SIP_Scene
+
+
+# PURPOSE:          Save the stand-in scene under a file name, for SIP_OpenStandInScene.
+# PROCEDURE:        Keep a copy of the scene in memory. Nothing is written to disk.
+# PRESUMPTION:      None.
+def SIP_SaveStandInScene(path):
+    _SIP_Scene.sceneName = path
+    _SIP_SavedScenes[path] = copy.deepcopy(_SIP_Scene)
+    return path
+
+
+# PURPOSE:          Open a scene saved with SIP_SaveStandInScene.
+# PROCEDURE:        Replace the scene with a copy of the saved one, keep the workspace like Maya does, unload every
+#                   reference unless loadReferences, and fire the after open callbacks.
+# PRESUMPTION:      path was saved in this process.
+def SIP_OpenStandInScene(path, loadReferences=True):
+    global _SIP_Scene
+
+    if path not in _SIP_SavedScenes:
+        raise RuntimeError("File not found: " + path)
+
+    oldWorkspace = _SIP_Scene.workspace
+    _SIP_Scene = copy.deepcopy(_SIP_SavedScenes[path])
+    _SIP_Scene.workspace = oldWorkspace
+    _SIP_Scene.unloaded = set() if loadReferences else set(cur[0] for cur in _SIP_Scene.references)
+    SIP_FireSceneCallbacks(OpenMaya.MSceneMessage.kAfterOpen)
+    return _SIP_Scene
+
+
+def SIP_FireSceneCallbacks(message):
+    for curMessage, curFunction in list(_SIP_Callbacks.values()):
+        if curMessage == message:
+            curFunction(None)
+
+
+def SIP_FireNodeCallbacks(event, node):
+    for curMessage, curFunction in list(_SIP_Callbacks.values()):
+        if isinstance(curMessage, tuple) and curMessage[0] == event and SIP_IsType(node.type, curMessage[1]):
+            curFunction(node, None)
+
+
+#######################################
+#
+#    maya.cmds
+#
+#######################################
+
+
+def _SIP_List(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [cur for curValue in value for cur in _SIP_List(curValue)]
+    return [value]
+
+
+def _SIP_Flag(kwargs, *names):
+    for curName in names:
+        if curName in kwargs:
+            return kwargs[curName]
+    return None
+
+
+def _SIP_Names(nodes, longNames=False):
+    return [_SIP_Scene.FullPath(cur) if longNames else cur.name for cur in nodes]
+
+
+def _SIP_MatchPattern(node, pattern, recursive):
+    if fnmatch.fnmatchcase(node.name, pattern):
+        return True
+
+    return recursive and ":" not in pattern and fnmatch.fnmatchcase(node.name.rpartition(":")[2], pattern)
+
+
+def ls(*args, **kwargs):
+    scene = _SIP_Scene
+    items = _SIP_List(args)
+    wanted = _SIP_Flag(kwargs, "type", "typ")
+    recursive = _SIP_Flag(kwargs, "recursive", "r")
+    result = []
+
+    # Reference nodes are not scene nodes in the stand-in, see SIP_StandInScene.ReferenceNodes.
+    if wanted == "reference" and not args:
+        return sorted(scene.ReferenceNodes())
+
+    if _SIP_Flag(kwargs, "selection", "sl"):
+        result = list(scene.selection)
+    elif not args:
+        result = list(scene.nodes.values())
+
+    for curItem in items:
+        nodeName, _, attrName = curItem.partition(".")
+
+        if "*" in nodeName:
+            matches = [cur for cur in scene.nodes.values() if _SIP_MatchPattern(cur, nodeName, recursive)]
+        else:
+            node = scene.Resolve(nodeName)
+            matches = [node] if node else []
+
+        if attrName:
+            matches = [cur for cur in matches if cur.Attr(attrName)]
+
+        result.extend(cur for cur in matches if cur not in result)
+
+    if wanted:
+        result = [cur for cur in result if SIP_IsType(cur.type, wanted)]
+
+    if _SIP_Flag(kwargs, "referencedNodes", "rn"):
+        result = [cur for cur in result if cur.reference]
+
+    if _SIP_Flag(kwargs, "uuid"):
+        return [cur.uuid for cur in result]
+
+    return _SIP_Names(result, _SIP_Flag(kwargs, "long", "l"))
+
+
+def objExists(name):
+    try:
+        if "." in name:
+            _SIP_Scene.ResolvePlug(name)
+            return True
+        return _SIP_Scene.Resolve(name) is not None
+    except ValueError:
+        return False
+
+
+def objectType(name):
+    return _SIP_Scene.Resolve(name).type
+
+
+def listRelatives(*args, **kwargs):
+    scene = _SIP_Scene
+    wanted = _SIP_Flag(kwargs, "type", "typ")
+    result = []
+
+    for curNode in [scene.Resolve(cur) for cur in _SIP_List(args)]:
+        if _SIP_Flag(kwargs, "parent", "p"):
+            found = [curNode.parent] if curNode.parent else []
+        elif _SIP_Flag(kwargs, "allDescendents", "ad"):
+            found = list(reversed(scene.Descendants(curNode)))
+        else:
+            found = list(curNode.children)
+
+        if wanted:
+            found = [cur for cur in found if SIP_IsType(cur.type, wanted)]
+
+        result.extend(cur for cur in found if cur not in result)
+
+    return _SIP_Names(result, _SIP_Flag(kwargs, "fullPath", "f")) or None
+
+
+def listConnections(*args, **kwargs):
+    scene = _SIP_Scene
+    source = _SIP_Flag(kwargs, "source", "s")
+    destination = _SIP_Flag(kwargs, "destination", "d")
+    wanted = _SIP_Flag(kwargs, "type", "t")
+    plugs = _SIP_Flag(kwargs, "plugs", "p")
+    connections = _SIP_Flag(kwargs, "connections", "c")
+    result = []
+
+    for curItem in _SIP_List(args):
+        if "." in curItem:
+            node, attrName = scene.ResolvePlug(curItem)
+        else:
+            node, attrName = scene.Resolve(curItem), None
+
+        # Pairs of (own plug, connected plug), listed as [own, other, ...] with connections.
+        if plugs or connections:
+            for curAttr in ([attrName] if attrName else list(node.attrs)):
+                others = []
+
+                if source is not False and (node, curAttr) in scene.inputs:
+                    others.append(scene.inputs[(node, curAttr)])
+
+                if destination is not False:
+                    others.extend(scene.outputs.get((node, curAttr), []))
+
+                for otherNode, otherAttr in others:
+                    if wanted and not SIP_IsType(otherNode.type, wanted):
+                        continue
+
+                    if connections:
+                        result.append(node.name + "." + curAttr)
+
+                    result.append(otherNode.name + "." + otherAttr if plugs else otherNode.name)
+
+            continue
+
+        found = scene.ConnectedNodes(node, attrName, source is not False, destination is not False)
+
+        if wanted:
+            found = [cur for cur in found if SIP_IsType(cur.type, wanted)]
+
+        result.extend(cur for cur in found if cur not in result)
+
+    if plugs or connections:
+        return result or None
+
+    return _SIP_Names(result) or None
+
+
+def listHistory(*args, **kwargs):
+    scene = _SIP_Scene
+    future = _SIP_Flag(kwargs, "future", "f")
+    pending = []
+
+    for curNode in [scene.Resolve(cur) for cur in _SIP_List(args)]:
+        pending.append(curNode)
+        pending.extend(cur for cur in curNode.children if cur.type == "mesh")
+
+    seen = []
+
+    while pending:
+        curNode = pending.pop(0)
+
+        if curNode in seen:
+            continue
+
+        seen.append(curNode)
+        pending.extend(scene.ConnectedNodes(curNode, source=not future, destination=bool(future)))
+
+    return _SIP_Names(seen)
+
+
+def getAttr(plug, **kwargs):
+    node, attrName = _SIP_Scene.ResolvePlug(plug)
+    attr = node.attrs[attrName]
+
+    if attr.children:
+        return [tuple(node.attrs[cur].value for cur in attr.children)]
+
+    return attr.value
+
+
+def setAttr(plug, *values, **kwargs):
+    node, attrName = _SIP_Scene.ResolvePlug(plug)
+    attr = node.attrs[attrName]
+
+    if "lock" in kwargs:
+        attr.locked = kwargs["lock"]
+
+    if not values:
+        return
+
+    if attr.children:
+        for curChild, value in zip(attr.children, values):
+            node.attrs[curChild].value = value
+    else:
+        attr.value = values[0]
+
+
+def addAttr(node, **kwargs):
+    node = _SIP_Scene.Resolve(node)
+    longName = _SIP_Flag(kwargs, "longName", "ln")
+    attrType = _SIP_Flag(kwargs, "attributeType", "at") or _SIP_Flag(kwargs, "dataType", "dt")
+    defaults = {"bool": False, "float": 0.0, "double": 0.0, "doubleLinear": 0.0, "doubleAngle": 0.0, "long": 0,
+                "string": None}
+    node.AddAttr(longName, _SIP_Flag(kwargs, "shortName", "sn"), attrType, defaults.get(attrType))
+
+
+def deleteAttr(plug, **kwargs):
+    scene = _SIP_Scene
+    node, attrName = scene.ResolvePlug(plug)
+
+    for curAttr in [attrName] + node.attrs[attrName].children:
+        if (node, curAttr) in scene.inputs:
+            scene.Disconnect(scene.inputs[(node, curAttr)], (node, curAttr))
+
+        for curDest in list(scene.outputs.get((node, curAttr), [])):
+            scene.Disconnect((node, curAttr), curDest)
+
+        del node.attrs[curAttr]
+
+        for curAlias in [cur for cur, longName in node.aliases.items() if longName == curAttr]:
+            del node.aliases[curAlias]
+
+
+def attributeQuery(attrName, **kwargs):
+    node = _SIP_Scene.Resolve(_SIP_Flag(kwargs, "node", "n"))
+    return node.Attr(attrName) is not None
+
+
+def connectAttr(source, dest, **kwargs):
+    _SIP_Scene.Connect(_SIP_Scene.ResolvePlug(source), _SIP_Scene.ResolvePlug(dest), _SIP_Flag(kwargs, "force", "f"))
+
+
+def disconnectAttr(source, dest, **kwargs):
+    _SIP_Scene.Disconnect(_SIP_Scene.ResolvePlug(source), _SIP_Scene.ResolvePlug(dest))
+
+
+def createNode(nodeType, **kwargs):
+    parent = _SIP_Flag(kwargs, "parent", "p")
+    return _SIP_Scene.CreateNode(nodeType, _SIP_Flag(kwargs, "name", "n"),
+                                 _SIP_Scene.Resolve(parent) if parent else None).name
+
+
+def group(*args, **kwargs):
+    return _SIP_Scene.CreateNode("transform", _SIP_Flag(kwargs, "name", "n") or "group#").name
+
+
+def rename(node, newName):
+    return _SIP_Scene.Rename(_SIP_Scene.Resolve(node), newName)
+
+
+def delete(*args, **kwargs):
+    _SIP_Scene.Delete([cur for cur in [_SIP_Scene.Resolve(cur) for cur in _SIP_List(args)] if cur])
+
+
+def parent(*args, **kwargs):
+    scene = _SIP_Scene
+    nodes = [scene.Resolve(cur) for cur in _SIP_List(args)]
+    newParent = None if _SIP_Flag(kwargs, "world", "w") else nodes.pop()
+
+    for curNode in nodes:
+        scene.Reparent(curNode, newParent)
+
+    return [cur.name for cur in nodes]
+
+
+def duplicate(*args, **kwargs):
+    scene = _SIP_Scene
+    result = []
+
+    def copy(node, newParent):
+        newNode = scene.CreateNode(node.type, node.name.rpartition(":")[2], newParent)
+
+        for curName, curAttr in node.attrs.items():
+            if curName not in newNode.attrs:
+                newNode.AddAttr(curName, curAttr.short, curAttr.type, curAttr.value, curAttr.parent)
+            newNode.attrs[curName].value = curAttr.value
+            newNode.attrs[curName].locked = curAttr.locked
+
+        for curChild in node.children:
+            copy(curChild, newNode)
+
+        return newNode
+
+    for curNode in [scene.Resolve(cur) for cur in _SIP_List(args)]:
+        result.append(copy(curNode, curNode.parent).name)
+
+    return result
+
+
+def select(*args, **kwargs):
+    scene = _SIP_Scene
+
+    if _SIP_Flag(kwargs, "clear", "cl"):
+        scene.selection = []
+        return
+
+    nodes = [scene.Resolve(cur) for cur in _SIP_List(args)]
+
+    if not (_SIP_Flag(kwargs, "add", "af")):
+        scene.selection = []
+
+    scene.selection.extend(cur for cur in nodes if cur and cur not in scene.selection)
+
+
+def warning(message):
+    _SIP_Scene.warnings.append(message)
+
+
+def playbackOptions(**kwargs):
+    if _SIP_Flag(kwargs, "query", "q"):
+        return _SIP_Scene.minTime if _SIP_Flag(kwargs, "minTime", "min") else _SIP_Scene.maxTime
+
+    if _SIP_Flag(kwargs, "minTime", "min") is not None:
+        _SIP_Scene.minTime = float(_SIP_Flag(kwargs, "minTime", "min"))
+    if _SIP_Flag(kwargs, "maxTime", "max") is not None:
+        _SIP_Scene.maxTime = float(_SIP_Flag(kwargs, "maxTime", "max"))
+
+
+def evaluationManager(*args, **kwargs):
+    if _SIP_Flag(kwargs, "query", "q"):
+        return [_SIP_Scene.evaluationMode]
+
+    if _SIP_Flag(kwargs, "mode", "m"):
+        _SIP_Scene.evaluationMode = _SIP_Flag(kwargs, "mode", "m")
+
+
+def refresh(*args, **kwargs):
+    if _SIP_Flag(kwargs, "suspend", "su") is not None:
+        _SIP_Scene.refreshSuspended = _SIP_Flag(kwargs, "suspend", "su")
+
+
+def undoInfo(*args, **kwargs):
+    if _SIP_Flag(kwargs, "query", "q"):
+        return _SIP_Scene.undo
+
+    for curFlag in ["state", "st", "stateWithoutFlush", "swf"]:
+        if curFlag in kwargs:
+            _SIP_Scene.undo = kwargs[curFlag]
+
+
+def currentTime(*args, **kwargs):
+    if args:
+        _SIP_Scene.currentTime = float(args[0])
+    return _SIP_Scene.currentTime
+
+
+def workspace(*args, **kwargs):
+    if _SIP_Flag(kwargs, "query", "q"):
+        return _SIP_Scene.workspace
+
+    if args:
+        _SIP_Scene.workspace = args[0].rstrip("/") + "/"
+
+
+def referenceQuery(node, **kwargs):
+    if node in _SIP_Scene.ReferenceNodes():
+        path, ns = _SIP_Scene.ReferenceNodes()[node]
+        return ":" + ns if _SIP_Flag(kwargs, "namespace", "ns") else path
+
+    node = _SIP_Scene.Resolve(node)
+
+    if _SIP_Flag(kwargs, "isNodeReferenced", "inr"):
+        return bool(node.reference)
+
+    return node.reference
+
+
+def file(*args, **kwargs):
+    scene = _SIP_Scene
+
+    if _SIP_Flag(kwargs, "query", "q"):
+        if args and _SIP_Flag(kwargs, "namespace", "ns"):
+            return [cur[1] for cur in scene.references if cur[0] == args[0]][0]
+        if args and _SIP_Flag(kwargs, "deferReference", "dr"):
+            return False
+        if _SIP_Flag(kwargs, "reference", "r"):
+            return [cur[0] for cur in scene.references]
+        if _SIP_Flag(kwargs, "sceneName", "sn"):
+            return scene.sceneName
+        return ""
+
+    if _SIP_Flag(kwargs, "new", "f") is True and not args:
+        SIP_NewStandInScene()
+        return ""
+
+    if _SIP_Flag(kwargs, "exportSelected", "es"):
+        return SIP_ExportStandInFBX(args[0])
+
+    if _SIP_Flag(kwargs, "open", "o"):
+        SIP_OpenStandInScene(args[0], _SIP_Flag(kwargs, "loadReferenceDepth", "lrd") != "none")
+        return args[0]
+
+    if _SIP_Flag(kwargs, "loadReference", "lr"):
+        scene.unloaded.discard(scene.ReferenceNodes()[_SIP_Flag(kwargs, "loadReference", "lr")][0])
+        SIP_FireSceneCallbacks(OpenMaya.MSceneMessage.kAfterLoadReference)
+        return ""
+
+    raise RuntimeError("The stand-in only supports file queries, new scenes, opening saved scenes, loading references "
+                       "and exportSelected.")
+
+
+def keyframe(*args, **kwargs):
+    scene = _SIP_Scene
+    attrName = _SIP_Flag(kwargs, "attribute", "at")
+    timeRange = _SIP_Flag(kwargs, "time", "t")
+    result = []
+
+    # Several objects return their curves' values one after the other.
+    for name in _SIP_List(args):
+        if attrName:
+            name += "." + attrName
+
+        # A plug queries the curve feeding it, if any.
+        if "." in name:
+            source = scene.Input(*scene.ResolvePlug(name))[0]
+
+            if source is None or not SIP_IsType(source[0].type, "animCurve"):
+                continue
+
+            curve = source[0]
+        else:
+            curve = scene.Resolve(name)
+
+        keys = curve.keys
+
+        if _SIP_Flag(kwargs, "eval", "ev"):
+            result.extend(SIP_EvaluateCurve(keys, float(cur)) for cur in _SIP_List(timeRange))
+            continue
+
+        if timeRange:
+            keys = [cur for cur in keys if timeRange[0] <= cur[0] <= timeRange[1]]
+
+        inputs = _SIP_Flag(kwargs, "timeChange", "tc") or _SIP_Flag(kwargs, "floatChange", "fc")
+
+        # Inputs and values together return them key by key.
+        if inputs and _SIP_Flag(kwargs, "valueChange", "vc"):
+            result.extend(curValue for curKey in keys for curValue in curKey[:2])
+        elif inputs:
+            result.extend(cur[0] for cur in keys)
+        else:
+            result.extend(cur[1] for cur in keys)
+
+    return result or None
+
+
+def keyTangent(*args, **kwargs):
+    result = []
+
+    for name in _SIP_List(args):
+        curve = _SIP_Scene.Resolve(name)
+
+        if _SIP_Flag(kwargs, "inTangentType", "itt"):
+            result.extend(["auto", "auto"] * len(curve.keys))
+        else:
+            result.extend([0.0, 0.0, 1.0, 1.0] * len(curve.keys))
+
+    return result
+
+
+def SIP_KeyPlug(node, attrName, keys, layer=None):
+    curveType = "animCurveTA" if attrName.startswith("rotate") or node.attrs[attrName].type == "doubleAngle" else \
+        "animCurveTL"
+
+    if attrName.startswith("scale") or node.attrs[attrName].type in ["float", "bool", "long"]:
+        curveType = "animCurveTU"
+
+    curve = _SIP_Scene.CreateNode(curveType, node.name.rpartition(":")[2] + "_" + attrName)
+    curve.keys = keys
+
+    if layer is None:
+        _SIP_Scene.Connect((curve, "output"), (node, attrName))
+    else:
+        layer.keys.append(curve)
+        _SIP_Scene.layerPlugs.setdefault((node, attrName), []).append((layer, curve))
+
+    return curve
+
+
+def setKeyframe(*args, **kwargs):
+    scene = _SIP_Scene
+    time = _SIP_Flag(kwargs, "time", "t")
+    time = scene.currentTime if time is None else float(time)
+    layer = _SIP_Flag(kwargs, "animLayer", "al")
+    layer = scene.Resolve(layer) if layer else None
+
+    for curItem in _SIP_List(args):
+        if "." in curItem:
+            plugs = [scene.ResolvePlug(curItem)]
+        else:
+            node = scene.Resolve(curItem)
+            plugs = [(node, cur) for cur in ["translateX", "translateY", "translateZ", "rotateX", "rotateY",
+                                             "rotateZ", "scaleX", "scaleY", "scaleZ"] if cur in node.attrs]
+
+        for node, attrName in plugs:
+            value = node.attrs[attrName].value
+
+            # Like Maya, an additive layer keys the offset from what the layers below give at the current time.
+            if layer is not None and not layer.attrs["override"].value:
+                value -= scene.Evaluate(node, attrName, scene.currentTime)
+
+            SIP_KeyPlug(node, attrName, [[time, value]], layer)
+
+
+def bakeResults(*args, **kwargs):
+    scene = _SIP_Scene
+    startFrame, endFrame = _SIP_Flag(kwargs, "time", "t")
+    attrs = _SIP_Flag(kwargs, "attribute", "at") or ["tx", "ty", "tz", "rx", "ry", "rz", "sx", "sy", "sz"]
+    frames = [float(startFrame) + cur for cur in range(int(math.floor(endFrame - startFrame)) + 1)]
+
+    for curNode in [scene.Resolve(cur) for cur in _SIP_List(args)]:
+        attrNames = [curNode.Attr(cur).name for cur in attrs]
+        baked = [[[curFrame, scene.Evaluate(curNode, cur, curFrame)] for curFrame in frames] for cur in attrNames]
+
+        # Evaluate every channel before breaking any connection, compound connections feed several channels.
+        for attrName, keys in zip(attrNames, baked):
+            for curPlug in [(curNode, attrName), (curNode, curNode.attrs[attrName].parent)]:
+                if curPlug[1] and curPlug in scene.inputs:
+                    scene.Disconnect(scene.inputs[curPlug], curPlug)
+
+            SIP_KeyPlug(curNode, attrName, keys)
+
+
+def animLayer(*args, **kwargs):
+    scene = _SIP_Scene
+
+    if _SIP_Flag(kwargs, "query", "q"):
+        layer = scene.Resolve(args[0])
+        for curFlag in ["mute", "solo", "weight", "override", "passthrough", "lock"]:
+            if kwargs.get(curFlag):
+                return layer.attrs[curFlag].value
+        return None
+
+    if _SIP_Flag(kwargs, "edit", "e"):
+        layer = scene.Resolve(args[0])
+    else:
+        layer = scene.CreateNode("animLayer", args[0] if args else "AnimLayer#")
+
+        if _SIP_Flag(kwargs, "addSelectedObjects", "aso"):
+            layer.members = list(scene.selection)
+
+    for curFlag in ["mute", "solo", "weight", "override", "passthrough", "lock"]:
+        if curFlag in kwargs:
+            layer.attrs[curFlag].value = kwargs[curFlag]
+
+    return layer.name
+
+
+# Idle event jobs are not run, call the command yourself.
+def scriptJob(*args, **kwargs):
+    if _SIP_Flag(kwargs, "exists", "ex") is not None:
+        return False
+
+    return 0
+
+
+def loadPlugin(*args, **kwargs):
+    return []
+
+
+# PURPOSE:          Stand-in for every UI command.
+# PROCEDURE:        Remember the flags given to each control. Queries return the remembered flag. textScrollList keeps
+#                   its items (append, removeAll, removeItem) and its selection (selectItem).
+# PRESUMPTION:      None.
+def SIP_ReturnUICommand(commandName):
+    def uiCommand(*args, **kwargs):
+        name = args[0] if args else commandName + str(len(_SIP_Scene.ui) + 1)
+
+        if _SIP_Flag(kwargs, "exists", "ex"):
+            return name in _SIP_Scene.ui
+
+        control = _SIP_Scene.ui.setdefault(name, {"append": [], "selectItem": []})
+
+        if _SIP_Flag(kwargs, "query", "q"):
+            for curFlag, value in kwargs.items():
+                if curFlag not in ["query", "q"] and value:
+                    if curFlag in ["selectItem", "si"]:
+                        return list(control["selectItem"]) or None
+                    if curFlag in ["allItems", "ai"]:
+                        return list(control["append"]) or None
+                    return control.get(curFlag)
+            return None
+
+        if _SIP_Flag(kwargs, "removeAll", "ra"):
+            control["append"] = []
+            control["selectItem"] = []
+
+        for curFlag, value in kwargs.items():
+            if curFlag in ["append", "a"]:
+                control["append"].extend(_SIP_List(value))
+            elif curFlag in ["selectItem", "si"]:
+                control["selectItem"] = _SIP_List(value)
+            elif curFlag in ["removeItem", "ri"]:
+                control["append"] = [cur for cur in control["append"] if cur not in _SIP_List(value)]
+            elif curFlag not in ["edit", "e", "removeAll", "ra"]:
+                control[curFlag] = value
+
+        return name
+
+    return uiCommand
+
+
+_SIP_UICommands = ["button", "checkBoxGrp", "deleteUI", "fileDialog", "floatFieldGrp", "formLayout", "frameLayout",
+                   "menu", "menuItem", "paneLayout", "popupMenu", "progressBar", "scrollField", "setParent",
+                   "showWindow", "tabLayout", "text", "textFieldButtonGrp", "textFieldGrp", "textScrollList", "window"]
+
+
+#######################################
+#
+#    FBX export and maya.mel
+#
+#######################################
+
+
+# PURPOSE:          Stand-in for mel.eval.
+# PROCEDURE:        Run FBXExport* option commands against the scene's FBX options and ignore source statements.
+#                   Anything else is an error, so new mel calls show up in the benchmark.
+# PRESUMPTION:      Statements are separated by semicolons, arguments by spaces, strings have no semicolons.
+def SIP_EvalMel(melString):
+    scene = _SIP_Scene
+
+    for curStatement in melString.split(";"):
+        words = curStatement.split()
+
+        if not words or words[0] == "source":
+            continue
+
+        if not words[0].startswith("FBX"):
+            raise RuntimeError("The stand-in cannot evaluate mel: " + curStatement)
+
+        if words[0] == "FBXExportSplitAnimationIntoTakes":
+            if words[1] == "-c":
+                scene.fbxTakes = []
+            else:
+                scene.fbxTakes.append((" ".join(words[2:-2]).strip("\""), float(words[-2]), float(words[-1])))
+        elif len(words) > 2 and words[1] == "-v":
+            scene.fbxOptions[words[0]] = " ".join(words[2:]).strip("\"")
+
+    return ""
+
+
+# PURPOSE:          Stand-in for the FBX plugin's export selected.
+# PROCEDURE:        Sample translate, rotate and scale of every selected transform over the export range: the bake
+#                   range when the options bake, else the takes. Write the samples as text when FBXExportInAscii is on,
+#                   else as binary floats. Return the path.
+# PRESUMPTION:      None.
+def SIP_ExportStandInFBX(path):
+    scene = _SIP_Scene
+    options = scene.fbxOptions
+    channels = ["translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ", "scaleX", "scaleY",
+                "scaleZ"]
+
+    if options.get("FBXExportBakeComplexAnimation") == "1" or not scene.fbxTakes:
+        ranges = [(float(options.get("FBXExportBakeComplexStart", scene.minTime)),
+                   float(options.get("FBXExportBakeComplexEnd", scene.maxTime)))]
+    else:
+        ranges = [(cur[1], cur[2]) for cur in scene.fbxTakes]
+
+    samples = array("f")
+    nodes = [cur for cur in scene.selection if SIP_IsType(cur.type, "transform")]
+
+    for startFrame, endFrame in ranges:
+        for curFrame in range(int(startFrame), int(endFrame) + 1):
+            for curNode in nodes:
+                samples.extend(scene.Evaluate(curNode, cur, float(curFrame)) for cur in channels)
+
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    header = json.dumps({"nodes": [cur.name for cur in scene.selection], "ranges": ranges, "options": options})
+
+    if options.get("FBXExportInAscii") == "1":
+        with open(path, "w") as fbxFile:
+            fbxFile.write(header + "\n")
+            fbxFile.write("\n".join("%.6f" % cur for cur in samples))
+    else:
+        with open(path, "wb") as fbxFile:
+            fbxFile.write(header.encode("utf-8") + b"\n")
+            samples.tofile(fbxFile)
+
+    scene.exports.append(path)
+    return path
+
+
+# PURPOSE:          Read a file written by SIP_ExportStandInFBX.
+# PROCEDURE:        Parse the header line, then the samples as text or binary floats, whichever the header's options
+#                   say. Return the header and the samples.
+# PRESUMPTION:      path was written by SIP_ExportStandInFBX.
+def SIP_ReadStandInFBX(path):
+    with open(path, "rb") as fbxFile:
+        header = json.loads(fbxFile.readline().decode("utf-8"))
+        data = fbxFile.read()
+
+    samples = array("f")
+
+    if header["options"].get("FBXExportInAscii") == "1":
+        samples.extend(float(cur) for cur in data.decode("utf-8").split())
+    else:
+        samples.frombytes(data)
+
+    return header, samples
+
+
+#######################################
+#
+#    maya.api.OpenMaya
+#
+#######################################
+
+
+class MAngle(object):
+    def __init__(self, value=0.0):
+        self.value = value
+
+    def asRadians(self):
+        return self.value
+
+    @staticmethod
+    def uiToInternal(value):
+        return value
+
+
+class MPlug(object):
+    def __init__(self, node=None, attrName=""):
+        self.nodeObject = node
+        self.attrName = attrName
+
+    def _attr(self):
+        return self.nodeObject.attrs[self.attrName]
+
+    @property
+    def isNull(self):
+        return self.nodeObject is None
+
+    def node(self):
+        return self.nodeObject
+
+    def name(self):
+        return self.nodeObject.name + "." + self.attrName
+
+    def asBool(self):
+        return bool(self._attr().value)
+
+    def asInt(self):
+        return int(self._attr().value or 0)
+
+    def asFloat(self):
+        return float(self._attr().value or 0.0)
+
+    asDouble = asFloat
+
+    def asString(self):
+        return self._attr().value or ""
+
+    def asMAngle(self):
+        return MAngle(self._attr().value)
+
+    def numChildren(self):
+        return len(self._attr().children)
+
+    def child(self, index):
+        return MPlug(self.nodeObject, self._attr().children[index])
+
+    @property
+    def isDestination(self):
+        return _SIP_Scene.Input(self.nodeObject, self.attrName)[0] is not None
+
+    # Only the plug's own connection, not its parent's.
+    def source(self):
+        source = _SIP_Scene.inputs.get((self.nodeObject, self.attrName))
+        return MPlug(*source) if source else MPlug()
+
+    @property
+    def isChild(self):
+        return bool(self._attr().parent)
+
+    def parent(self):
+        return MPlug(self.nodeObject, self._attr().parent)
+
+    @property
+    def isLocked(self):
+        return self._attr().locked
+
+    @isLocked.setter
+    def isLocked(self, value):
+        self._attr().locked = value
+
+
+class MSelectionList(object):
+    def __init__(self):
+        self.nodes = []
+        self.plugs = []
+
+    def add(self, name):
+        node = _SIP_Scene.Resolve(name.partition(".")[0])
+
+        if node is None:
+            raise RuntimeError("(kInvalidParameter): Object does not exist: " + name)
+
+        self.nodes.append(node)
+        self.plugs.append(MPlug(*_SIP_Scene.ResolvePlug(name)) if "." in name else None)
+        return self
+
+    def length(self):
+        return len(self.nodes)
+
+    def getDependNode(self, index):
+        return self.nodes[index]
+
+    def getPlug(self, index):
+        if self.plugs[index] is None:
+            raise RuntimeError("(kInvalidParameter): Item is not a plug")
+
+        return self.plugs[index]
+
+
+class MFnDependencyNode(object):
+    def __init__(self, node):
+        self.node = node
+
+    def name(self):
+        return self.node.name
+
+    def hasAttribute(self, attrName):
+        return self.node.Attr(attrName) is not None
+
+    def findPlug(self, attrName, wantNetworkedPlug=False):
+        attr = self.node.Attr(attrName)
+
+        if attr is None:
+            raise RuntimeError("(kInvalidParameter): Cannot find plug " + attrName)
+
+        return MPlug(self.node, attr.name)
+
+
+class MDGModifier(object):
+    def __init__(self):
+        self.operations = []
+
+    def connect(self, source, dest):
+        self.operations.append(lambda: _SIP_Scene.Connect((source.nodeObject, source.attrName),
+                                                          (dest.nodeObject, dest.attrName), False))
+
+    def disconnect(self, source, dest):
+        self.operations.append(lambda: _SIP_Scene.Disconnect((source.nodeObject, source.attrName),
+                                                             (dest.nodeObject, dest.attrName)))
+
+    def _setValue(self, plug, value):
+        self.operations.append(lambda: setattr(plug._attr(), "value", value))
+
+    def newPlugValueMAngle(self, plug, angle):
+        self._setValue(plug, angle.value)
+
+    def newPlugValueInt(self, plug, value):
+        self._setValue(plug, value)
+
+    def newPlugValueBool(self, plug, value):
+        self._setValue(plug, value)
+
+    def newPlugValueDouble(self, plug, value):
+        self._setValue(plug, value)
+
+    def doIt(self):
+        operations, self.operations = self.operations, []
+
+        for curOperation in operations:
+            curOperation()
+
+
+class MFn(object):
+    kAnimCurve = "animCurve"
+
+
+class MTime(object):
+    kFilm = 6
+
+    def __init__(self, value=0.0, unit=kFilm):
+        self.value = value
+
+    @staticmethod
+    def uiUnit():
+        return MTime.kFilm
+
+
+class MTimeArray(list):
+    pass
+
+
+class MDoubleArray(list):
+    pass
+
+
+class MDistance(object):
+    @staticmethod
+    def uiToInternal(value):
+        return value
+
+
+class MSpace(object):
+    kTransform, kWorld = 1, 4
+
+
+class MVector(object):
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        if isinstance(x, (list, tuple, MVector)):
+            x, y, z = x[0], x[1], x[2]
+        self.x, self.y, self.z = float(x), float(y), float(z)
+
+    def __getitem__(self, index):
+        return [self.x, self.y, self.z][index]
+
+    def __len__(self):
+        return 3
+
+
+# Row vector 4x4 matrices, like Maya's: a point times the matrix, translation in the last row.
+class MMatrix(object):
+    def __init__(self, values=None):
+        self.values = [float(cur) for cur in values] if values else [float(row == col) for row in range(4)
+                                                                       for col in range(4)]
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def getElement(self, row, col):
+        return self.values[row * 4 + col]
+
+    def __mul__(self, other):
+        return MMatrix([sum(self.values[row * 4 + index] * other.values[index * 4 + col] for index in range(4))
+                        for row in range(4) for col in range(4)])
+
+    def inverse(self):
+        rows = [self.values[row * 4:row * 4 + 4] + [float(row == col) for col in range(4)] for row in range(4)]
+
+        for col in range(4):
+            pivot = max(range(col, 4), key=lambda row: abs(rows[row][col]))
+            rows[col], rows[pivot] = rows[pivot], rows[col]
+            scale = rows[col][col]
+            rows[col] = [cur / scale for cur in rows[col]]
+
+            for row in range(4):
+                if row != col and rows[row][col]:
+                    factor = rows[row][col]
+                    rows[row] = [cur - factor * other for cur, other in zip(rows[row], rows[col])]
+
+        return MMatrix([cur for row in rows for cur in row[4:]])
+
+
+class MEulerRotation(object):
+    kXYZ, kYZX, kZXY, kXZY, kYXZ, kZYX = range(6)
+
+    # Axes in the order they are applied.
+    _SIP_Axes = [(0, 1, 2), (1, 2, 0), (2, 0, 1), (0, 2, 1), (1, 0, 2), (2, 1, 0)]
+
+    def __init__(self, x=0.0, y=0.0, z=0.0, order=kXYZ):
+        if isinstance(x, (list, tuple, MVector)):
+            x, y, z, order = x[0], x[1], x[2], y if isinstance(y, int) else order
+        self.x, self.y, self.z, self.order = float(x), float(y), float(z), order
+
+    def __getitem__(self, index):
+        return [self.x, self.y, self.z][index]
+
+    def __len__(self):
+        return 3
+
+    def asMatrix(self):
+        result = MMatrix()
+
+        for axis in self._SIP_Axes[self.order]:
+            angle = self[axis]
+            cosine, sine = math.cos(angle), math.sin(angle)
+            values = [float(row == col) for row in range(4) for col in range(4)]
+            first, second = [cur for cur in range(3) if cur != axis]
+            sign = 1.0 if axis != 1 else -1.0
+            values[first * 4 + first] = values[second * 4 + second] = cosine
+            values[first * 4 + second] = sign * sine
+            values[second * 4 + first] = -sign * sine
+            result = result * MMatrix(values)
+
+        return result
+
+    @classmethod
+    def SIP_FromMatrix(cls, matrix, order=kXYZ):
+        # Column vector rotation matrix, the transpose of Maya's row vector one.
+        column = [[matrix.getElement(col, row) for col in range(3)] for row in range(3)]
+        first, middle, last = cls._SIP_Axes[order]
+        parity = 1.0 if (middle - first) % 3 == 1 else -1.0
+        angles = [0.0, 0.0, 0.0]
+        angles[middle] = math.asin(max(-1.0, min(1.0, -parity * column[last][first])))
+        angles[first] = math.atan2(parity * column[last][middle], column[last][last])
+        angles[last] = math.atan2(parity * column[middle][first], column[first][first])
+        return cls(angles[0], angles[1], angles[2], order)
+
+    def reorder(self, order):
+        return MEulerRotation.SIP_FromMatrix(self.asMatrix(), order)
+
+    def closestSolution(self, dst):
+        first, middle, last = self._SIP_Axes[self.order]
+        alternate = [self.x, self.y, self.z]
+        alternate[first] += math.pi
+        alternate[middle] = math.pi - alternate[middle]
+        alternate[last] += math.pi
+        best = None
+
+        for curAngles in [[self.x, self.y, self.z], alternate]:
+            angles = [cur + 2.0 * math.pi * round((dst[index] - cur) / (2.0 * math.pi))
+                      for index, cur in enumerate(curAngles)]
+            distance = sum(abs(cur - dst[index]) for index, cur in enumerate(angles))
+
+            if best is None or distance < best[0]:
+                best = (distance, angles)
+
+        return MEulerRotation(best[1][0], best[1][1], best[1][2], self.order)
+
+    def setToClosestSolution(self, dst):
+        self.x, self.y, self.z = self.closestSolution(dst)[:]
+        return self
+
+
+class MTransformationMatrix(object):
+    def __init__(self, matrix=None):
+        self.matrix = MMatrix(matrix.values) if matrix else MMatrix()
+
+    def asMatrix(self):
+        return MMatrix(self.matrix.values)
+
+    def translation(self, space):
+        return MVector(self.matrix.values[12:15])
+
+    def setTranslation(self, vector, space):
+        self.matrix.values[12:15] = [vector[0], vector[1], vector[2]]
+        return self
+
+    def rotation(self, asQuaternion=False):
+        return MEulerRotation.SIP_FromMatrix(self.matrix)
+
+
+class MFnAnimCurve(object):
+    kAnimCurveTA, kAnimCurveTL, kAnimCurveTT, kAnimCurveTU, kAnimCurveUA, kAnimCurveUL, kAnimCurveUT, \
+        kAnimCurveUU = range(8)
+    kTangentGlobal = 0
+    kConstant, kLinear, kCycle, kCycleRelative, kOscillate = 0, 1, 3, 4, 5
+
+    _SIP_CurveTypes = {"animCurveTA": kAnimCurveTA, "animCurveTL": kAnimCurveTL, "animCurveTT": kAnimCurveTT,
+                       "animCurveTU": kAnimCurveTU, "animCurveUA": kAnimCurveUA, "animCurveUL": kAnimCurveUL,
+                       "animCurveUU": kAnimCurveUU}
+
+    def __init__(self, node=None):
+        self.node = node
+
+    def setObject(self, node):
+        self.node = node
+
+    def create(self, plug, animCurveType=None, modifier=None):
+        self.node = SIP_KeyPlug(plug.node(), plug.attrName, [])
+        return self.node
+
+    def name(self):
+        return self.node.name
+
+    @property
+    def animCurveType(self):
+        return self._SIP_CurveTypes[self.node.type]
+
+    @property
+    def numKeys(self):
+        return len(self.node.keys)
+
+    @property
+    def preInfinityType(self):
+        return self.node.attrs["preInfinity"].value
+
+    @property
+    def postInfinityType(self):
+        return self.node.attrs["postInfinity"].value
+
+    def addKeys(self, times, values, tangentInType=kTangentGlobal, tangentOutType=kTangentGlobal,
+                keepExistingKeys=False, change=None):
+        keys = [[float(curTime.value), float(curValue)] for curTime, curValue in zip(times, values)]
+
+        if keepExistingKeys:
+            newTimes = set(cur[0] for cur in keys)
+            keys = sorted([cur for cur in self.node.keys if cur[0] not in newTimes] + keys)
+
+        self.node.keys = keys
+
+
+class MDagModifier(MDGModifier):
+    def createNode(self, nodeType, parent=None):
+        return _SIP_Scene.CreateNode(nodeType, None, parent)
+
+    def renameNode(self, node, newName):
+        _SIP_Scene.Rename(node, newName)
+
+
+class MDagPath(object):
+    def __init__(self, node):
+        self.node = node
+
+    @staticmethod
+    def getAPathTo(node):
+        return MDagPath(node)
+
+    def partialPathName(self):
+        return self.node.name
+
+    def fullPathName(self):
+        return _SIP_Scene.FullPath(self.node)
+
+
+def _SIP_AddCallback(message, function):
+    _SIP_CallbackIds[0] += 1
+    _SIP_Callbacks[_SIP_CallbackIds[0]] = (message, function)
+    return _SIP_CallbackIds[0]
+
+
+class MSceneMessage(object):
+    kAfterNew, kAfterOpen, kAfterImport, kAfterLoadReference, kAfterUnloadReference, kAfterCreateReference, \
+        kAfterRemoveReference = range(7)
+
+    @staticmethod
+    def addCallback(message, function, clientData=None):
+        return _SIP_AddCallback(message, function)
+
+
+class MDGMessage(object):
+    @staticmethod
+    def addNodeAddedCallback(function, nodeType="dependNode", clientData=None):
+        return _SIP_AddCallback(("added", nodeType), function)
+
+    @staticmethod
+    def addNodeRemovedCallback(function, nodeType="dependNode", clientData=None):
+        return _SIP_AddCallback(("removed", nodeType), function)
+
+
+class MMessage(object):
+    @staticmethod
+    def removeCallbacks(ids):
+        for curId in ids:
+            _SIP_Callbacks.pop(curId, None)
+
+
+OpenMaya = types.ModuleType("maya.api.OpenMaya")
+
+for _SIP_Name in ["MAngle", "MPlug", "MSelectionList", "MFnDependencyNode", "MDGModifier", "MDagModifier",
+                  "MDagPath", "MSceneMessage", "MDGMessage", "MMessage", "MFn", "MTime", "MTimeArray", "MDoubleArray",
+                  "MDistance", "MFnAnimCurve", "MSpace", "MVector", "MMatrix", "MEulerRotation",
+                  "MTransformationMatrix"]:
+    setattr(OpenMaya, _SIP_Name, globals()[_SIP_Name])
+
+
+#######################################
+#
+#    Install
+#
+#######################################
+
+
+_SIP_CmdsCommands = ["addAttr", "animLayer", "attributeQuery", "bakeResults", "connectAttr", "createNode",
+                     "currentTime", "delete", "deleteAttr", "disconnectAttr", "duplicate", "evaluationManager", "file",
+                     "getAttr", "group", "keyframe", "keyTangent", "listConnections", "listHistory", "listRelatives",
+                     "loadPlugin", "ls", "objectType", "objExists", "parent", "playbackOptions", "referenceQuery",
+                     "refresh", "rename", "scriptJob", "select", "setAttr", "setKeyframe", "undoInfo", "warning",
+                     "workspace"]
+
+
+# PURPOSE:          Make "import maya.cmds", "import maya.mel" and "import maya.api.OpenMaya" return the stand-in.
+# PROCEDURE:        Build the modules and register them in sys.modules. Refuses to replace a real Maya that has
+#                   already been imported.
+# PRESUMPTION:      Called before FBXAnimationExporter is imported.
+def SIP_InstallMayaStandIn(workspace=None):
+    existing = sys.modules.get("maya.cmds")
+
+    if existing is not None and not getattr(existing, "SIP_IsStandIn", False):
+        raise RuntimeError("maya.cmds is already imported from a real Maya, the stand-in cannot replace it.")
+
+    if existing is None:
+        maya = types.ModuleType("maya")
+        api = types.ModuleType("maya.api")
+        cmds = types.ModuleType("maya.cmds")
+        mel = types.ModuleType("maya.mel")
+
+        for curName in _SIP_CmdsCommands:
+            setattr(cmds, curName, globals()[curName])
+
+        for curName in _SIP_UICommands:
+            setattr(cmds, curName, SIP_ReturnUICommand(curName))
+
+        cmds.SIP_IsStandIn = True
+        mel.eval = SIP_EvalMel
+        maya.cmds, maya.mel, maya.api, api.OpenMaya = cmds, mel, api, OpenMaya
+
+        sys.modules.update({"maya": maya, "maya.cmds": cmds, "maya.mel": mel, "maya.api": api,
+                            "maya.api.OpenMaya": OpenMaya})
+
+    return SIP_NewStandInScene(workspace)